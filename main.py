@@ -1,3 +1,6 @@
+# First import: the startup timeline counts from here
+from src.utils.startup_trace import trace
+
 import kivy
 kivy.require('2.3.0')
 
@@ -10,8 +13,10 @@ Config.set('input', 'mouse', 'mouse,multitouch_on_demand')
 
 from kivy.app import App
 from kivy.core.window import Window
+trace.mark("kivy_import")
 from src.ui.layout import MainLayout
 from src.ui.controller import Controller
+trace.mark("ui_import")
 
 # Configuración inicial de ventana (Fullscreen, sin bordes)
 # Nota: En desarrollo se puede comentar 'fullscreen' para facilitar el debug
@@ -24,6 +29,10 @@ class ASPlayerApp(App):
         self.controller = Controller()
         layout = MainLayout()
         self.controller.set_ui(layout)
+        trace.mark("ui_built")
+        report = self.controller.config_manager.get_startup_report()
+        if report:
+            trace.report_when("first_callback", report)
         return layout
 
 
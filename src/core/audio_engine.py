@@ -5,438 +5,747 @@ import time as time_module
 from typing import Optional, Dict, Any, List
 from src.core.graph import Graph
 from src.core.node import NodeType
-from src.core.node_types import SourceType
-from src.utils.audio_loader import load_audio_file
+from src.core.params import compile_snapshot, compile_params, SourceParams, ChannelParams
+from src.core.file_loader import FileLoader
+from src.core.render_plan import compile_render_plan, RenderPlan
+from src.core.mixer import GainMatrixMixer
+from src.core.buffer_pool import BufferPool, AllocationProbe
+from src.core.segment_timeline import TIMELINE_KEYS
+from src.core.scheduler import EventQueue, fires_on_start, SEEK, RESTART
+from src.core.latency import (LATENCY_PROFILES, ADAPTIVE_PROFILE, DEFAULT_PROFILE, PROFILE_NAMES,
+                              AdaptiveBlockSizer, adaptive_latency)
+from src.core.device_format import DEFAULT_SAMPLE_RATE, FORMAT_SCALES, native_sample_rate, negotiate_output_format
+from src.core.multi_device import DEFAULT_DEVICE, DeviceOutput, device_layout
+from src.core.device_registry import DeviceRegistry
+from src.core.callback_stats import CallbackStats
+from src.utils.pcm_cache import PcmCache
+from src.utils.pcm_format import DEFAULT_STORAGE_FORMAT, resolve_format
+from src.utils.startup_trace import trace
 
 class PlaybackContext:
     def __init__(self, sample_rate: int):
         self.sample_rate = sample_rate
-        self.node_states: Dict[str, Any] = {}
         self.start_time = 0.0
         self.current_frame = 0
 
-    def get_state(self, node_id: str, default_factory=dict):
-        if node_id not in self.node_states:
-            self.node_states[node_id] = default_factory()
-        return self.node_states[node_id]
-
 class AudioEngine:
     def __init__(self):
         self.graph: Optional[Graph] = None
         self.is_playing = False
         self.stream: Optional[sd.OutputStream] = None
-        self.sample_rate = 44100
-        self.block_size = 8192 # Extremely safe block size for Pi Zero/3
+        # Negotiated with the device at start(): its native rate, so the host never
+        # resamples, and the best sample format it accepts
+        self.sample_rate = DEFAULT_SAMPLE_RATE
+        self.sample_format = "float32"
+        self.preferred_sample_rate: Optional[int] = None # Overrides the device's native rate
+        # Float mix for integer formats, converted into outdata with one multiply
+        self._mix_buffer: Optional[np.ndarray] = None
+        self._format_scale = np.ones(1, dtype=np.float32)
+        # Block size and host latency come from the latency profile ("safe" by default:
+        # 8192 frames, extremely safe for Pi Zero/3)
+        self.latency_profile = DEFAULT_PROFILE
+        self.block_size = LATENCY_PROFILES[DEFAULT_PROFILE]["block_size"]
+        self.latency = LATENCY_PROFILES[DEFAULT_PROFILE]["latency"]
+        # Adaptive profile: the callback feeds the sizer, a monitor thread acts on it
+        self.block_sizer: Optional[AdaptiveBlockSizer] = None
+        self.monitor_interval = 1.0
+        self._monitor_stop = threading.Event()
+        self._stream_lock = threading.RLock() # Serializes opening/closing the output stream
+        self._device_index = None
+        # Chosen output device, by name: indexes change when devices come and go
+        self._device_name: Optional[str] = None
+        # Enumerated once, refreshed on hotplug while no stream is open
+        self.devices = DeviceRegistry(self._stream_lock)
+        self.devices.is_busy = lambda: self.is_playing
+        self.devices.listeners.append(self._on_devices_changed)
+        self.on_devices_changed = None
+        self.out_channels = 2 # Width of the output stream, known for sure once started
+        # Extra devices named by channel nodes' hardware_device: (name, index, channels).
+        # The primary stream renders every device's channels into one buffer
+        # (device_layout gives each device its columns) and feeds the others
+        # through drift-compensated rings (DeviceOutput).
+        self._secondary_devices = []
+        self.device_layout = None
+        self.device_outputs: List[DeviceOutput] = []
+        self._primary_channels = self.out_channels
         self.playback_context: Optional[PlaybackContext] = None
         self._lock = threading.Lock()
+        # Trigger events for the callback, timestamped in frames since playback started
+        self.events = EventQueue()
+        self._block_started = 0.0 # perf_counter at the start of the last callback
         
-        # Property cache for thread safety and performance
-        self._property_cache = {}
-        self._property_queue = [] # Simple list as queue, protected by lock if needed, or just atomic appends
+        # Compiled node parameters for the audio thread. The UI publishes a new
+        # immutable snapshot with one reference swap; the callback reads it once per block.
+        self._params = compile_snapshot(None)
+        self._params_lock = threading.Lock() # Serializes UI-side writers only, never taken by the callback
         self.on_play_state_change = None
-        self._file_cache = {}
+        # Scratch memory for the callback, sized from block_size and out_channels
+        self._pool = BufferPool(self.block_size, self.out_channels)
+        # Duration, per-source-kind time and xruns of the recent callbacks (see get_stats)
+        self.callback_stats = CallbackStats(self.sample_rate)
+        self._first_callback = True # Marks the startup trace once
+        # Debug: set to an AllocationProbe to check the callback allocates nothing
+        self.allocation_probe: Optional[AllocationProbe] = None
+        # Decoded PCM on disk, shared by all file streams
+        self.pcm_cache = PcmCache()
+        # Streams and preloads file sources off the audio thread
+        self.file_loader = FileLoader(self.sample_rate, self.pcm_cache)
+        self.file_loader.on_streams_changed = self._on_streams_changed
+        # Compiled graph for the audio callback, replaced by reference on every change
+        self._plan: RenderPlan = compile_render_plan(None, self._params, self.sample_rate, {})
+        self._publish_plan(self._plan)
+        self._rendered_plan = self._plan # Last plan the callback rendered; see _render
 
     def update_property(self, node_id, key, value):
         # Called from UI thread
-        # We can push to a queue or update a shadow dict
-        # Updating a shadow dict is thread-safe in Python for single items (atomic)
-        # But let's use a specific method to be clean
-        if not hasattr(self, '_property_cache'):
-            self._property_cache = {}
-            
-        if node_id not in self._property_cache:
-            self._property_cache[node_id] = {}
-            
-        self._property_cache[node_id][key] = value
+        self.update_properties(node_id, {key: value})
+
+    def update_properties(self, node_id, values):
+        # Called from UI thread. All keys become visible to the audio thread
+        # in the same block (e.g. start_time and end_time together).
+        with self._params_lock:
+            node = self.graph.nodes.get(node_id) if self.graph else None
+            slot = self._params.slot_of(node_id)
+            if node is None or slot is None:
+                # Not compiled yet; picked up by the next graph change
+                return
+            properties = dict(node.properties)
+            properties.update(values)
+            params = compile_params(node.type, properties)
+            self._params = self._params.replace(slot, params)
+
+        if isinstance(params, ChannelParams):
+            if "hardware_device" in values:
+                self._reconfigure_outputs()
+            # Volume/mapping only change the gain matrix, not the plan
+            self._update_gains()
+        elif isinstance(params, SourceParams):
+            if "source_type" in values or "file_path" in values or "storage_format" in values:
+                self.file_loader.sync_node(node_id, params)
+                # Processor type or stream reference changed
+                self.notify_graph_change()
+            if any(key in values for key in TIMELINE_KEYS):
+                self.file_loader.apply_segment(node_id, params)
 
     def get_node_property(self, node, key, default):
-        # Called from Audio thread
-        # Try to get from cache first
-        if hasattr(self, '_property_cache') and node.id in self._property_cache:
-            if key in self._property_cache[node.id]:
-                return self._property_cache[node.id][key]
-        
-        # Fallback to direct node access (slower, potentially risky)
+        # UI-side read; the audio thread uses the compiled snapshot instead
         return node.get_property(key, default)
 
     def set_graph(self, graph: Graph):
+        if graph:
+            self.preferred_sample_rate = graph.settings.get("sample_rate") or None
+            self.file_loader.storage_format = resolve_format(graph.settings.get("pcm_storage", DEFAULT_STORAGE_FORMAT))
         with self._lock:
             self.graph = graph
-            # Cache active connections to avoid traversing full graph in callback
-            self._update_graph_cache()
+            if not self.is_playing:
+                # File streams (and their cache entries) are created at the rate
+                # start() will negotiate, not at the default rate and again after it
+                self.sample_rate = self._expected_sample_rate()
+                self.file_loader.sample_rate = self.sample_rate
+            # Compile the graph so the callback never traverses it
+            self._update_render_plan()
+        if graph:
+            self.set_latency_profile(graph.settings.get("latency_profile", DEFAULT_PROFILE))
+
+    def set_storage_format(self, storage_format: str):
+        # Project-wide format of decoded PCM (sources can override it); an integer
+        # format halves the cache and page-cache footprint of long files
+        storage_format = resolve_format(storage_format)
+        if storage_format == self.file_loader.storage_format:
+            return
+        self.file_loader.storage_format = storage_format
+        with self._lock:
+            self._update_render_plan()
 
-    def _update_graph_cache(self):
-        # Build a simplified structure for the audio thread
-        # This should be called whenever the graph topology changes
-        if not self.graph:
-            self._cached_graph = None
+    def set_sample_rate(self, sample_rate: int):
+        # Not while playing: wave generators and file streams are rebuilt at the new
+        # rate (decoded PCM is cached per rate, so switching back costs no decode)
+        sample_rate = int(sample_rate)
+        if sample_rate == self.sample_rate:
             return
+        self.sample_rate = sample_rate
+        self.file_loader.sample_rate = sample_rate
+        with self._lock:
+            self._update_render_plan()
+
+    def _expected_sample_rate(self) -> int:
+        # What _negotiate_format() will most likely pick: the preferred rate, else
+        # the native rate of the chosen device (or the one the workspace saved,
+        # which the UI/headless runner select right after loading it)
+        if self.preferred_sample_rate:
+            return int(self.preferred_sample_rate)
+        device_name = self._device_name or (self.graph.settings.get('audio_device') if self.graph else None)
+        device_idx = self.devices.find(device_name) if device_name else None
+        device_info = self.devices.device(device_idx) if device_idx is not None else self.devices.default_output()
+        return native_sample_rate(device_info) or self.sample_rate
+
+    def set_latency_profile(self, name):
+        # safe/balanced/low use fixed stream settings; adaptive starts balanced and moves
+        if name not in PROFILE_NAMES:
+            print(f"Unknown latency profile: {name}")
+            name = DEFAULT_PROFILE
+        previous = self.latency_profile
+        self.latency_profile = name
+
+        if name == ADAPTIVE_PROFILE:
+            block_size = self.block_size if previous == ADAPTIVE_PROFILE else LATENCY_PROFILES["balanced"]["block_size"]
+            latency = adaptive_latency(block_size, self.sample_rate)
+        else:
+            block_size = LATENCY_PROFILES[name]["block_size"]
+            latency = LATENCY_PROFILES[name]["latency"]
+
+        with self._stream_lock:
+            if block_size != self.block_size or latency != self.latency:
+                self._reopen_stream(block_size, latency)
+            if self.is_playing and (previous == ADAPTIVE_PROFILE) != (name == ADAPTIVE_PROFILE):
+                self._stop_monitor()
+                self._start_monitor()
+
+    def _update_render_plan(self):
+        # Rebuild the compiled plan for the audio thread.
+        # This should be called whenever the graph topology changes
+        with self._params_lock:
+            self._params = compile_snapshot(self.graph)
+        snapshot = self._params
+
+        if self.graph:
+            # Route property edits of every node (including ones created by the UI
+            # without explicit hooks) into the snapshot
+            for node in self.graph.nodes.values():
+                node.on_property_change = self.update_property
+                node.on_properties_change = self.update_properties
+
+        # Start loading every referenced file now, not on first use in the callback
+        self.file_loader.sync(self.graph, snapshot)
+
+        self._publish_plan(compile_render_plan(
+            self.graph, snapshot, self.sample_rate, self.file_loader.streams, previous=self._plan
+        ))
+
+    def _publish_plan(self, plan: RenderPlan):
+        # Give the plan its mixer, buffers and gains before the callback can see it
+        pool = self._pool
+        if pool.max_frames != self.block_size or pool.out_channels != self.out_channels:
+            pool = BufferPool(self.block_size, self.out_channels)
+            self._pool = pool
+        layout = self.device_layout
+        self._primary_channels = layout[DEFAULT_DEVICE][1] if layout else self.out_channels
+        if self.sample_format in FORMAT_SCALES or layout:
+            self._mix_buffer = np.zeros((self.block_size, self.out_channels), dtype=np.float32)
+            self._format_scale = np.full(1, FORMAT_SCALES.get(self.sample_format, 1.0), dtype=np.float32)
+        else:
+            self._mix_buffer = None
+        mixer = GainMatrixMixer(plan.width, self.out_channels, self.block_size)
+        mixer.set_matrix(plan.build_matrix(self._params_for(plan), self.out_channels, layout))
+        plan.attach(mixer, pool)
+        self._plan = plan
+
+    def enable_allocation_debug(self, strict=True):
+        # Count heap allocations per callback; with strict, raise once warmed up
+        self.allocation_probe = AllocationProbe(strict=strict)
+
+    def _params_for(self, plan: RenderPlan):
+        # Latest parameter values, as long as they use the plan's slot numbering
+        snapshot = self._params
+        if snapshot.slots is not plan.snapshot.slots:
+            snapshot = plan.snapshot
+        return snapshot.params
+
+    def _update_gains(self):
+        with self._lock:
+            plan = self._plan
+            plan.mixer.set_matrix(plan.build_matrix(self._params_for(plan), plan.mixer.out_channels,
+                                                    self.device_layout))
 
-        cache = {
-            'channels': [],
-            'nodes': {}
-        }
-        
-        # Pre-fetch nodes
-        for node_id, node in self.graph.nodes.items():
-            cache['nodes'][node_id] = node
-            if node.type == NodeType.CHANNEL:
-                # Find inputs for this channel
-                inputs = []
-                input_connections = [
-                    c for c in self.graph.connections.values() 
-                    if c.to_node_id == node.id
-                ]
-                for conn in input_connections:
-                    source = self.graph.nodes.get(conn.from_node_id)
-                    if source and source.type == NodeType.SOURCE:
-                        # Find triggers for this source
-                        triggers = []
-                        source_input_conns = [
-                            c for c in self.graph.connections.values() 
-                            if c.to_node_id == source.id
-                        ]
-                        for sic in source_input_conns:
-                            trigger = self.graph.nodes.get(sic.from_node_id)
-                            if trigger and trigger.type == NodeType.TRIGGER:
-                                triggers.append(trigger.id)
-                        
-                        inputs.append({
-                            'source_id': source.id,
-                            'triggers': triggers
-                        })
-                
-                cache['channels'].append({
-                    'id': node.id,
-                    'inputs': inputs
-                })
-        
-        self._cached_graph = cache
+    def _on_streams_changed(self):
+        # A stream learned its channel count (reader thread): rebind without re-reading the graph
+        with self._lock:
+            self._publish_plan(self._plan.with_streams(self.file_loader.streams))
 
     # Call this from UI when graph changes (add/remove node/connection)
     def notify_graph_change(self):
         with self._lock:
-            self._update_graph_cache()
+            self._update_render_plan()
+
+    def get_source_state(self, node_id):
+        # For the UI: idle, loading, ready or error
+        return self.file_loader.get_state(node_id)
+
+    def get_cache_stats(self):
+        return self.pcm_cache.stats()
+
+    def configure_cache(self, cache_dir=None, max_bytes=None):
+        # Location/size of the decoded audio cache; None keeps the current value
+        if cache_dir:
+            self.pcm_cache.cache_dir = cache_dir
+        if max_bytes:
+            self.pcm_cache.max_bytes = max_bytes
 
     def get_available_devices(self):
-        devices = []
-        try:
-            all_devices = sd.query_devices()
-            for idx, dev in enumerate(all_devices):
-                if dev['max_output_channels'] > 0:
-                    # Filter out likely duplicates or non-physical devices if needed
-                    # For now, just return all output devices
-                    devices.append({
-                        'index': idx,
-                        'name': dev['name'],
-                        'channels': dev['max_output_channels'],
-                        'api': dev['hostapi']
-                    })
-        except Exception as e:
-            print(f"Error listing devices: {e}")
-        return devices
+        # Output devices as {'index', 'name', 'channels', 'api'}, from the registry's cache
+        return self.devices.outputs()
+
+    def find_output_device(self, name):
+        # Index of a saved device name (matched without ALSA's hw numbers), or None
+        return self.devices.find(name)
+
+    def _on_devices_changed(self, registry):
+        # Registry listener (monitor thread, or stop() after a deferred refresh)
+        if self.on_devices_changed:
+            self.on_devices_changed()
 
     def set_output_device(self, device_index):
+        device = self.devices.device(device_index)
+        self._device_name = device['name'] if device else None
         if self.is_playing:
+            # Restarted by name: stopping may re-enumerate after a hotplug
             self.stop()
-            self.start(device_index)
+            self.start()
         else:
-            # Just store it for next start
-            self._pending_device_index = device_index
+            self.set_sample_rate(self._expected_sample_rate())
 
     def start(self, device_index=None):
-        if self.is_playing:
-            return
-        
-        try:
-            self.playback_context = PlaybackContext(self.sample_rate)
-            self.playback_context.start_time = time_module.time()
-            self.playback_context.current_frame = 0
-            
-            # Identify active nodes and initialize states if needed
-            if self.graph:
-                for node in self.graph.nodes.values():
-                    if node.type == NodeType.SOURCE:
-                         # Initialize phase for wave sources
-                         self.playback_context.get_state(node.id, lambda: {"phase": 0.0})
-
-            # Use specified device or default
-            device_idx = device_index
-            if device_idx is None and hasattr(self, '_pending_device_index'):
-                device_idx = self._pending_device_index
-
-            required_channels = 2
-            if self.graph:
-                for node in self.graph.nodes.values():
-                    if node.type == NodeType.CHANNEL:
-                        try:
-                            channel_index = int(node.get_property("channel_index", 1))
-                        except (TypeError, ValueError):
-                            channel_index = 1
-                        if channel_index > required_channels:
-                            required_channels = channel_index
-
-            device_max_channels = None
-            if device_idx is not None:
-                dev_info = sd.query_devices(device_idx)
-                device_max_channels = dev_info.get('max_output_channels')
-            else:
-                device_info = self.get_default_output_device_info()
-                device_max_channels = device_info.get('max_output_channels')
-
-            if device_max_channels:
-                channels = min(required_channels, device_max_channels)
-            else:
-                channels = required_channels
+        with self._stream_lock:
+            if self.is_playing:
+                return
+
+            try:
+                # Use specified device, the chosen one (wherever it is now) or default
+                device_idx = device_index
+                if device_idx is None and self._device_name:
+                    device_idx = self.devices.find(self._device_name)
+                    if device_idx is None:
+                        print(f"Output device not found: {self._device_name}; using the default")
+
+                dev_info, channels = self._configure_outputs(device_idx)
+                self._negotiate_format(dev_info, channels)
+                self._reset_playback()
+                self._open_stream()
+                trace.mark("stream_open")
+                self.is_playing = True
+                self._start_monitor()
+                if self.on_play_state_change:
+                    self.on_play_state_change(True)
+                print(f"Audio Engine Started (Device: {device_idx}, Channels: {channels}, Block: {self.block_size}, "
+                      f"Rate: {self.sample_rate}, Format: {self.sample_format})")
+                for output in self.device_outputs:
+                    print(f"Secondary output: {output.name} (Device: {output.device_index}, Channels: {output.channels}, "
+                          f"Rate: {output.device_rate}, Format: {output.sample_format})")
+            except Exception as e:
+                print(f"Error starting audio engine: {e}")
+                self.is_playing = False
+                if self.on_play_state_change:
+                    self.on_play_state_change(False)
+
+    def _configure_outputs(self, device_idx):
+        # Devices and widths for the channel nodes; returns the primary device's info and width
+        secondary = self._find_secondary_devices(device_idx)
+        required_channels = self.required_channels(exclude=[name for name, _, _ in secondary])
+
+        device_max_channels = None
+        dev_info = self.devices.device(device_idx)
+        if dev_info is not None:
+            device_max_channels = dev_info.get('max_output_channels')
+        else:
+            device_idx = None
+            dev_info = self.get_default_output_device_info()
+            device_max_channels = dev_info.get('max_output_channels')
 
-            if channels < 1:
-                channels = 1
+        if device_max_channels:
+            channels = min(required_channels, device_max_channels)
+        else:
+            channels = required_channels
+
+        if channels < 1:
+            channels = 1
+
+        self._device_index = device_idx
+        self._secondary_devices = secondary
+        self.out_channels = channels + sum(width for _, _, width in secondary)
+        self.device_layout = (device_layout(channels, [(name, width) for name, _, width in secondary])
+                              if secondary else None)
+        return dev_info, channels
+
+    def _reconfigure_outputs(self):
+        # A channel node moved to another device: reopen the streams without rewinding
+        with self._stream_lock:
+            if not self.is_playing:
+                return
+            try:
+                self._close_stream()
+                self._configure_outputs(self._device_index)
+                self._open_stream()
+            except Exception as e:
+                print(f"Error reopening audio outputs: {e}")
+                self.is_playing = False
+                self._stop_monitor()
+                if self.on_play_state_change:
+                    self.on_play_state_change(False)
+
+    def _settings_check(self, device_index, channels):
+        def check(sample_rate, sample_format):
+            try:
+                sd.check_output_settings(device=device_index, channels=channels,
+                                         dtype=sample_format, samplerate=sample_rate)
+                return True
+            except Exception:
+                return False
+        return check
+
+    def _negotiate_format(self, device_info, channels):
+        # Run the whole graph at the device's own rate and format (no host conversion)
+        check = self._settings_check(self._device_index, channels)
+        sample_rate, sample_format = negotiate_output_format(device_info, check, self.preferred_sample_rate)
+        self.sample_format = sample_format
+        self.set_sample_rate(sample_rate)
+
+    def _reset_playback(self):
+        self.playback_context = PlaybackContext(self.sample_rate)
+        self.playback_context.start_time = time_module.time()
+        self.playback_context.current_frame = 0
+        self.callback_stats.reset(self.sample_rate)
+
+        # Rewind file streams and wave phases so playback starts from the top
+        self.file_loader.rewind_all()
+        self._plan.reset()
+        # Nothing to take over from the last session's plan
+        self._rendered_plan = self._plan
+
+        # Close every gate, then fire the triggers that start with playback at frame 0
+        self.events.clear()
+        if self.graph:
+            for node in self.graph.nodes.values():
+                if node.type == NodeType.TRIGGER and fires_on_start(node.get_property("trigger_type", "on_start")):
+                    self.events.post(0, node.id)
+
+    def fire_trigger(self, trigger_id, frame=None):
+        # Called from UI thread. Opens the gates of every source the trigger feeds,
+        # at `frame` or, by default, as close to now as the next block allows.
+        context = self.playback_context
+        if context is None:
+            return False
+        if frame is None:
+            # Next block start plus the time since the last block started: presses
+            # keep their spacing to the sample, one block later than pressed
+            elapsed = time_module.perf_counter() - self._block_started
+            offset = min(self.block_size - 1, max(0, int(elapsed * self.sample_rate)))
+            frame = context.current_frame + offset
+        self.events.post(frame, trigger_id)
+        return True
+
+    def seek_source(self, node_id, seconds):
+        # Called from UI thread: moves a file source's playhead (applied next block)
+        if self.playback_context is None:
+            return False
+        self.events.command(node_id, SEEK, max(0, int(seconds * self.sample_rate)))
+        return True
+
+    def restart_source(self, node_id):
+        if self.playback_context is None:
+            return False
+        self.events.command(node_id, RESTART)
+        return True
+
+    def get_source_position(self, node_id):
+        # For the UI: playhead of a file source, in seconds, or None
+        stream = self.file_loader.streams.get(node_id)
+        if stream is None:
+            return None
+        playhead = stream.playhead
+        return {
+            "position": playhead.seconds(),
+            "start": playhead.segment_start / self.sample_rate,
+            "end": playhead.segment_end / self.sample_rate,
+            "iteration": playhead.iteration,
+            "state": playhead.state,
+        }
 
-            self.stream = sd.OutputStream(
-                samplerate=self.sample_rate,
+    def _find_secondary_devices(self, primary_index):
+        # Devices other than the primary named by channel nodes, with the channels each needs
+        needed = {}
+        if self.graph:
+            for node in self.graph.nodes.values():
+                if node.type != NodeType.CHANNEL:
+                    continue
+                name = node.get_property("hardware_device", DEFAULT_DEVICE) or DEFAULT_DEVICE
+                if name != DEFAULT_DEVICE:
+                    needed[name] = max(needed.get(name, 1), self._channel_index(node))
+        if not needed:
+            return []
+
+        secondary = []
+        for name, channels in needed.items():
+            index = self.devices.find(name)
+            if index is None:
+                print(f"Output device not found: {name}; its channels play on the main device")
+                continue
+            if index == primary_index:
+                continue
+            device = self.devices.device(index)
+            secondary.append((name, index, min(channels, device['max_output_channels'])))
+        return secondary
+
+    def _channel_index(self, node):
+        try:
+            return int(node.get_property("channel_index", 1))
+        except (TypeError, ValueError):
+            return 1
+
+    def required_channels(self, exclude=()):
+        # Highest output channel any channel node maps to (at least stereo);
+        # nodes on the devices in `exclude` are not counted
+        required_channels = 2
+        if self.graph:
+            for node in self.graph.nodes.values():
+                if node.type == NodeType.CHANNEL:
+                    if exclude and node.get_property("hardware_device", DEFAULT_DEVICE) in exclude:
+                        continue
+                    channel_index = self._channel_index(node)
+                    if channel_index > required_channels:
+                        required_channels = channel_index
+        return required_channels
+
+    def begin_offline(self, out_channels, block_size):
+        # Same state start() sets up, without opening a device stream.
+        # The caller then drives _audio_callback itself (see OfflineRenderer).
+        with self._stream_lock:
+            if self.is_playing:
+                raise RuntimeError("Cannot render offline while the engine is playing")
+            self._offline_block_size = self.block_size
+            self._reset_playback()
+            self.block_size = block_size
+            self.out_channels = out_channels
+            # Offline output is one device: every channel node renders into it
+            self.device_layout = None
+            with self._lock:
+                self._publish_plan(self._plan)
+
+    def end_offline(self):
+        with self._stream_lock:
+            self.playback_context = None
+            self.block_size = getattr(self, '_offline_block_size', self.block_size)
+
+    def _open_stream(self):
+        # Size the mixer for this stream before the first callback
+        with self._lock:
+            self._publish_plan(self._plan)
+
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.block_size,
+            latency=self.latency,
+            channels=self._primary_channels,
+            dtype=self.sample_format,
+            device=self._device_index,
+            callback=self._audio_callback
+        )
+        # Secondary devices first, so their rings exist before the first render
+        outputs = []
+        offset = self._primary_channels
+        for name, index, channels in self._secondary_devices:
+            output = self._open_secondary(name, index, offset, channels)
+            if output is not None:
+                outputs.append(output)
+            offset += channels
+        self.device_outputs = outputs
+        self.stream.start()
+
+    def _open_secondary(self, name, index, offset, channels) -> Optional[DeviceOutput]:
+        # Negotiated like the primary, preferring the render rate (drift correction
+        # only); a device that cannot be opened is skipped, the others still play
+        check = self._settings_check(index, channels)
+        sample_rate, sample_format = negotiate_output_format(self.devices.device(index), check, self.sample_rate)
+        if not check(sample_rate, sample_format):
+            print(f"Secondary output {name} accepts no usable rate/format; its channels are not played")
+            return None
+        output = DeviceOutput(name, index, offset, channels, self.block_size, self.sample_rate,
+                              sample_rate, sample_format, FORMAT_SCALES.get(sample_format, 1.0))
+        try:
+            output.stream = sd.OutputStream(
+                samplerate=sample_rate,
                 blocksize=self.block_size,
+                latency=self.latency,
                 channels=channels,
-                device=device_idx,
-                callback=self._audio_callback
+                dtype=sample_format,
+                device=index,
+                callback=output.callback
             )
-            self.stream.start()
-            self.is_playing = True
-            if self.on_play_state_change:
-                self.on_play_state_change(True)
-            print(f"Audio Engine Started (Device: {device_idx}, Channels: {channels})")
+            output.stream.start()
         except Exception as e:
-            print(f"Error starting audio engine: {e}")
-            self.is_playing = False
-            if self.on_play_state_change:
-                self.on_play_state_change(False)
+            print(f"Cannot open secondary output {name} ({e}); its channels are not played")
+            if output.stream is not None:
+                output.stream.close()
+            return None
+        return output
 
-    def stop(self):
-        if not self.is_playing:
-            return
-            
+    def _close_stream(self):
         if self.stream:
             self.stream.stop()
             self.stream.close()
             self.stream = None
-        
-        self.is_playing = False
-        if self.on_play_state_change:
-            self.on_play_state_change(False)
-        self.playback_context = None
-        print("Audio Engine Stopped")
+        outputs, self.device_outputs = self.device_outputs, []
+        for output in outputs:
+            output.stream.stop()
+            output.stream.close()
+
+    def get_device_stats(self):
+        # Buffer level, rate correction and xruns of every secondary device
+        return [output.stats() for output in self.device_outputs]
+
+    def get_stats(self):
+        # Callback timing since playback started (see CallbackStats.get_stats)
+        stats = self.callback_stats.get_stats()
+        stats["devices"] = self.get_device_stats()
+        return stats
+
+    def _reopen_stream(self, block_size, latency):
+        # Change stream settings without rewinding sources; only a block or two is lost
+        with self._stream_lock:
+            self.block_size = block_size
+            self.latency = latency
+            if not self.is_playing:
+                with self._lock:
+                    self._publish_plan(self._plan)
+                return
+            try:
+                self._close_stream()
+                self._open_stream()
+            except Exception as e:
+                print(f"Error reopening audio stream: {e}")
+                self.is_playing = False
+                self._stop_monitor()
+                if self.on_play_state_change:
+                    self.on_play_state_change(False)
+
+    def _start_monitor(self):
+        if self.latency_profile != ADAPTIVE_PROFILE:
+            return
+        sizer = AdaptiveBlockSizer(self.sample_rate, self.block_size)
+        self._monitor_stop = threading.Event()
+        thread = threading.Thread(target=self._run_monitor, args=(self._monitor_stop, sizer), daemon=True)
+        self.block_sizer = sizer
+        thread.start()
+
+    def _stop_monitor(self):
+        # Not joined: the monitor may be the thread calling this
+        self._monitor_stop.set()
+        self.block_sizer = None
+
+    def _run_monitor(self, stop_event, sizer):
+        while not stop_event.wait(self.monitor_interval):
+            block_size = sizer.decide()
+            if block_size is None:
+                continue
+            with self._stream_lock:
+                if stop_event.is_set():
+                    return
+                print(f"Adaptive latency: block size {self.block_size} -> {block_size} "
+                      f"(peak load {sizer.last_peak_load:.0%}, xruns {sizer.total_xruns})")
+                self._reopen_stream(block_size, adaptive_latency(block_size, self.sample_rate))
+
+    def stop(self):
+        with self._stream_lock:
+            if not self.is_playing:
+                return
+
+            self._stop_monitor()
+            self._close_stream()
+
+            self.is_playing = False
+            if self.on_play_state_change:
+                self.on_play_state_change(False)
+            self.playback_context = None
+            print("Audio Engine Stopped")
+            # Devices plugged in while playing show up once PortAudio can re-initialize
+            self.devices.refresh_if_stale()
 
     def _audio_callback(self, outdata, frames, time, status):
-        if status:
-            print(status)
-        
-        # Initialize silence
-        outdata.fill(0)
-        
-        # Use cached graph structure
-        cached_graph = getattr(self, '_cached_graph', None)
-        
-        if not cached_graph or not self.playback_context:
+        started = time_module.perf_counter()
+        self._block_started = started
+        if self._first_callback:
+            self._first_callback = False
+            trace.mark("first_callback")
+
+        probe = self.allocation_probe
+        if probe:
+            probe.begin()
+            self._render(outdata, frames)
+            probe.end()
+        else:
+            self._render(outdata, frames)
+
+        duration = time_module.perf_counter() - started
+        self.callback_stats.record(duration, frames, status)
+        sizer = self.block_sizer
+        if sizer is not None:
+            sizer.record(duration, frames, bool(status))
+
+    def _render(self, outdata, frames):
+        # Steady state allocates nothing: every buffer written here is preallocated
+        plan = self._plan
+        if plan is not self._rendered_plan:
+            # First block of a newly published plan: hand gates and phases over here,
+            # so nothing the previous plan did after compiling this one is lost
+            if self._rendered_plan is not None:
+                plan.take_over(self._rendered_plan)
+            self._rendered_plan = plan
+        if not plan.processors or not self.playback_context:
+            outdata.fill(0)
             return
 
-        # Per-block cache for source generation to handle shared sources
-        # Key: source_node_id, Value: audio_chunk
-        self._block_source_cache = {}
-
-        channels = outdata.shape[1]
-        # Buffer to accumulate audio for this block
-        mixed_audio = np.zeros((frames, channels), dtype=np.float32)
-
-        for channel_info in cached_graph['channels']:
-            channel_node = cached_graph['nodes'].get(channel_info['id'])
-            if not channel_node: continue
-            
-            for input_info in channel_info['inputs']:
-                source_node = cached_graph['nodes'].get(input_info['source_id'])
-                if source_node:
-                    # Process source
-                    audio_chunk = self._process_source_cached(source_node, input_info['triggers'], frames)
-                    
-                    # Apply channel mapping
-                    channel_index = self.get_node_property(channel_node, "channel_index", 0)
-                    volume = self.get_node_property(channel_node, "volume", 1.0)
-                    source_channel_index = self.get_node_property(channel_node, "source_channel_index", 0)
-                    
-                    if channel_index > 0:
-                        idx = channel_index - 1
-                        if idx < channels:
-                            # Mix to this channel
-                            src_signal = audio_chunk
-                            
-                            # Handle source channel selection
-                            if src_signal.shape[1] > 1:
-                                if source_channel_index > 0:
-                                     # Select specific channel (1-based index)
-                                     src_idx = source_channel_index - 1
-                                     if src_idx < src_signal.shape[1]:
-                                         src_signal = src_signal[:, src_idx:src_idx+1]
-                                     else:
-                                         src_signal = np.zeros((frames, 1), dtype=np.float32)
-                                else:
-                                     # Mix down to mono
-                                     src_signal = np.mean(src_signal, axis=1, keepdims=True)
-                            
-                            mixed_audio[:, idx] += src_signal[:, 0] * volume
+        # One snapshot for the whole block: a multi-key update is seen entirely or not at all
+        snapshot = self._params
+        if snapshot.slots is not plan.snapshot.slots:
+            # Topology changed since this plan was built; stay on its numbering
+            snapshot = plan.snapshot
+        params = snapshot.params
+
+        mixer = plan.mixer
+        if frames > mixer.max_frames or outdata.shape[1] != self._primary_channels:
+            # Stream does not match the plan (should not happen once started)
+            outdata.fill(0)
+            return
+        full_block = frames == mixer.max_frames
+        frame = self.playback_context.current_frame
+
+        # Open the gates of every trigger due in this block, at their exact frame
+        if self.events:
+            self.events.dispatch(plan.trigger_gates, plan.file_processors, frame, frames)
+
+        # Render each source once into its columns of the preallocated stack
+        source_times = self.callback_stats.block_sources
+        for proc, columns in plan.jobs:
+            if not full_block:
+                columns = columns[:frames]
+            if proc.triggered:
+                job_started = time_module.perf_counter()
+                proc.render(params, columns, frame)
+                source_times[proc.kind] += time_module.perf_counter() - job_started
+            else:
+                columns.fill(0)
 
-        # Update playback position
-        if self.playback_context:
-            self.playback_context.current_frame += frames
-
-        # Clip to prevent distortion
-        np.clip(mixed_audio, -1.0, 1.0, out=mixed_audio)
-        outdata[:] = mixed_audio
-
-    def _load_file_data(self, file_path):
-        if file_path in self._file_cache:
-            return self._file_cache[file_path]
-            
-        # Load
-        print(f"Loading audio file: {file_path}")
-        data, channels, sr = load_audio_file(file_path, self.sample_rate)
-        
-        if data is not None:
-            self._file_cache[file_path] = data
-            return data
-        return None
-
-    def _process_source_cached(self, source_node, trigger_ids, frames):
-        # Check block cache first
-        if hasattr(self, '_block_source_cache') and source_node.id in self._block_source_cache:
-            return self._block_source_cache[source_node.id]
-
-        # Optimized process source that doesn't traverse graph
-        is_triggered = False
-        
-        # Check triggers
-        if trigger_ids:
-             # Logic for trigger type. If any trigger is present, we consider it triggered for now
-             # In future, check trigger state
-             is_triggered = True
-        
-        result = np.zeros((frames, 1), dtype=np.float32)
-        if is_triggered:
-            source_type = self.get_node_property(source_node, "source_type", SourceType.WAVE)
-            
-            if source_type == SourceType.WAVE:
-                result = self._generate_wave(source_node, frames)
-            elif source_type == SourceType.FILE:
-                file_path = self.get_node_property(source_node, "file_path", "")
-                if file_path:
-                    audio_data = self._load_file_data(file_path)
-                    if audio_data is not None:
-                        # Properties
-                        start_time = self.get_node_property(source_node, "start_time", 0.0)
-                        end_time = self.get_node_property(source_node, "end_time", 0.0)
-                        loop = self.get_node_property(source_node, "loop", False)
-                        
-                        total_file_samples = len(audio_data)
-                        start_offset = int(start_time * self.sample_rate)
-                        end_offset = int(end_time * self.sample_rate)
-                        
-                        # Validate range
-                        if start_offset < 0: start_offset = 0
-                        if end_offset <= start_offset or end_offset > total_file_samples:
-                            end_offset = total_file_samples
-                            
-                        play_len = end_offset - start_offset
-                        
-                        if play_len <= 0:
-                             result = np.zeros((frames, audio_data.shape[1]), dtype=np.float32)
-                        else:
-                            # Calculate current position in the "playable window"
-                            current_frame = self.playback_context.current_frame
-                            
-                            if loop:
-                                relative_pos = current_frame % play_len
-                            else:
-                                relative_pos = current_frame
-                                
-                            # Map to file index
-                            start_sample = start_offset + relative_pos
-                            
-                            if relative_pos < play_len:
-                                # We have some samples to play
-                                available = play_len - relative_pos
-                                to_read = min(frames, available)
-                                
-                                result = np.zeros((frames, audio_data.shape[1]), dtype=np.float32)
-                                
-                                # Read main chunk
-                                chunk = audio_data[start_sample : start_sample + to_read]
-                                result[:to_read] = chunk
-                                
-                                # Handle loop wrapping within the block if needed
-                                if to_read < frames and loop:
-                                    remaining = frames - to_read
-                                    # Wrap back to start_offset
-                                    # This can be complex if loop_len < frames, but for simplicity:
-                                    # Just fill from start
-                                    # Recurse or loop? Simple fill for now (one wrap per block max assumption, but play_len could be small)
-                                    # Better:
-                                    filled = to_read
-                                    while filled < frames:
-                                        needed = frames - filled
-                                        # Start from start_offset
-                                        chunk_len = min(needed, play_len)
-                                        result[filled : filled + chunk_len] = audio_data[start_offset : start_offset + chunk_len]
-                                        filled += chunk_len
-                            else:
-                                # Past end, silence
-                                result = np.zeros((frames, audio_data.shape[1]), dtype=np.float32)
-        
-        # Cache the result
-        if hasattr(self, '_block_source_cache'):
-            self._block_source_cache[source_node.id] = result
-            
-        return result
-
-    def _process_source(self, source_node, frames):
-        # Legacy method kept for compatibility if needed, but not used in optimized path
-        return self._process_source_cached(source_node, [], frames)
-
-    def _generate_wave(self, source_node, frames):
-        state = self.playback_context.get_state(source_node.id, lambda: {"phase": 0.0})
-        phase = state["phase"]
-        
-        # Use new get_node_property method
-        try:
-            frequency = float(self.get_node_property(source_node, "frequency", 440.0))
-        except (ValueError, TypeError):
-            frequency = 440.0
-            
-        wave_type = self.get_node_property(source_node, "wave_type", "sine")
-        
-        # Phase increment per sample
-        phase_increment = frequency / self.sample_rate
-        
-        # Generate phase array
-        phases = phase + np.arange(frames) * phase_increment
-        
-        if wave_type == "sine":
-            audio = np.sin(2 * np.pi * phases)
-        elif wave_type == "square":
-            audio = np.sign(np.sin(2 * np.pi * phases))
-        elif wave_type == "sawtooth":
-            audio = 2 * (phases % 1) - 1
+        # Route, mix and clip every source into every output channel at once
+        mix_buffer = self._mix_buffer
+        outputs = self.device_outputs
+        if mix_buffer is None or (outdata.dtype == np.float32 and not outputs):
+            mixer.mix_into(outdata, frames)
         else:
-            audio = np.sin(2 * np.pi * phases)
-            
-        # Update state
-        # Keep phase within [0, 1) to avoid overflow
-        state["phase"] = (phase + frames * phase_increment) % 1.0
-        
-        return audio.reshape(-1, 1).astype(np.float32)
+            # Several devices or an integer format: mix in float, then hand each device its columns
+            mixed = mix_buffer[:frames]
+            mixer.mix_into(mixed, frames)
+            primary = mixed[:, :self._primary_channels]
+            if outdata.dtype == np.float32:
+                np.copyto(outdata, primary)
+            else:
+                np.multiply(primary, self._format_scale, out=outdata, casting='unsafe')
+            for output in outputs:
+                output.push(mixed)
+
+        # Update playback position
+        self.playback_context.current_frame = frame + frames
 
     def get_devices(self):
-        return sd.query_devices()
+        return self.devices.all()
 
     def get_default_output_device_info(self):
-        try:
-            return sd.query_devices(kind='output')
-        except Exception as e:
-            print(f"Error querying output device: {e}")
-            return {"name": "Default", "max_output_channels": 2}
+        return self.devices.default_output() or {"name": "Default", "max_output_channels": 2}
@@ -0,0 +1,79 @@
+import tracemalloc
+import numpy as np
+from typing import Dict, Tuple
+
+class BufferPool:
+    """
+    Scratch memory for the audio callback, allocated once from the block
+    size and output width. Processors claim their buffers when a plan is
+    published (UI thread) and only write into views of them while rendering.
+    Buffers are shared: processors render one after another, so a scratch
+    buffer is only valid until the next processor runs.
+    """
+    def __init__(self, max_frames: int, out_channels: int):
+        self.max_frames = max_frames
+        self.out_channels = out_channels
+        # Read-only sample index ramp 0..max_frames-1
+        self.ramp = np.arange(max_frames, dtype=np.float64)
+        self.ramp.flags.writeable = False
+        self._scratch: Dict[Tuple[str, str, int], np.ndarray] = {}
+
+    def scratch(self, name: str, dtype=np.float64, width: int = 1) -> np.ndarray:
+        """
+        Returns the shared scratch buffer `name`, creating it on first use.
+        Call while preparing a plan, never from the callback.
+        """
+        key = (name, np.dtype(dtype).name, width)
+        buf = self._scratch.get(key)
+        if buf is None:
+            shape = (self.max_frames,) if width == 1 else (self.max_frames, width)
+            buf = np.zeros(shape, dtype=dtype)
+            self._scratch[key] = buf
+        return buf
+
+class AllocationProbe:
+    """
+    Debug helper that measures heap growth inside each callback with tracemalloc.
+    After `warmup_blocks` callbacks any block whose transient allocations exceed
+    `slack_bytes` is reported, and raises AssertionError when `strict` is set.
+    The slack absorbs interpreter bookkeeping (small ints, view objects); an
+    audio-sized buffer allocation always exceeds it.
+    """
+    def __init__(self, warmup_blocks: int = 32, slack_bytes: int = 512, strict: bool = True):
+        self.warmup_blocks = warmup_blocks
+        self.slack_bytes = slack_bytes
+        self.strict = strict
+
+        self.blocks = 0
+        self.last_bytes = 0
+        self.max_bytes = 0
+        self.allocating_blocks = 0
+        self._start = 0
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin(self):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def end(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        allocated = max(0, peak - self._start)
+        self.blocks += 1
+        self.last_bytes = allocated
+        if self.blocks <= self.warmup_blocks:
+            return
+        self.max_bytes = max(self.max_bytes, allocated)
+        if allocated > self.slack_bytes:
+            self.allocating_blocks += 1
+            if self.strict:
+                raise AssertionError(f"Audio callback allocated {allocated} bytes in steady state")
+
+    def stats(self):
+        return {
+            "blocks": self.blocks,
+            "last_bytes": self.last_bytes,
+            "max_bytes": self.max_bytes,
+            "allocating_blocks": self.allocating_blocks
+        }
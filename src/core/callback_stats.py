@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Any, Dict
+
+# Source processor kinds timed separately (see SourceProcessor.kind)
+SOURCE_KINDS = ("wave", "file")
+
+# Upper edges of the callback duration histogram, in ms; the last bucket is open-ended
+HISTOGRAM_EDGES_MS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+
+class CallbackStats:
+    """
+    Timing of the last `capacity` audio callbacks, for the UI and for tuning
+    the latency profile. The callback writes one row of preallocated arrays
+    per block (duration, frames, time spent per source kind) and bumps a few
+    counters; everything else (percentiles, histogram, load) is computed by
+    get_stats() on the reader's thread. Rows are not locked: a row being
+    written while get_stats() copies it only skews one sample.
+    """
+    def __init__(self, sample_rate: int, capacity: int = 2048):
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.source_times = np.zeros((capacity, len(SOURCE_KINDS)), dtype=np.float64)
+        # Time per kind in the block being rendered, added up by SourceProcessor jobs
+        self.block_sources = np.zeros(len(SOURCE_KINDS), dtype=np.float64)
+        self.blocks = 0 # Total blocks recorded; the next row is blocks % capacity
+        self.underflows = 0
+        self.overflows = 0
+        self.late_blocks = 0 # Rendering took longer than the block lasts
+
+    def reset(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.blocks = 0
+        self.underflows = 0
+        self.overflows = 0
+        self.late_blocks = 0
+        self.block_sources.fill(0)
+
+    def record(self, duration: float, frames: int, status):
+        # Callback side: close the block the sources were timed in
+        row = self.blocks % self.capacity
+        self.durations[row] = duration
+        self.frames[row] = frames
+        self.source_times[row] = self.block_sources
+        self.block_sources.fill(0)
+        if status:
+            # sounddevice CallbackFlags; counted here instead of printed on the audio thread
+            if status.output_underflow:
+                self.underflows += 1
+            if status.output_overflow:
+                self.overflows += 1
+        if duration * self.sample_rate > frames:
+            self.late_blocks += 1
+        self.blocks += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        count = min(self.blocks, self.capacity)
+        durations = self.durations[:count].copy()
+        frames = self.frames[:count].copy()
+        source_times = self.source_times[:count].copy()
+        deadlines = np.maximum(frames, 1) / self.sample_rate
+        last_frames = int(self.frames[(self.blocks - 1) % self.capacity]) if count else 0
+        stats = {
+            "blocks": self.blocks,
+            "window": count,
+            "sample_rate": self.sample_rate,
+            "block_size": last_frames,
+            "deadline_ms": 1000.0 * last_frames / self.sample_rate,
+            "underflows": self.underflows,
+            "overflows": self.overflows,
+            "late_blocks": self.late_blocks,
+            "xruns": self.underflows + self.overflows,
+        }
+        if count == 0:
+            stats.update(duration_ms={}, source_ms={kind: 0.0 for kind in SOURCE_KINDS},
+                         histogram=[], cpu_load=0.0, peak_load=0.0)
+            return stats
+
+        durations_ms = durations * 1000.0
+        stats["duration_ms"] = {
+            "mean": float(durations_ms.mean()),
+            "p50": float(np.percentile(durations_ms, 50)),
+            "p99": float(np.percentile(durations_ms, 99)),
+            "max": float(durations_ms.max()),
+        }
+        # Mean time per block spent in each source kind; the rest is mixing and overhead
+        source_ms = source_times.mean(axis=0) * 1000.0
+        stats["source_ms"] = {kind: float(ms) for kind, ms in zip(SOURCE_KINDS, source_ms)}
+        stats["source_ms"]["other"] = max(0.0, stats["duration_ms"]["mean"] - float(source_ms.sum()))
+
+        counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, durations_ms),
+                             minlength=len(HISTOGRAM_EDGES_MS) + 1)
+        stats["histogram"] = [(edge, int(n)) for edge, n in zip(HISTOGRAM_EDGES_MS + (float("inf"),), counts)]
+
+        # Share of real time spent rendering (per cent), over the window and at the worst block
+        stats["cpu_load"] = 100.0 * float(durations.sum() / deadlines.sum())
+        stats["peak_load"] = 100.0 * float((durations / deadlines).max())
+        return stats
@@ -37,3 +37,21 @@ class ConfigManager:
     def set_last_opened_file(self, file_path):
         self.config["last_opened_file"] = file_path
         self.save_config()
+
+    def get_pcm_cache_dir(self):
+        return self.config.get("pcm_cache_dir")
+
+    def get_pcm_cache_max_mb(self):
+        return self.config.get("pcm_cache_max_mb")
+
+    def get_startup_report(self):
+        # Where the startup timeline is written; empty/false disables it
+        return self.config.get("startup_report", "startup_report.txt")
+
+    def get_engine_host(self):
+        # Run the audio engine in a separate process
+        return bool(self.config.get("engine_host", False))
+
+    def get_media_dirs(self):
+        # Folders indexed (and watched) in the background after start-up
+        return self.config.get("media_dirs", [])
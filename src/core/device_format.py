@@ -0,0 +1,45 @@
+import numpy as np
+from typing import Callable, Optional, Tuple
+
+# Sample formats the callback can write, best first. float32 is what the
+# mixer produces; integer formats are converted with one multiply per block.
+SAMPLE_FORMATS = ("float32", "int32", "int16")
+DEFAULT_SAMPLE_RATE = 44100
+# Tried, in order, when the device reports no usable default rate
+COMMON_SAMPLE_RATES = (48000, 44100, 96000, 88200, 32000)
+
+# Full-scale factor per integer format. int32 uses the largest float32 below
+# 2**31 so a clipped +1.0 does not wrap around.
+FORMAT_SCALES = {
+    "int32": float(np.nextafter(np.float32(2 ** 31), np.float32(0))),
+    "int16": 32767.0,
+}
+
+def native_sample_rate(device_info) -> Optional[int]:
+    # Rate the device (or its host API mixer) runs at when nobody asks for another
+    try:
+        rate = int(round(float(device_info.get("default_samplerate") or 0)))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return rate if rate > 0 else None
+
+def negotiate_output_format(device_info, check: Callable[[int, str], bool],
+                            preferred_rate: Optional[int] = None) -> Tuple[int, str]:
+    """
+    Picks the (sample rate, sample format) to open the device with.
+    `check(rate, format)` says whether the device accepts a setting
+    (sounddevice.check_output_settings in the engine). The explicit
+    `preferred_rate` wins, then the device's native rate so the host does not
+    resample in the real-time path, then the common rates; the first format
+    in SAMPLE_FORMATS the device accepts at that rate is used.
+    """
+    rates = []
+    for rate in (preferred_rate, native_sample_rate(device_info)) + COMMON_SAMPLE_RATES:
+        if rate and rate not in rates:
+            rates.append(int(rate))
+    for rate in rates:
+        for sample_format in SAMPLE_FORMATS:
+            if check(rate, sample_format):
+                return rate, sample_format
+    # Nothing confirmed (e.g. the query itself failed): let the host convert
+    return rates[0] if rates else DEFAULT_SAMPLE_RATE, SAMPLE_FORMATS[0]
@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+import sounddevice as sd
+from typing import Callable, Dict, List, Optional
+
+try:
+    import pyudev # Optional: hotplug events from udev; sysfs is polled otherwise
+except ImportError:
+    pyudev = None
+
+SYSFS_SOUND = "/sys/class/sound"
+PROC_CARDS = "/proc/asound/cards"
+POLL_INTERVAL = 2.0 # Seconds between sysfs checks without udev
+SETTLE_TIME = 0.5 # A card appears as several nodes; wait for the burst to end
+
+# ALSA device names end in the card/device numbers, which follow plug order
+_HW_SUFFIX = re.compile(r"\s*\(hw:\d+,\d+\)$")
+
+def stable_name(name: str) -> str:
+    # Device name without "(hw:1,0)": the same card keeps it across boots and replugs
+    return _HW_SUFFIX.sub("", name or "")
+
+def hardware_signature() -> Optional[tuple]:
+    # The sound cards present, read from sysfs/procfs without touching PortAudio.
+    # None where neither exists (no hotplug detection, refresh() still works).
+    signature = []
+    try:
+        signature.append(tuple(sorted(os.listdir(SYSFS_SOUND))))
+    except OSError:
+        pass
+    try:
+        with open(PROC_CARDS) as f:
+            signature.append(f.read())
+    except OSError:
+        pass
+    return tuple(signature) if signature else None
+
+class DeviceRegistry:
+    """
+    The PortAudio device list, enumerated once and shared by the engine and
+    the UI instead of a query_devices() call per lookup (hundreds of ms on
+    ALSA, and enough to glitch a running stream).
+
+    A monitor thread (udev events, or sysfs polling) marks the list stale
+    when a sound card comes or goes. PortAudio only sees new devices after
+    re-initializing, which closes every stream, so the list is refreshed
+    right away only while `is_busy()` is false; otherwise the owner calls
+    refresh_if_stale() once its streams are closed. Listeners are called,
+    from the refreshing thread, whenever the list actually changed.
+    """
+    def __init__(self, lock=None, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        # Held while re-initializing PortAudio; the engine passes its stream lock
+        self._lock = lock or threading.RLock()
+        self.is_busy: Callable[[], bool] = lambda: False
+        self.listeners: List[Callable[['DeviceRegistry'], None]] = []
+        self.stale = False
+        self._devices: Optional[List[Dict]] = None
+        self._default_output: Optional[Dict] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # Lookups (enumerate on first use)
+
+    def all(self) -> List[Dict]:
+        # Every device as a dict with its 'index'
+        if self._devices is None:
+            self.refresh()
+        return self._devices
+
+    def outputs(self) -> List[Dict]:
+        return [{'index': d['index'], 'name': d['name'], 'channels': d['max_output_channels'], 'api': d['hostapi']}
+                for d in self.all() if d['max_output_channels'] > 0]
+
+    def device(self, index) -> Optional[Dict]:
+        devices = self.all()
+        if index is None or not 0 <= index < len(devices):
+            return None
+        return devices[index]
+
+    def default_output(self) -> Optional[Dict]:
+        self.all()
+        return self._default_output
+
+    def find(self, name: str) -> Optional[int]:
+        # Index of the output device called `name`: exact match first, then the
+        # same card under other ALSA numbers
+        outputs = self.outputs()
+        for device in outputs:
+            if device['name'] == name:
+                return device['index']
+        wanted = stable_name(name)
+        for device in outputs:
+            if stable_name(device['name']) == wanted:
+                return device['index']
+        return None
+
+    # Refreshing
+
+    def refresh(self, reinitialize: bool = False) -> bool:
+        # Re-enumerates; returns whether the device list changed
+        with self._lock:
+            if reinitialize:
+                sd._terminate()
+                sd._initialize()
+            try:
+                devices = [dict(device, index=index) for index, device in enumerate(sd.query_devices())]
+            except Exception as e:
+                print(f"Error listing devices: {e}")
+                devices = []
+            try:
+                default_output = dict(sd.query_devices(kind='output'))
+            except Exception as e:
+                print(f"Error querying output device: {e}")
+                default_output = None
+            previous = self._devices
+            self._devices = devices
+            self._default_output = default_output
+            self.stale = False
+        self._start_monitor()
+        changed = previous is not None and [d['name'] for d in previous] != [d['name'] for d in devices]
+        if changed:
+            for listener in list(self.listeners):
+                listener(self)
+        return changed
+
+    def refresh_if_stale(self) -> bool:
+        # Checked under the lock, so no stream opens between the check and re-initializing
+        with self._lock:
+            if not self.stale or self.is_busy():
+                return False
+            return self.refresh(reinitialize=True)
+
+    def close(self):
+        self._stop.set()
+
+    def _hotplug(self):
+        self.stale = True
+        self.refresh_if_stale()
+        if self.stale:
+            print("Audio devices changed; the list refreshes when playback stops")
+
+    def _start_monitor(self):
+        if self._monitor is not None:
+            return
+        target = self._run_udev if pyudev is not None else self._run_polling
+        self._monitor = threading.Thread(target=target, name="DeviceMonitor", daemon=True)
+        self._monitor.start()
+
+    def _run_udev(self):
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by('sound')
+        except Exception as e:
+            print(f"udev monitoring unavailable ({e}); polling sysfs")
+            self._run_polling()
+            return
+        while not self._stop.is_set():
+            if monitor.poll(timeout=self.poll_interval) is not None:
+                while monitor.poll(timeout=SETTLE_TIME) is not None:
+                    pass
+                self._hotplug()
+
+    def _run_polling(self):
+        signature = hardware_signature()
+        if signature is None:
+            return
+        while not self._stop.wait(self.poll_interval):
+            current = hardware_signature()
+            if current != signature:
+                self._stop.wait(SETTLE_TIME)
+                signature = hardware_signature()
+                self._hotplug()
@@ -0,0 +1,433 @@
+import atexit
+import os
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from multiprocessing.connection import Connection
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+from src.core.graph import Graph
+from src.core.latency import PROFILE_NAMES, DEFAULT_PROFILE
+from src.core.playhead import STOPPED, PLAYING, SEEKING, FINISHED
+from src.utils.startup_trace import trace
+
+# Telemetry block shared with the UI process: a header, then one row per file
+# source (assigned by the host and announced with a "rows" event).
+# header: sequence (odd while being written), is_playing, sample_rate, current_frame
+HEADER = 4
+MAX_SOURCES = 64
+ROW = 6 # position, start, end (seconds), iteration, playhead state, load state
+PLAYHEAD_STATES = (STOPPED, PLAYING, SEEKING, FINISHED)
+LOAD_STATES = ("idle", "loading", "ready", "error")
+PUBLISH_INTERVAL = 0.05
+
+# Engine calls the UI process may make, and whether it waits for the result
+COMMANDS = {
+    "set_graph": False,
+    "update_properties": False,
+    "fire_trigger": False,
+    "seek_source": False,
+    "restart_source": False,
+    "set_latency_profile": False,
+    "set_output_device": False,
+    "configure_cache": False,
+    "start": True,
+    "stop": True,
+    "get_available_devices": True,
+    "find_output_device": True,
+    "get_default_output_device_info": True,
+    "get_devices": True,
+    "get_cache_stats": True,
+    "get_device_stats": True,
+    "get_stats": True,
+}
+
+def _telemetry_array(memory) -> np.ndarray:
+    return np.ndarray(HEADER + MAX_SOURCES * ROW, dtype=np.float64, buffer=memory.buf)
+
+def _attach(name: str):
+    # The UI process owns (and unlinks) the block; keep this process's tracker off it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: # Python < 3.13
+        from multiprocessing import resource_tracker
+        memory = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+class EngineHost:
+    """
+    The child side of engine-host mode: owns the AudioEngine, applies the
+    commands read from the pipe in order and publishes telemetry into shared
+    memory from a low-priority thread. Nothing here runs on the audio thread,
+    and nothing the UI process does (graph rebuilds, widget drags, GC) holds
+    this interpreter's GIL.
+    """
+    def __init__(self, commands: Connection, events: Connection, telemetry_name: str):
+        # Only the child imports the engine (and sounddevice, which initializes PortAudio)
+        from src.core.audio_engine import AudioEngine
+        self.commands = commands
+        self.events = events
+        self._events_lock = threading.Lock()
+        # The seqlock takes one writer at a time: the publisher thread, and play-state
+        # changes (command or stream-reopen thread) that publish before their event
+        self._publish_lock = threading.Lock()
+        self._memory = _attach(telemetry_name)
+        self.telemetry = _telemetry_array(self._memory)
+        self.engine = AudioEngine()
+        self.engine.on_play_state_change = self._on_play_state_change
+        self.engine.on_devices_changed = lambda: self._send(("devices_changed",))
+        self.graph: Optional[Graph] = None
+        self.rows: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._marks_sent = 0
+
+    def run(self):
+        publisher = threading.Thread(target=self._run_publisher, name="EngineTelemetry", daemon=True)
+        publisher.start()
+        try:
+            while True:
+                try:
+                    request_id, method, args = self.commands.recv()
+                except (EOFError, OSError):
+                    break # UI process went away
+                if method == "close":
+                    break
+                result = self._dispatch(method, args)
+                if request_id is not None:
+                    self._send(("reply", request_id, result))
+        finally:
+            self._stop.set()
+            self.engine.stop()
+            self.engine.file_loader.close_all()
+            publisher.join(timeout=1.0)
+            del self.telemetry
+            self._memory.close()
+
+    def _dispatch(self, method, args):
+        if method not in COMMANDS:
+            print(f"Engine host: unknown command {method}")
+            return None
+        try:
+            if method == "set_graph":
+                return self._set_graph(*args)
+            if method == "update_properties":
+                return self._update_properties(*args)
+            if method == "get_devices":
+                return [dict(device) for device in self.engine.get_devices()]
+            if method == "get_default_output_device_info":
+                return dict(self.engine.get_default_output_device_info())
+            return getattr(self.engine, method)(*args)
+        except Exception as e:
+            print(f"Engine host: {method} failed: {e}")
+            return None
+
+    def _set_graph(self, graph_data):
+        # Topology changes arrive as whole graphs; compiling keeps wave phases and file streams
+        self.graph = Graph.from_dict(graph_data) if graph_data else None
+        self.engine.set_graph(self.graph)
+        self._set_rows()
+
+    def _update_properties(self, node_id, values):
+        node = self.graph.nodes.get(node_id) if self.graph else None
+        if node is None:
+            return
+        # The UI already stored the values on its copy; mirror them, then recompile
+        node.properties.update(values)
+        self.engine.update_properties(node_id, values)
+        if set(self.engine.file_loader.streams) != set(self.rows):
+            # A file was assigned or cleared
+            self._set_rows()
+
+    def _set_rows(self):
+        # Telemetry rows of the file sources; a source keeps its row while it exists
+        streams = self.engine.file_loader.streams
+        rows = {node_id: row for node_id, row in self.rows.items() if node_id in streams}
+        free = [row for row in range(MAX_SOURCES) if row not in rows.values()]
+        for node_id in streams:
+            if node_id not in rows and free:
+                rows[node_id] = free.pop(0)
+        self.rows = rows
+        self._send(("rows", rows))
+
+    def _on_play_state_change(self, is_playing):
+        self._publish()
+        self._send(("play_state", is_playing))
+
+    def _send(self, message):
+        # Replies (command thread) and play-state events (any thread) share the pipe
+        with self._events_lock:
+            try:
+                self.events.send(message)
+            except (BrokenPipeError, OSError):
+                pass
+
+    def _run_publisher(self):
+        while not self._stop.wait(PUBLISH_INTERVAL):
+            self._publish()
+            self._forward_marks()
+
+    def _forward_marks(self):
+        # Startup marks taken here (stream_open, first_callback in the audio
+        # callback) belong on the UI's timeline, which writes the report
+        marks = trace.marks
+        while self._marks_sent < len(marks):
+            name, seconds = marks[self._marks_sent]
+            self._send(("mark", name, trace.origin + seconds))
+            self._marks_sent += 1
+
+    def _publish(self):
+        with self._publish_lock:
+            self._write_telemetry()
+
+    def _write_telemetry(self):
+        engine = self.engine
+        data = self.telemetry
+        context = engine.playback_context
+        data[0] += 1 # Odd: readers retry
+        data[1] = 1.0 if engine.is_playing else 0.0
+        data[2] = engine.sample_rate
+        data[3] = context.current_frame if context else 0
+        for node_id, row in list(self.rows.items()):
+            base = HEADER + row * ROW
+            position = engine.get_source_position(node_id)
+            if position:
+                data[base:base + 4] = (position["position"], position["start"],
+                                       position["end"], position["iteration"])
+                data[base + 4] = PLAYHEAD_STATES.index(position["state"])
+            state = engine.get_source_state(node_id)
+            data[base + 5] = LOAD_STATES.index(state) if state in LOAD_STATES else 0
+        data[0] += 1
+
+class RemoteEngine:
+    """
+    Engine-host mode, UI side. Stands in for AudioEngine in the Controller:
+    graph snapshots and property edits go to a child process over a command
+    pipe, queries that need an answer wait for the reply, and playback state
+    and source positions are read from shared memory without a round trip.
+    The child owns the output device, so audio never crosses the boundary.
+    """
+    def __init__(self, reply_timeout: float = 10.0):
+        self.reply_timeout = reply_timeout
+        self.graph: Optional[Graph] = None
+        self.latency_profile = DEFAULT_PROFILE
+        self.on_play_state_change = None
+        self.on_devices_changed = None
+        self.rows: Dict[str, int] = {}
+
+        self._memory = shared_memory.SharedMemory(create=True, size=(HEADER + MAX_SOURCES * ROW) * 8)
+        self.telemetry = _telemetry_array(self._memory)
+        self.telemetry.fill(0)
+
+        # Two one-way pipes handed to the child as plain file descriptors
+        command_read, command_write = os.pipe()
+        event_read, event_write = os.pipe()
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "src.core.engine_host", str(command_read), str(event_write), self._memory.name],
+            pass_fds=(command_read, event_write),
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        )
+        os.close(command_read)
+        os.close(event_write)
+        self._commands = Connection(command_write, readable=False)
+        self._events = Connection(event_read, writable=False)
+        self._send_lock = threading.Lock()
+
+        self._next_request = 0
+        self._replies: Dict[int, Any] = {}
+        self._replies_ready = threading.Condition()
+        self._reader = threading.Thread(target=self._run_reader, name="EngineHostEvents", daemon=True)
+        self._reader.start()
+        self._closed = False
+        atexit.register(self.close)
+
+    # Commands
+
+    def set_graph(self, graph: Graph):
+        self.graph = graph
+        if graph:
+            for node in graph.nodes.values():
+                node.on_property_change = self.update_property
+                node.on_properties_change = self.update_properties
+            profile = graph.settings.get("latency_profile", DEFAULT_PROFILE)
+            self.latency_profile = profile if profile in PROFILE_NAMES else DEFAULT_PROFILE
+        self._send("set_graph", graph.to_dict() if graph else None)
+
+    def notify_graph_change(self):
+        self.set_graph(self.graph)
+
+    def update_property(self, node_id, key, value):
+        self.update_properties(node_id, {key: value})
+
+    def update_properties(self, node_id, values):
+        self._send("update_properties", node_id, dict(values))
+
+    def fire_trigger(self, trigger_id, frame=None):
+        if not self.is_playing:
+            return False
+        self._send("fire_trigger", trigger_id, frame)
+        return True
+
+    def seek_source(self, node_id, seconds):
+        if not self.is_playing:
+            return False
+        self._send("seek_source", node_id, seconds)
+        return True
+
+    def restart_source(self, node_id):
+        if not self.is_playing:
+            return False
+        self._send("restart_source", node_id)
+        return True
+
+    def set_latency_profile(self, name):
+        self.latency_profile = name if name in PROFILE_NAMES else DEFAULT_PROFILE
+        self._send("set_latency_profile", name)
+
+    def set_output_device(self, device_index):
+        self._send("set_output_device", device_index)
+
+    def configure_cache(self, cache_dir=None, max_bytes=None):
+        self._send("configure_cache", cache_dir, max_bytes)
+
+    def start(self, device_index=None):
+        return self._call("start", device_index)
+
+    def stop(self):
+        return self._call("stop")
+
+    def get_available_devices(self):
+        return self._call("get_available_devices") or []
+
+    def find_output_device(self, name):
+        return self._call("find_output_device", name)
+
+    def get_default_output_device_info(self):
+        return self._call("get_default_output_device_info") or {"name": "Default", "max_output_channels": 2}
+
+    def get_devices(self):
+        return self._call("get_devices") or []
+
+    def get_cache_stats(self):
+        return self._call("get_cache_stats")
+
+    def get_device_stats(self):
+        return self._call("get_device_stats") or []
+
+    def get_stats(self):
+        return self._call("get_stats") or {}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._send("close")
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5.0)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._commands.close()
+        del self.telemetry
+        self._memory.close()
+        self._memory.unlink()
+
+    # Telemetry (shared memory, no round trip)
+
+    @property
+    def is_playing(self) -> bool:
+        return bool(self._snapshot()[1])
+
+    def get_source_state(self, node_id) -> str:
+        row = self._row(node_id)
+        if row is None:
+            return "idle"
+        return LOAD_STATES[int(row[5])]
+
+    def get_source_position(self, node_id):
+        row = self._row(node_id)
+        if row is None:
+            return None
+        return {
+            "position": row[0],
+            "start": row[1],
+            "end": row[2],
+            "iteration": int(row[3]),
+            "state": PLAYHEAD_STATES[int(row[4])],
+        }
+
+    def _row(self, node_id):
+        row = self.rows.get(node_id)
+        if row is None:
+            return None
+        base = HEADER + row * ROW
+        return self._snapshot()[base:base + ROW]
+
+    def _snapshot(self) -> np.ndarray:
+        # Seqlock read: retry while the host is mid-write
+        data = self.telemetry
+        for _ in range(100):
+            sequence = data[0]
+            if int(sequence) % 2 == 0:
+                copy = data.copy()
+                if data[0] == sequence:
+                    return copy
+            time.sleep(0.0001)
+        return data.copy()
+
+    # Pipe
+
+    def _send(self, method, *args, request_id=None):
+        with self._send_lock:
+            self._commands.send((request_id, method, args))
+
+    def _call(self, method, *args):
+        with self._replies_ready:
+            self._next_request += 1
+            request_id = self._next_request
+        self._send(method, *args, request_id=request_id)
+        deadline = time.monotonic() + self.reply_timeout
+        with self._replies_ready:
+            while request_id not in self._replies:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._reader.is_alive():
+                    print(f"Engine host did not answer {method}")
+                    return None
+                self._replies_ready.wait(remaining)
+            return self._replies.pop(request_id)
+
+    def _run_reader(self):
+        while True:
+            try:
+                message = self._events.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == "reply":
+                with self._replies_ready:
+                    self._replies[message[1]] = message[2]
+                    self._replies_ready.notify_all()
+            elif kind == "rows":
+                self.rows = message[1]
+            elif kind == "play_state":
+                if self.on_play_state_change:
+                    self.on_play_state_change(message[1])
+            elif kind == "devices_changed":
+                if self.on_devices_changed:
+                    self.on_devices_changed()
+            elif kind == "mark":
+                trace.mark_at(message[1], message[2])
+        with self._replies_ready:
+            self._replies_ready.notify_all()
+
+def main(argv):
+    command_fd, event_fd, telemetry_name = int(argv[1]), int(argv[2]), argv[3]
+    host = EngineHost(Connection(command_fd, writable=False), Connection(event_fd, readable=False), telemetry_name)
+    host.run()
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,90 @@
+from typing import Dict, Optional
+from src.core.graph import Graph
+from src.core.node_types import SourceType
+from src.core.params import ParamSnapshot, SourceParams
+from src.core.file_stream import FileStream
+from src.core.segment_timeline import iterations_for
+from src.utils.pcm_cache import PcmCache
+from src.utils.pcm_format import DEFAULT_STORAGE_FORMAT, resolve_format
+
+class FileLoader:
+    """
+    Loader service for file sources.
+    Keeps one FileStream per file source in the graph and starts every
+    probe/decode as soon as the graph changes, so the audio callback only
+    ever reads buffers that are already in memory.
+    """
+    def __init__(self, sample_rate: int, cache: Optional[PcmCache]):
+        self.sample_rate = sample_rate
+        self.cache = cache
+        # Storage format of decoded PCM for sources that do not choose their own
+        self.storage_format = DEFAULT_STORAGE_FORMAT
+        # Replaced entries are closed, never mutated
+        self.streams: Dict[str, FileStream] = {}
+        # Called when a stream is created/replaced/removed or learns its format,
+        # so the owner can recompile anything that holds stream references
+        self.on_streams_changed = None
+
+    def sync(self, graph: Optional[Graph], snapshot: ParamSnapshot):
+        # Called from set_graph/notify_graph_change (UI thread)
+        nodes = graph.nodes if graph else {}
+        for node_id in list(self.streams.keys()):
+            if node_id not in nodes:
+                self.streams.pop(node_id).close()
+        for node_id in nodes:
+            params = snapshot.get(node_id)
+            if isinstance(params, SourceParams):
+                self.sync_node(node_id, params)
+
+    def sync_node(self, node_id: str, params: SourceParams) -> bool:
+        # Returns True if the stream for this node was created, replaced or removed
+        file_path = params.file_path if params.source_type == SourceType.FILE else ""
+        storage_format = resolve_format(params.storage_format or self.storage_format)
+
+        stream = self.streams.get(node_id)
+        if (stream and stream.file_path == file_path and stream.sample_rate == self.sample_rate
+                and stream.storage_format == storage_format):
+            return False
+        if stream:
+            self.streams.pop(node_id, None)
+            stream.close()
+        if file_path:
+            # The stream itself queues a cache decode, and only for files it cannot play in place
+            stream = FileStream(file_path, self.sample_rate, cache=self.cache, storage_format=storage_format)
+            stream.on_format = self._on_stream_format
+            self.streams[node_id] = stream
+            self.apply_segment(node_id, params)
+            stream.start()
+        return True
+
+    def _on_stream_format(self, stream):
+        if self.on_streams_changed:
+            self.on_streams_changed()
+
+    def apply_segment(self, node_id: str, params: SourceParams):
+        stream = self.streams.get(node_id)
+        if stream:
+            stream.set_segment(params.start_time, params.end_time,
+                               iterations_for(params.playback_mode, params.loop_count, params.loop),
+                               params.padding_before, params.padding_after)
+
+    def rewind_all(self):
+        # Streams still at their start keep their prebuffer (e.g. headless waits for it)
+        for stream in self.streams.values():
+            if not stream.at_start():
+                stream.restart()
+
+    def close_all(self):
+        for stream in self.streams.values():
+            stream.close()
+        self.streams = {}
+
+    def get_state(self, node_id: str) -> str:
+        # idle (no file), loading, ready or error
+        stream = self.streams.get(node_id)
+        if not stream:
+            return "idle"
+        return stream.state
+
+    def is_loading(self) -> bool:
+        return any(stream.state == "loading" for stream in self.streams.values())
@@ -0,0 +1,370 @@
+import threading
+import time
+import numpy as np
+from typing import Optional
+from src.utils.audio_loader import get_audio_info, open_audio_reader
+from src.utils.pcm_file import open_pcm_file
+from src.utils.pcm_cache import PcmCache
+from src.utils.pcm_format import decode_into
+from src.core.playhead import Playhead, PLAYING, FINISHED
+from src.core.segment_timeline import SegmentTimeline
+
+class RingBuffer:
+    """
+    Single-producer / single-consumer ring of audio frames.
+    The reader thread only touches `written`, the audio thread only
+    touches `consumed`, so no lock is needed between them.
+    """
+    def __init__(self, capacity: int, channels: int):
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.written = 0   # Total frames written (producer)
+        self.consumed = 0  # Total frames read (consumer)
+        # Where the first frame sits on the source's timeline, set by the reader before publishing
+        self.restarts = 0 # FileStream request counts the ring was filled for
+        self.seeks = 0
+        self.start_time = 0
+        self.timeline: Optional[SegmentTimeline] = None
+
+    def available(self) -> int:
+        return self.written - self.consumed
+
+    def space(self) -> int:
+        return self.capacity - (self.written - self.consumed)
+
+    def write(self, data: np.ndarray) -> int:
+        count = min(len(data), self.space())
+        if count <= 0:
+            return 0
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = data[:first]
+        if count > first:
+            self.data[:count - first] = data[first:count]
+        self.written += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        # Called from the audio thread. Fills `out` from the front, returns frames read.
+        count = min(len(out), self.written - self.consumed)
+        if count <= 0:
+            return 0
+        start = self.consumed % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        if count > first:
+            out[first:count] = self.data[:count - first]
+        self.consumed += count
+        return count
+
+class FileStream:
+    """
+    Streams a file segment from disk through a bounded ring buffer.
+    A background thread reads ahead from a memmap (the file itself when it
+    is PCM WAV/AIFF at the output rate, else the decoded-PCM cache entry)
+    or, until the cache is filled, from a decoder; the audio callback only
+    copies out of the ring, so memory stays constant whatever the file length.
+    The reader writes the source's SegmentTimeline (padding, repeats), not
+    just the file: a chunk is a few slices, or one modular take when the
+    period is shorter than a chunk, however short the segment.
+    """
+    def __init__(self, file_path: str, sample_rate: int, cache: Optional[PcmCache] = None,
+                 buffer_seconds: float = 4.0, chunk_frames: int = 4096, storage_format: Optional[str] = None):
+        self.file_path = file_path
+        self.sample_rate = sample_rate
+        self.cache = cache
+        # Format of the cache entry (None: the cache's default); converted to float32 per chunk
+        self.storage_format = storage_format
+        self.buffer_seconds = buffer_seconds
+        self.chunk_frames = chunk_frames
+
+        self.channels = 0
+        self.total_frames = 0
+        self.ring: Optional[RingBuffer] = None
+        self.finished = False
+        # loading -> ready (enough audio buffered) -> ...; error if the file cannot be opened
+        self.state = "loading"
+        self.prebuffer_seconds = 0.5
+        # Called from the reader thread once the channel count is known
+        self.on_format = None
+
+        # Timeline settings (seconds; iterations 0 = forever), applied by the reader on the next restart
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.iterations = 1
+        self.padding_before = 0.0
+        self.padding_after = 0.0
+
+        # Frame position, loop iteration and state of this source (audio thread)
+        self.playhead = Playhead(sample_rate)
+        # Restart and seek requests come from different threads (control and
+        # audio), so each side bumps only its own counter; a ring is current while
+        # it was filled for both counts, older rings are never read
+        self._restarts = 0 # restart(): control thread
+        self._seeks = 0 # request_seek(): audio thread
+        self._target = (-1, 0) # (file frame, iteration) to refill from, one reference; -1: segment start
+
+        self._restart_requested = True
+        self._stop = False
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reader = None
+        self._pcm = None # Memory-mapped file or cache entry once available
+        self._pcm_file_checked = False
+        self._pcm_position = 0
+        self._decoder_position = -1 # File frame the decoder reads next, -1 if unknown
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"FileStream-{self.file_path}", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        # Never joins: the reader thread shuts its decoder down on its own,
+        # so closing a stream from the UI thread does not wait on I/O
+        self._stop = True
+        self._wake.set()
+        if self._thread is None:
+            self._close_decoder()
+
+    def set_segment(self, start_time: float, end_time: float, iterations: int = 1,
+                    padding_before: float = 0.0, padding_after: float = 0.0):
+        settings = (start_time, end_time, iterations, padding_before, padding_after)
+        if settings == (self.start_time, self.end_time, self.iterations, self.padding_before, self.padding_after):
+            return
+        self.start_time, self.end_time, self.iterations, self.padding_before, self.padding_after = settings
+        self.restart()
+
+    def restart(self):
+        # Drop buffered audio and decode again from the segment start
+        self._target = (-1, 0)
+        self._restarts += 1
+        self._restart_requested = True
+        self.playhead.reset()
+        self._wake.set()
+
+    def at_start(self) -> bool:
+        # Buffered from the timeline start and not read since: a restart would
+        # only throw the prebuffer away
+        ring = self.ring
+        return (not self._restart_requested and ring is not None and ring.consumed == 0
+                and ring.start_time == 0 and ring.restarts == self._restarts and ring.seeks == self._seeks)
+
+    def request_seek(self, position: int, iteration: int = 0):
+        # Audio-thread safe: only sets fields (no lock, no wake-up), the reader
+        # polls for requests and refills from file frame `position` of loop
+        # `iteration` (-1: start of the timeline) within a few ms
+        self._target = (position, iteration)
+        self._seeks += 1
+        self._restart_requested = True
+
+    def read_into(self, out: np.ndarray) -> int:
+        # Called from the audio thread. Never blocks; missing frames stay untouched.
+        if self.state != "ready":
+            return 0
+        ring = self.ring
+        if ring is None or ring.restarts != self._restarts or ring.seeks != self._seeks:
+            # A restart or seek is pending: do not play the old position
+            return 0
+        playhead = self.playhead
+        if playhead.ring is not ring:
+            playhead.follow(ring)
+        count = ring.read_into(out)
+        playhead.advance(count)
+        if count < len(out) and self.finished:
+            playhead.state = FINISHED
+        elif count:
+            playhead.state = PLAYING
+        return count
+
+    def wait_buffered(self, frames: int, timeout: float = 10.0) -> bool:
+        # Offline rendering only (never from the audio callback): block until `frames`
+        # can be read or the segment has ended. False on error or timeout.
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.state == "error":
+                return False
+            ring = self.ring
+            if (not self._restart_requested and self.state == "ready" and ring is not None
+                    and ring.restarts == self._restarts and ring.seeks == self._seeks
+                    and (ring.available() >= frames or self.finished)):
+                return True
+            if time.monotonic() > deadline:
+                return False
+            # The reader idles while its ring is full; nudge it
+            self._wake.set()
+            time.sleep(0.001)
+
+    def _build_timeline(self) -> SegmentTimeline:
+        start_offset = max(0, int(self.start_time * self.sample_rate))
+        end_offset = int(self.end_time * self.sample_rate)
+        if end_offset <= start_offset or end_offset > self.total_frames:
+            end_offset = self.total_frames
+        return SegmentTimeline(start_offset, end_offset,
+                               int(self.padding_before * self.sample_rate),
+                               int(self.padding_after * self.sample_rate),
+                               self.iterations)
+
+    def _open_pcm(self) -> bool:
+        if self._pcm is None and not self._pcm_file_checked:
+            # PCM WAV/AIFF at the output rate is played from the file in place, uncached
+            self._pcm_file_checked = True
+            pcm = open_pcm_file(self.file_path)
+            if (pcm is not None and pcm.sample_rate == self.sample_rate
+                    and (self.channels == 0 or pcm.channels == self.channels)):
+                self._pcm = pcm.data
+                self.channels = pcm.channels
+                self.total_frames = pcm.frames
+        if self._pcm is None and self.cache:
+            data, channels = self.cache.lookup(self.file_path, self.sample_rate, self.storage_format)
+            if data is not None and (self.channels == 0 or channels == self.channels):
+                self._pcm = data
+                self.channels = channels
+                self.total_frames = len(data)
+        return self._pcm is not None
+
+    def _open_decoder(self, start_offset):
+        self._close_decoder()
+        if self._open_pcm():
+            self._pcm_position = start_offset
+        else:
+            self._reader = open_audio_reader(self.file_path, self.channels, self.sample_rate, start_offset / self.sample_rate)
+
+    def _close_decoder(self):
+        self._decoder_position = -1
+        if self._reader:
+            try:
+                self._reader.close()
+            except Exception:
+                pass
+            self._reader = None
+
+    def _read_decoder(self, frames):
+        if self._pcm is not None:
+            # Page faults on the memmap happen here, in the reader thread
+            chunk = self._pcm[self._pcm_position:self._pcm_position + frames]
+            self._pcm_position += len(chunk)
+            return chunk
+        return self._reader.read(frames)
+
+    def _read_at(self, position: int, out: np.ndarray):
+        # File frames [position, position + len(out)) into `out`; missing frames
+        # (file shorter than probed) are silent. Sequential spans keep the decoder open.
+        if position != self._decoder_position:
+            self._open_decoder(position)
+        filled = 0
+        while filled < len(out):
+            chunk = self._read_decoder(len(out) - filled)
+            if len(chunk) == 0:
+                break
+            decode_into(chunk, out[filled:filled + len(chunk)])
+            filled += len(chunk)
+        out[filled:] = 0
+        self._decoder_position = position + filled if filled == len(out) else -1
+
+    def _fail(self, error):
+        print(f"Error decoding {self.file_path}: {error}")
+        self._close_decoder()
+        self.finished = True
+        self.state = "error"
+
+    def _render_chunk(self, timeline, t, out, table) -> int:
+        # Timeline frames [t, t + len(out)) into `out`; returns the frames written
+        if table is not None:
+            return timeline.render_table(t, out, table, self._ramp, self._indices)
+        written = 0
+        for offset, count, source in timeline.spans(t, len(out)):
+            if source < 0:
+                out[offset:offset + count] = 0
+            else:
+                self._read_at(source, out[offset:offset + count])
+            written = offset + count
+        return written
+
+    def _load_period_table(self, timeline):
+        # Short periods: read the segment once, then every chunk is one take()
+        if timeline.period > self.chunk_frames or timeline.iterations == 1:
+            return None
+        segment = np.zeros((timeline.segment_frames, self.channels), dtype=np.float32)
+        self._read_at(timeline.segment_start, segment)
+        return timeline.period_table(segment)
+
+    def _run(self):
+        if not self._open_pcm():
+            try:
+                channels, _, duration = get_audio_info(self.file_path)
+            except Exception as e:
+                print(f"Error opening stream {self.file_path}: {e}")
+                channels = 0
+            if channels == 0:
+                self.finished = True
+                self.state = "error"
+                return
+            self.channels = channels
+            self.total_frames = int(duration * self.sample_rate)
+            # Decode into the cache in the background; later restarts use the memmap
+            if self.cache:
+                self.cache.request(self.file_path, self.sample_rate, self.storage_format)
+
+        channels = self.channels
+        if self.on_format:
+            self.on_format(self)
+        capacity = max(self.chunk_frames * 2, int(self.buffer_seconds * self.sample_rate))
+        prebuffer = min(capacity // 2, int(self.prebuffer_seconds * self.sample_rate))
+
+        chunk = np.zeros((self.chunk_frames, channels), dtype=np.float32)
+        self._ramp = np.arange(self.chunk_frames, dtype=np.intp)
+        self._indices = np.zeros(self.chunk_frames, dtype=np.intp)
+        timeline = None
+        table = None
+        t = 0
+
+        while not self._stop:
+            if self._restart_requested:
+                self.state = "loading"
+                self._restart_requested = False
+                restarts, seeks = self._restarts, self._seeks
+                seek, iteration = self._target
+                timeline = self._build_timeline()
+                t = 0 if seek < 0 else timeline.time_of(iteration, seek)
+                self._decoder_position = -1
+                # Swap in a fresh ring: the audio thread picks it up with one
+                # reference read and never sees a half-flushed buffer
+                ring = RingBuffer(capacity, channels)
+                ring.restarts, ring.seeks = restarts, seeks
+                ring.start_time = t
+                ring.timeline = timeline
+                self.ring = ring
+                self.finished = False
+                try:
+                    table = self._load_period_table(timeline)
+                except Exception as e:
+                    table = None
+                    self._fail(e)
+
+            if self.finished or self.ring.space() < self.chunk_frames:
+                self._wake.wait(0.02)
+                self._wake.clear()
+                continue
+
+            try:
+                written = self._render_chunk(timeline, t, chunk, table)
+            except Exception as e:
+                # e.g. no ffmpeg for a file that needs resampling; a restart tries again
+                self._fail(e)
+                continue
+            if written == 0:
+                # End of the timeline
+                self.finished = True
+                self.state = "ready" # Whatever is buffered can play out
+                self._close_decoder()
+                continue
+
+            self.ring.write(chunk[:written])
+            t += written
+            if self.state == "loading" and self.ring.available() >= prebuffer:
+                self.state = "ready"
+
+        self._close_decoder()
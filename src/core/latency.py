@@ -0,0 +1,92 @@
+from typing import Optional
+
+# Stream settings per latency profile (stored as graph.settings["latency_profile"]).
+# "latency" is passed to sounddevice as-is.
+LATENCY_PROFILES = {
+    "safe": {"block_size": 8192, "latency": "high"},     # Pi Zero/3 with heavy graphs
+    "balanced": {"block_size": 2048, "latency": "high"},
+    "low": {"block_size": 512, "latency": "low"},
+}
+ADAPTIVE_PROFILE = "adaptive"
+DEFAULT_PROFILE = "safe"
+PROFILE_NAMES = list(LATENCY_PROFILES.keys()) + [ADAPTIVE_PROFILE]
+
+MIN_BLOCK_SIZE = 256
+MAX_BLOCK_SIZE = 8192
+
+def adaptive_latency(block_size: int, sample_rate: int) -> float:
+    # Ask the host API for two blocks of output buffering
+    return 2.0 * block_size / sample_rate
+
+class AdaptiveBlockSizer:
+    """
+    Picks the stream block size from how the callback keeps up.
+    The audio callback calls `record` once per block (a few attribute
+    updates, nothing else); a monitor thread calls `decide` periodically and
+    restarts the stream when it returns a new size.
+
+    Any xrun, or a block that used more than `high_load` of its deadline,
+    doubles the block size right away. The size is halved only after
+    `calm_windows` consecutive windows stayed under `low_load`, so a device
+    that just underran does not bounce straight back.
+    """
+    def __init__(self, sample_rate: int, block_size: int,
+                 min_block: int = MIN_BLOCK_SIZE, max_block: int = MAX_BLOCK_SIZE,
+                 high_load: float = 0.6, low_load: float = 0.25, calm_windows: int = 5):
+        self.sample_rate = sample_rate
+        self.min_block = min_block
+        self.max_block = max_block
+        self.high_load = high_load
+        self.low_load = low_load
+        self.calm_windows = calm_windows
+        self.block_size = min(max(block_size, min_block), max_block)
+
+        # Current window, written by the callback. decide() resets it from another
+        # thread; a block recorded during the reset is simply lost.
+        self._blocks = 0
+        self._peak_load = 0.0
+        self._xruns = 0
+        self._calm = 0
+
+        # Totals for display
+        self.total_xruns = 0
+        self.last_peak_load = 0.0
+
+    def record(self, duration: float, frames: int, xrun: bool):
+        # Callback side: fraction of the block deadline spent rendering
+        load = duration * self.sample_rate / frames if frames else 0.0
+        if load > self._peak_load:
+            self._peak_load = load
+        if xrun:
+            self._xruns += 1
+        self._blocks += 1
+
+    def decide(self) -> Optional[int]:
+        # Monitor side: returns the new block size, or None to keep the current one
+        blocks, peak, xruns = self._blocks, self._peak_load, self._xruns
+        if blocks == 0:
+            return None
+        self._blocks = 0
+        self._peak_load = 0.0
+        self._xruns = 0
+        self.last_peak_load = peak
+        self.total_xruns += xruns
+
+        if xruns or peak > self.high_load:
+            self._calm = 0
+            if self.block_size < self.max_block:
+                return self._resize(self.block_size * 2)
+            return None
+
+        if peak < self.low_load:
+            self._calm += 1
+            if self._calm >= self.calm_windows and self.block_size > self.min_block:
+                return self._resize(self.block_size // 2)
+        else:
+            self._calm = 0
+        return None
+
+    def _resize(self, block_size: int) -> int:
+        self.block_size = min(max(block_size, self.min_block), self.max_block)
+        self._calm = 0
+        return self.block_size
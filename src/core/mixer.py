@@ -0,0 +1,35 @@
+import numpy as np
+
+# Preconverted clip bounds: np.clip with Python floats builds temporaries every call
+_CLIP_LOW = np.float32(-1.0)
+_CLIP_HIGH = np.float32(1.0)
+
+class GainMatrixMixer:
+    """
+    Mixes every rendered source into the output with one matrix multiply.
+    Sources write into columns of a preallocated (frames x source columns)
+    stack; the (source columns x output channels) gain matrix is replaced by
+    reference from the UI thread when volume or channel mapping changes.
+    """
+    def __init__(self, width: int, out_channels: int, max_frames: int):
+        self.width = max(1, width)
+        self.out_channels = out_channels
+        self.max_frames = max_frames
+        self.stacked = np.zeros((max_frames, self.width), dtype=np.float32)
+        self.matrix = np.zeros((self.width, out_channels), dtype=np.float32)
+
+    def set_matrix(self, matrix: np.ndarray):
+        if matrix.shape != self.matrix.shape:
+            raise ValueError(f"Gain matrix shape {matrix.shape} does not match {self.matrix.shape}")
+        # Single reference swap; the callback picks it up on its next block
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def source_block(self, frames: int) -> np.ndarray:
+        return self.stacked if frames == self.max_frames else self.stacked[:frames]
+
+    def mix_into(self, outdata: np.ndarray, frames: int):
+        # np.dot writes straight into outdata (np.matmul allocates a temporary here)
+        np.dot(self.source_block(frames), self.matrix, out=outdata)
+        # Clip to prevent distortion
+        np.minimum(outdata, _CLIP_HIGH, out=outdata)
+        np.maximum(outdata, _CLIP_LOW, out=outdata)
@@ -0,0 +1,232 @@
+import numpy as np
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+from src.core.file_stream import RingBuffer
+
+DEFAULT_DEVICE = "default"
+
+# Largest rate correction applied to a secondary device. Cheap USB clocks are
+# within ~100 ppm of each other; the margin covers the start-up transient.
+MAX_CORRECTION = 0.005
+
+class DriftTracker:
+    """
+    Estimates how fast a secondary device consumes relative to the render
+    clock from the fill level of its ring, and returns the resampling ratio
+    (input frames per output frame) that holds the fill at `target`.
+    A PI controller on the low-passed fill error, as in alsa_out/zita-ajbridge:
+    the integral converges on the clock skew, the proportional term removes
+    the latency offset left from start-up. The default gains settle in about
+    ten seconds with little overshoot when blocks are a third of `target`.
+    """
+    __slots__ = ('target', 'smoothing', 'kp', 'ki', 'error', 'integral', 'ratio')
+
+    def __init__(self, target: int, smoothing: float = 0.02, kp: float = 0.02, ki: float = 1e-4):
+        self.target = max(1, target)
+        self.smoothing = smoothing
+        self.kp = kp
+        self.ki = ki
+        self.error = 0.0
+        self.integral = 0.0
+        self.ratio = 1.0
+
+    def update(self, fill: int) -> float:
+        # Called once per secondary callback with the frames buffered for it
+        error = (fill - self.target) / self.target
+        self.error += self.smoothing * (error - self.error)
+        self.integral = min(MAX_CORRECTION, max(-MAX_CORRECTION, self.integral + self.ki * self.error))
+        correction = self.kp * self.error + self.integral
+        self.ratio = 1.0 + min(MAX_CORRECTION, max(-MAX_CORRECTION, correction))
+        return self.ratio
+
+    def reset(self):
+        self.error = 0.0
+        self.integral = 0.0
+        self.ratio = 1.0
+
+    @property
+    def ppm(self) -> float:
+        # Settled rate correction: the device's clock skew against the render
+        # clock, negative when the device runs fast
+        return self.integral * 1e6
+
+class LinearResampler:
+    """
+    Variable-ratio linear interpolation between a ring and a device buffer.
+    Keeps the unconsumed input frames and the fractional read position
+    between blocks; every buffer is preallocated for `max_frames` output
+    frames at ratios up to `max_ratio` (plus drift correction), so
+    resampling allocates nothing in the callback.
+    """
+    def __init__(self, max_frames: int, channels: int, max_ratio: float = 1.0):
+        self.max_frames = max_frames
+        self.channels = channels
+        capacity = int(max_frames * max_ratio * (1.0 + MAX_CORRECTION)) + 3
+        self.input = np.zeros((capacity, channels), dtype=np.float32)
+        self.held = 0 # Input frames carried over at the front of `input`
+        self.phase = 0.0 # Read position inside input[0], in [0, 1)
+        self._ramp = np.arange(max_frames, dtype=np.float64)
+        self._position = np.zeros(max_frames, dtype=np.float64)
+        self._index = np.zeros(max_frames, dtype=np.intp)
+        self._next = np.zeros(max_frames, dtype=np.intp)
+        self._frac = np.zeros((max_frames, 1), dtype=np.float32)
+        self._a = np.zeros((max_frames, channels), dtype=np.float32)
+        self._b = np.zeros((max_frames, channels), dtype=np.float32)
+        self._scalar = np.zeros(1, dtype=np.float64)
+        self._one = np.ones(1, dtype=np.intp)
+
+    def needed(self, frames: int, ratio: float) -> int:
+        # New input frames the next process() call reads
+        return int(self.phase + (frames - 1) * ratio) + 2 - self.held
+
+    def process(self, ring: RingBuffer, out: np.ndarray, ratio: float) -> int:
+        """
+        Fills `out` (frames, channels) from `ring` at `ratio` input frames per
+        output frame. Returns the input frames that were missing (0 unless
+        the ring ran dry; missing frames are silent).
+        """
+        frames = len(out)
+        need = self.needed(frames, ratio) + self.held
+        got = ring.read_into(self.input[self.held:need])
+        missing = need - self.held - got
+        if missing:
+            self.input[self.held + got:need] = 0
+
+        # Read positions phase + i * ratio: integer part indexes input, the rest interpolates
+        position = self._position[:frames]
+        self._scalar[0] = ratio
+        np.multiply(self._ramp[:frames], self._scalar, out=position)
+        self._scalar[0] = self.phase
+        np.add(position, self._scalar, out=position)
+        index = self._index[:frames]
+        np.copyto(index, position, casting='unsafe') # Truncates: positions are >= 0
+        np.subtract(position, index, out=position)
+        frac = self._frac[:frames]
+        np.copyto(frac[:, 0], position, casting='same_kind')
+        following = self._next[:frames]
+        np.add(index, self._one, out=following)
+
+        a = self._a[:frames]
+        b = self._b[:frames]
+        np.take(self.input, index, axis=0, out=a)
+        np.take(self.input, following, axis=0, out=b)
+        np.subtract(b, a, out=b)
+        np.multiply(b, frac, out=b)
+        np.add(a, b, out=out)
+
+        end = self.phase + frames * ratio
+        advance = int(end)
+        self.phase = end - advance
+        self.held = need - advance
+        if self.held > 0:
+            self.input[:self.held] = self.input[advance:need]
+        return missing
+
+    def reset(self):
+        self.held = 0
+        self.phase = 0.0
+
+class DeviceOutput:
+    """
+    One secondary output device. The render clock (the primary device's
+    callback) writes this device's columns of every rendered block into an
+    SPSC ring; the device's own callback drains it through a LinearResampler
+    whose ratio a DriftTracker adjusts, so a device running slightly faster
+    or slower than the primary neither underruns nor builds up latency.
+    A device that does not take the render rate or float32 runs at its own
+    negotiated `device_rate` (the resampler's nominal ratio) and
+    `sample_format` (converted from a float buffer, as for the primary).
+    """
+    def __init__(self, name: str, device_index, offset: int, channels: int, block_size: int,
+                 sample_rate: int, device_rate: Optional[int] = None, sample_format: str = "float32",
+                 format_scale: float = 1.0):
+        self.name = name
+        self.device_index = device_index
+        self.offset = offset # First column of this device in the shared render buffer
+        self.channels = channels
+        self.block_size = block_size
+        self.sample_rate = sample_rate # Render clock
+        self.device_rate = device_rate or sample_rate
+        self.sample_format = sample_format
+        # Render frames per device frame, before drift correction
+        self.nominal_ratio = sample_rate / self.device_rate
+        # Primary block + own block + margin in flight; room for four times that
+        self.target = int(3 * block_size * max(1.0, self.nominal_ratio))
+        self.ring = RingBuffer(4 * self.target, channels)
+        self.tracker = DriftTracker(self.target)
+        self.resampler = LinearResampler(block_size, channels, self.nominal_ratio)
+        # Integer formats: resample into floats, then scale into outdata
+        self._float_out = np.zeros((block_size, channels), dtype=np.float32) if sample_format != "float32" else None
+        self._format_scale = np.full(1, format_scale, dtype=np.float32)
+        self.stream = None
+        self.primed = False
+        self.underruns = 0
+        self.overruns = 0
+        # When the last block arrived, and its size: the fill estimate counts the
+        # render clock's progress since then instead of jumping a block per push
+        self.pushed_at = 0.0
+        self.pushed_frames = 0
+
+    def push(self, shared: np.ndarray):
+        # Render clock side: this device's slice of the block just rendered
+        block = shared[:, self.offset:self.offset + self.channels]
+        if self.ring.write(block) < len(block):
+            self.overruns += 1
+        self.pushed_frames = len(block)
+        self.pushed_at = perf_counter()
+
+    def buffered(self) -> float:
+        # Frames in the ring, less the part of the last block the render clock
+        # has not "played" yet: smooth between pushes, unlike available()
+        pending = self.pushed_frames - (perf_counter() - self.pushed_at) * self.sample_rate
+        return self.ring.available() - max(0.0, pending)
+
+    def callback(self, outdata, frames, time, status):
+        # Device side (its own PortAudio thread)
+        if frames > self.resampler.max_frames:
+            outdata.fill(0)
+            return
+        fill = self.ring.available()
+        if not self.primed:
+            # Start once the target latency is buffered, so drift tracking starts centred
+            if fill < self.target:
+                outdata.fill(0)
+                return
+            self.primed = True
+        ratio = self.nominal_ratio * self.tracker.update(self.buffered())
+        out = outdata if self._float_out is None else self._float_out[:frames]
+        missing = self.resampler.process(self.ring, out, ratio)
+        if self._float_out is not None:
+            np.multiply(out, self._format_scale, out=outdata, casting='unsafe')
+        if missing:
+            # Ran dry: start over from a full target
+            self.underruns += 1
+            self.primed = False
+            self.tracker.reset()
+            self.resampler.reset()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "device": self.name,
+            "channels": self.channels,
+            "sample_rate": self.device_rate,
+            "sample_format": self.sample_format,
+            "buffered": self.ring.available(),
+            "target": self.target,
+            "ratio": self.tracker.ratio,
+            "drift_ppm": self.tracker.ppm,
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+        }
+
+def device_layout(primary_channels: int, secondary: List[Tuple[str, int]]) -> Dict[str, Tuple[int, int]]:
+    """
+    Columns of the shared render buffer per device name: the primary device
+    (DEFAULT_DEVICE) first, then every secondary device in order.
+    """
+    layout = {DEFAULT_DEVICE: (0, primary_channels)}
+    offset = primary_channels
+    for name, channels in secondary:
+        layout[name] = (offset, channels)
+        offset += channels
+    return layout
@@ -41,6 +41,16 @@ class Node:
         if hasattr(self, 'on_property_change'):
             self.on_property_change(self.id, key, value)
 
+    def set_properties(self, values: Dict[str, Any]):
+        # Update several properties as one change, so the audio engine never
+        # sees a half-applied edit (e.g. start_time without end_time)
+        self.properties.update(values)
+        if hasattr(self, 'on_properties_change'):
+            self.on_properties_change(self.id, values)
+        elif hasattr(self, 'on_property_change'):
+            for key, value in values.items():
+                self.on_property_change(self.id, key, value)
+
     def get_property(self, key: str, default: Any = None) -> Any:
         return self.properties.get(key, default)
 
@@ -37,7 +37,8 @@ class SourceNode(Node):
             "loop": False,
             "loop_count": 0, # 0 for infinite
             "padding_before": 0.0,
-            "padding_after": 0.0
+            "padding_after": 0.0,
+            "storage_format": "" # Decoded PCM format, "" for the project default
         }
     
     def set_source_type(self, source_type: str):
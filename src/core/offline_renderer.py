@@ -0,0 +1,142 @@
+import time
+import wave
+import numpy as np
+from typing import Optional
+
+class RenderResult:
+    """
+    Timing of one offline render. `real_time_factor` is render time divided by
+    audio time: 0.1 means the callback path uses 10% of a real-time budget.
+    """
+    def __init__(self, frames: int, sample_rate: int, render_seconds: float,
+                 wall_seconds: float, path: Optional[str] = None):
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.render_seconds = render_seconds # Time spent inside _audio_callback
+        self.wall_seconds = wall_seconds     # Including waits for file sources
+        self.path = path
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.frames / self.sample_rate
+
+    @property
+    def real_time_factor(self) -> float:
+        return self.render_seconds / self.audio_seconds if self.frames else 0.0
+
+    @property
+    def speed(self) -> float:
+        # How many times faster than real time the whole render ran
+        return self.audio_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def __repr__(self):
+        return (f"RenderResult({self.audio_seconds:.2f}s audio, RTF {self.real_time_factor:.4f}, "
+                f"{self.speed:.1f}x real time)")
+
+class _WavSink:
+    # 16-bit PCM through the standard wave module (any channel count)
+    def __init__(self, path, channels, sample_rate):
+        self.file = wave.open(path, 'wb')
+        self.file.setnchannels(channels)
+        self.file.setsampwidth(2)
+        self.file.setframerate(sample_rate)
+
+    def write(self, block):
+        self.file.writeframes((block * 32767.0).astype('<i2').tobytes())
+
+    def close(self):
+        self.file.close()
+
+class _RawSink:
+    # Interleaved float32, as the callback produced it
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def write(self, block):
+        self.file.write(block.astype('<f4').tobytes())
+
+    def close(self):
+        self.file.close()
+
+class _ArraySink:
+    def __init__(self, frames, channels):
+        self.data = np.zeros((frames, channels), dtype=np.float32)
+        self.position = 0
+
+    def write(self, block):
+        self.data[self.position:self.position + len(block)] = block
+        self.position += len(block)
+
+    def close(self):
+        pass
+
+class OfflineRenderer:
+    """
+    Runs the graph without a device: drives AudioEngine._audio_callback block
+    by block as fast as the CPU allows. File sources are waited for between
+    blocks, so the output matches an underrun-free live run.
+    """
+    def __init__(self, engine, out_channels: Optional[int] = None,
+                 block_size: Optional[int] = None, file_timeout: float = 10.0):
+        self.engine = engine
+        self.out_channels = out_channels
+        self.block_size = block_size
+        self.file_timeout = file_timeout
+
+    def render(self, seconds: float) -> np.ndarray:
+        # Whole render in memory, (frames, channels) float32
+        frames = int(seconds * self.engine.sample_rate)
+        sink = _ArraySink(frames, self._channels())
+        self.last_result = self._run(frames, sink)
+        return sink.data
+
+    def render_to_file(self, path: str, seconds: float) -> RenderResult:
+        # .raw writes float32 samples; anything else is a 16-bit WAV
+        channels = self._channels()
+        if path.lower().endswith(".raw"):
+            sink = _RawSink(path)
+        else:
+            sink = _WavSink(path, channels, self.engine.sample_rate)
+        try:
+            result = self._run(int(seconds * self.engine.sample_rate), sink)
+        finally:
+            sink.close()
+        result.path = path
+        self.last_result = result
+        return result
+
+    def _channels(self) -> int:
+        return self.out_channels or self.engine.required_channels()
+
+    def _run(self, total_frames: int, sink) -> RenderResult:
+        engine = self.engine
+        channels = self._channels()
+        block_size = self.block_size or engine.block_size
+
+        engine.begin_offline(channels, block_size)
+        outdata = np.zeros((block_size, channels), dtype=np.float32)
+        callback = engine._audio_callback
+        streams = list(engine.file_loader.streams.values())
+        perf_counter = time.perf_counter
+
+        render_seconds = 0.0
+        started = perf_counter()
+        try:
+            position = 0
+            while position < total_frames:
+                frames = min(block_size, total_frames - position)
+                for stream in streams:
+                    if not stream.wait_buffered(frames, self.file_timeout) and stream.state != "error":
+                        print(f"Offline render: timed out waiting for {stream.file_path}")
+                block = outdata if frames == block_size else outdata[:frames]
+
+                block_started = perf_counter()
+                callback(block, frames, None, None)
+                render_seconds += perf_counter() - block_started
+
+                sink.write(block)
+                position += frames
+        finally:
+            engine.end_offline()
+
+        return RenderResult(total_frames, engine.sample_rate, render_seconds, perf_counter() - started)
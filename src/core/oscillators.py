@@ -0,0 +1,277 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+TABLE_SIZE = 2048 # Samples per cycle, power of two so indices wrap with a mask
+TABLE_MASK = np.intp(TABLE_SIZE - 1) # intp: take() would copy any other index type
+MAX_HARMONIC = TABLE_SIZE // 2 - 1
+NOISE_SIZE = 1 << 16
+
+WAVE_TYPES = ("sine", "square", "sawtooth", "triangle", "noise")
+
+def _harmonic_amplitudes(wave_type: str, count: int) -> np.ndarray:
+    # Sine-series amplitudes for harmonics 1..count, matching the naive shapes:
+    # square = sign(sin), sawtooth rises from -1 to 1, triangle peaks at a quarter cycle
+    k = np.arange(1, count + 1, dtype=np.float64)
+    odd = (k % 2) == 1
+    if wave_type == "square":
+        return np.where(odd, 4 / (np.pi * k), 0.0)
+    if wave_type == "sawtooth":
+        return -2 / (np.pi * k)
+    if wave_type == "triangle":
+        signs = np.where(((k - 1) / 2) % 2 == 0, 1.0, -1.0)
+        return np.where(odd, signs * 8 / (np.pi ** 2 * k ** 2), 0.0)
+    amplitudes = np.zeros(count)
+    amplitudes[0] = 1.0
+    return amplitudes
+
+def _build_table(wave_type: str, harmonics: int) -> np.ndarray:
+    # One cycle from the harmonic series via an inverse FFT, plus a guard sample
+    spectrum = np.zeros(TABLE_SIZE // 2 + 1, dtype=np.complex128)
+    # sin(k x) is the imaginary part: X[k] = -i * a_k * N / 2
+    spectrum[1:harmonics + 1] = -0.5j * TABLE_SIZE * _harmonic_amplitudes(wave_type, harmonics)
+    cycle = np.fft.irfft(spectrum, TABLE_SIZE)
+    # Band-limited edges overshoot (Gibbs); keep the peak at full scale so it does not clip
+    peak = np.abs(cycle).max()
+    if peak > 1.0:
+        cycle /= peak
+    table = np.empty(TABLE_SIZE + 1, dtype=np.float32)
+    table[:TABLE_SIZE] = cycle
+    table[TABLE_SIZE] = cycle[0]
+    return table
+
+class Wavetable:
+    """
+    Mip-mapped, band-limited tables for one wave type.
+    Level i holds the harmonics that stay below Nyquist up to `top_frequencies[i]`;
+    levels are an octave apart, so a tone always uses the richest table that
+    cannot alias. Each level stores the samples and the per-sample slope used
+    for linear interpolation (both float32).
+    """
+    def __init__(self, wave_type: str, sample_rate: int, lowest_top: float = 20.0):
+        self.wave_type = wave_type
+        self.sample_rate = sample_rate
+        nyquist = sample_rate / 2
+
+        self.top_frequencies: List[float] = []
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        top = lowest_top
+        while True:
+            harmonics = 1 if wave_type == "sine" else max(1, min(MAX_HARMONIC, int(nyquist / top)))
+            table = _build_table(wave_type, harmonics)
+            slope = np.diff(table).astype(np.float32)
+            self.top_frequencies.append(top)
+            self.levels.append((table[:TABLE_SIZE], slope))
+            if harmonics == 1 or top >= nyquist:
+                break
+            top *= 2
+
+_tables: Dict[Tuple[str, int], Wavetable] = {}
+
+def get_wavetable(wave_type: str, sample_rate: int) -> Wavetable:
+    """
+    Shared tables per (wave type, sample rate), built on first use.
+    Call while preparing a plan (UI thread), never from the callback.
+    """
+    if wave_type not in WAVE_TYPES or wave_type == "noise":
+        wave_type = "sine"
+    key = (wave_type, sample_rate)
+    table = _tables.get(key)
+    if table is None:
+        table = Wavetable(wave_type, sample_rate)
+        _tables[key] = table
+    return table
+
+_noise = None
+
+def get_noise_table() -> np.ndarray:
+    # Fixed white noise loop, read sequentially by noise sources
+    global _noise
+    if _noise is None:
+        _noise = np.random.default_rng(0x5eed).uniform(-1.0, 1.0, NOISE_SIZE).astype(np.float32)
+    return _noise
+
+class TableBank:
+    """
+    Every level of every wave type in one flat float32 array (plus slopes),
+    so a single np.take can read all voices at once whatever their wave type.
+    A voice is described by the offset of its level; a trailing all-zero
+    level serves noise voices, which are filled separately.
+    """
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.offsets: Dict[str, List[Tuple[float, int]]] = {}
+        tables = []
+        slopes = []
+        for wave_type in WAVE_TYPES:
+            if wave_type == "noise":
+                continue
+            wavetable = get_wavetable(wave_type, sample_rate)
+            levels = []
+            for top, (table, slope) in zip(wavetable.top_frequencies, wavetable.levels):
+                levels.append((top, len(tables) * TABLE_SIZE))
+                tables.append(table)
+                slopes.append(slope)
+            self.offsets[wave_type] = levels
+        self.silent_offset = len(tables) * TABLE_SIZE
+        tables.append(np.zeros(TABLE_SIZE, dtype=np.float32))
+        slopes.append(np.zeros(TABLE_SIZE, dtype=np.float32))
+        self.table = np.concatenate(tables)
+        self.slope = np.concatenate(slopes)
+
+    def offset_for(self, wave_type: str, frequency: float) -> int:
+        levels = self.offsets.get(wave_type)
+        if levels is None:
+            return self.silent_offset if wave_type == "noise" else self.offset_for("sine", frequency)
+        # A handful of levels: a linear scan is cheaper than bisect's call overhead
+        for top, offset in levels:
+            if frequency <= top:
+                return offset
+        return levels[-1][1]
+
+_banks: Dict[int, TableBank] = {}
+
+def get_table_bank(sample_rate: int) -> TableBank:
+    bank = _banks.get(sample_rate)
+    if bank is None:
+        bank = TableBank(sample_rate)
+        _banks[sample_rate] = bank
+    return bank
+
+class OscillatorBank:
+    """
+    Renders any number of tones in one vectorized pass per block.
+    Voices are the columns of a (frames, voices) float32 block. Positions for
+    all of them come from one matrix product, [ramp, 1] x [increments; phases],
+    in float64 table samples; they are split into integer indices (offset into
+    the flat TableBank) and float32 fractions, and interpolated with two
+    np.take calls. Cost grows with frames x voices, not with Python calls;
+    only noise voices are filled one by one.
+
+    Broadcasting ufuncs allocate iterator buffers, so nothing here broadcasts:
+    the product replaces ramp * increments + phases and the per-voice table
+    offsets are kept as a full (frames, voices) grid. Ufuncs on one-element
+    arrays allocate as well, so a single voice is padded with a silent one.
+    """
+    def __init__(self, sample_rate: int, voices: int):
+        self.sample_rate = sample_rate
+        self.voices = voices
+        self.tables = get_table_bank(sample_rate)
+        self.noise = get_noise_table()
+        width = max(2, voices)
+        self._width = width
+
+        # Row 0: increment per sample, row 1: phase at the block start (table samples)
+        self.coefficients = np.zeros((2, width), dtype=np.float64)
+        self.increments = self.coefficients[0]
+        self.phases = self.coefficients[1]
+        self.offsets = np.full(width, self.tables.silent_offset, dtype=np.intp)
+        self._offsets_changed = True
+        self._advance = np.zeros(width, dtype=np.float64)
+        # Scalar operands are converted to arrays on every ufunc call, so keep them as rows
+        self._block_frames = np.zeros(width, dtype=np.float64)
+        self._filled_frames = 0
+        self._wrap = np.full(width, TABLE_SIZE, dtype=np.float64)
+        self.noise_positions = [0] * voices
+        self.noise_voices: List[int] = []
+
+    def set_voice(self, voice: int, wave_type: str, frequency: float):
+        frequency = abs(frequency)
+        if wave_type == "noise":
+            self.increments[voice] = 0.0
+        else:
+            self.increments[voice] = frequency / self.sample_rate * TABLE_SIZE
+        offset = self.tables.offset_for(wave_type, frequency)
+        if offset != self.offsets[voice]:
+            self.offsets[voice] = offset
+            self._offsets_changed = True
+        if wave_type == "noise" and voice not in self.noise_voices:
+            self.noise_voices = sorted(self.noise_voices + [voice])
+        elif wave_type != "noise" and voice in self.noise_voices:
+            self.noise_voices = [v for v in self.noise_voices if v != voice]
+
+    def get_phase(self, voice: int) -> float:
+        # In cycles [0, 1)
+        return float(self.phases[voice]) / TABLE_SIZE
+
+    def set_phase(self, voice: int, phase: float):
+        self.phases[voice] = (phase % 1.0) * TABLE_SIZE
+
+    def reset(self):
+        self.phases.fill(0)
+        self.noise_positions = [0] * self.voices
+
+    def prepare(self, pool):
+        width = self._width
+        frames = pool.max_frames
+        # [sample index, 1] per row, for the position product
+        self.ramp = np.ones((frames, 2), dtype=np.float64)
+        self.ramp[:, 0] = pool.ramp
+        self.offset_grid = np.zeros((frames, width), dtype=np.intp)
+        self._offsets_changed = True
+
+        def scratch(name, dtype=np.float64):
+            # Always (frames, voices), even for a single voice
+            return pool.scratch(name, dtype=dtype, width=width).reshape(-1, width)
+
+        self.positions = scratch("bank_positions")
+        self.whole = scratch("bank_whole")
+        self.indices = scratch("bank_indices", np.intp)
+        self.fractions = scratch("bank_fractions", np.float32)
+        self.values = scratch("bank_values", np.float32)
+        self.samples = scratch("bank_samples", np.float32)
+        # Voice columns only (drops the padding voice)
+        self.rendered = self.values[:, :self.voices]
+
+    def render(self, out: np.ndarray):
+        # Fills `out` ((frames, voices) float32 view) and advances every phase
+        if self._offsets_changed:
+            # Only after a wave type or octave change
+            self.offset_grid[:] = self.offsets
+            self._offsets_changed = False
+
+        frames = len(out)
+        ramp, positions, whole = self.ramp, self.positions, self.whole
+        indices, fractions, offset_grid = self.indices, self.fractions, self.offset_grid
+        values, samples, rendered = self.values, self.samples, self.rendered
+        if frames != len(ramp):
+            # Short block: slicing creates view objects, so full blocks skip it
+            ramp, positions, whole = ramp[:frames], positions[:frames], whole[:frames]
+            indices, fractions, offset_grid = indices[:frames], fractions[:frames], offset_grid[:frames]
+            values, samples, rendered = values[:frames], samples[:frames], rendered[:frames]
+
+        # Position in table samples, split into integer index and fraction.
+        # Mixed-type ufuncs buffer (allocate) too, so every step keeps one dtype.
+        np.dot(ramp, self.coefficients, out=positions)
+        np.floor(positions, out=whole)
+        np.copyto(indices, whole, casting='unsafe')
+        positions -= whole
+        np.copyto(fractions, positions, casting='same_kind')
+        np.bitwise_and(indices, TABLE_MASK, out=indices)
+        indices += offset_grid
+
+        # table[i] + frac * (table[i + 1] - table[i]). take() only skips its internal
+        # copy with a contiguous out and a non-raising mode (indices are in range)
+        np.take(self.tables.slope, indices, out=values, mode='clip')
+        values *= fractions
+        np.take(self.tables.table, indices, out=samples, mode='clip')
+        values += samples
+        np.copyto(out, rendered)
+
+        if self._filled_frames != frames:
+            self._block_frames.fill(frames)
+            self._filled_frames = frames
+        np.multiply(self.increments, self._block_frames, out=self._advance)
+        self.phases += self._advance
+        np.fmod(self.phases, self._wrap, out=self.phases)
+
+        for voice in self.noise_voices:
+            self._render_noise(voice, out[:, voice])
+
+    def _render_noise(self, voice: int, out: np.ndarray):
+        frames = len(out)
+        start = self.noise_positions[voice]
+        first = min(frames, NOISE_SIZE - start)
+        out[:first] = self.noise[start:start + first]
+        if frames > first:
+            out[first:] = self.noise[:frames - first]
+        self.noise_positions[voice] = (start + frames) % NOISE_SIZE
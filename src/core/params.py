@@ -0,0 +1,105 @@
+from typing import Dict, Any, Optional, Tuple
+from src.core.graph import Graph
+from src.core.node import NodeType
+from src.core.node_types import SourceType
+
+def _float(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+class SourceParams:
+    """
+    Compiled, typed view of a SourceNode's properties for the audio thread.
+    Instances are never mutated after construction.
+    """
+    __slots__ = (
+        'source_type', 'wave_type', 'frequency',
+        'duration_mode', 'duration', 'interval',
+        'file_path', 'start_time', 'end_time', 'loop',
+        'playback_mode', 'loop_count', 'padding_before', 'padding_after', 'storage_format'
+    )
+
+    def __init__(self, properties: Dict[str, Any]):
+        self.source_type = properties.get("source_type", SourceType.WAVE)
+        self.wave_type = properties.get("wave_type", "sine")
+        self.frequency = _float(properties.get("frequency", 440.0), 440.0)
+        self.duration_mode = properties.get("duration_mode", "infinite")
+        self.duration = _float(properties.get("duration", 1.0), 1.0)
+        self.interval = _float(properties.get("interval", 1.0), 1.0)
+        self.file_path = properties.get("file_path", "") or ""
+        self.start_time = _float(properties.get("start_time", 0.0), 0.0)
+        self.end_time = _float(properties.get("end_time", 0.0), 0.0)
+        self.loop = bool(properties.get("loop", False))
+        self.playback_mode = properties.get("playback_mode", "One Shot")
+        self.loop_count = _int(properties.get("loop_count", 0), 0)
+        self.padding_before = _float(properties.get("padding_before", 0.0), 0.0)
+        self.padding_after = _float(properties.get("padding_after", 0.0), 0.0)
+        self.storage_format = properties.get("storage_format", "") or ""
+
+class ChannelParams:
+    __slots__ = ('channel_index', 'volume', 'source_channel_index', 'hardware_device')
+
+    def __init__(self, properties: Dict[str, Any]):
+        self.channel_index = _int(properties.get("channel_index", 0), 0)
+        self.volume = _float(properties.get("volume", 1.0), 1.0)
+        self.source_channel_index = _int(properties.get("source_channel_index", 0), 0)
+        self.hardware_device = properties.get("hardware_device", "default")
+
+class TriggerParams:
+    __slots__ = ('trigger_type',)
+
+    def __init__(self, properties: Dict[str, Any]):
+        self.trigger_type = properties.get("trigger_type", "on_start")
+
+_PARAM_TYPES = {
+    NodeType.SOURCE: SourceParams,
+    NodeType.CHANNEL: ChannelParams,
+    NodeType.TRIGGER: TriggerParams,
+}
+
+def compile_params(node_type: NodeType, properties: Dict[str, Any]):
+    return _PARAM_TYPES[node_type](properties)
+
+class ParamSnapshot:
+    """
+    Immutable set of compiled parameters for every node in the graph.
+    The audio thread indexes `params` by slot (assigned when the graph is
+    compiled); the UI thread publishes a new snapshot with one reference
+    swap, so a block always sees one consistent set of values.
+    """
+    __slots__ = ('slots', 'params')
+
+    def __init__(self, slots: Dict[str, int], params: Tuple[Any, ...]):
+        self.slots = slots
+        self.params = params
+
+    def slot_of(self, node_id: str) -> Optional[int]:
+        return self.slots.get(node_id)
+
+    def get(self, node_id: str):
+        slot = self.slots.get(node_id)
+        return None if slot is None else self.params[slot]
+
+    def replace(self, slot: int, params) -> 'ParamSnapshot':
+        # Copy-on-write: readers holding the old snapshot are unaffected
+        new_params = list(self.params)
+        new_params[slot] = params
+        return ParamSnapshot(self.slots, tuple(new_params))
+
+def compile_snapshot(graph: Optional[Graph]) -> ParamSnapshot:
+    if not graph:
+        return ParamSnapshot({}, ())
+    slots = {}
+    params = []
+    for node_id, node in graph.nodes.items():
+        slots[node_id] = len(params)
+        params.append(compile_params(node.type, node.properties))
+    return ParamSnapshot(slots, tuple(params))
@@ -0,0 +1,57 @@
+STOPPED = "stopped"   # Not triggered yet (or rewound)
+PLAYING = "playing"
+SEEKING = "seeking"   # Waiting for the reader to refill from a new position
+FINISHED = "finished" # One-shot segment played out
+
+class Playhead:
+    """
+    Where one file source is: frame in the file, loop iteration and state.
+    Written only by the audio thread (FileStream.read_into and the seek /
+    restart commands); the UI reads it for progress. Every ring the reader
+    publishes carries its SegmentTimeline and the timeline frame of its first
+    frame, so the playhead re-syncs in O(1) whenever the ring changes and
+    otherwise just counts the frames it consumed.
+    """
+    __slots__ = ('sample_rate', 'time', 'position', 'iteration', 'state',
+                 'segment_start', 'segment_end', 'timeline', 'ring')
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.time = 0 # Timeline frame (padding and repeats included)
+        self.position = 0 # File frame
+        self.iteration = 0
+        self.state = STOPPED
+        self.segment_start = 0
+        self.segment_end = 0
+        self.timeline = None
+        self.ring = None # Ring the position was last synced from
+
+    def follow(self, ring):
+        self.ring = ring
+        self.timeline = ring.timeline
+        self.segment_start = ring.timeline.segment_start
+        self.segment_end = ring.timeline.segment_end
+        self.time = ring.start_time
+        self.iteration, self.position = self.timeline.locate(self.time)
+
+    def advance(self, frames: int):
+        if frames:
+            self.time += frames
+            self.iteration, self.position = self.timeline.locate(self.time)
+
+    def seek(self, frame: int):
+        # Position shown until the reader refills from there (it clamps the same way)
+        if self.segment_end > self.segment_start:
+            frame = min(max(frame, self.segment_start), self.segment_end - 1)
+        self.position = frame
+        self.state = SEEKING
+
+    def reset(self):
+        self.time = 0
+        self.position = self.segment_start
+        self.iteration = 0
+        self.state = STOPPED
+        self.ring = None
+
+    def seconds(self) -> float:
+        return self.position / self.sample_rate if self.sample_rate else 0.0
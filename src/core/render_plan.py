@@ -0,0 +1,404 @@
+import numpy as np
+from typing import List, Tuple, Optional, Dict
+from src.core.graph import Graph
+from src.core.node import NodeType
+from src.core.node_types import SourceType
+from src.core.params import ParamSnapshot, ChannelParams
+from src.core.file_stream import FileStream
+from src.core.mixer import GainMatrixMixer
+from src.core.buffer_pool import BufferPool
+from src.core.oscillators import OscillatorBank
+from src.core.scheduler import Gate, NEVER
+from src.core.playhead import PLAYING, FINISHED
+from src.core.multi_device import DEFAULT_DEVICE
+from src.core.callback_stats import SOURCE_KINDS
+
+class SourceProcessor:
+    """
+    Renders one source node into a (frames, width) block.
+    Processors live in the render plan and keep their own playback state,
+    so the callback never looks anything up by node id.
+    """
+    width = 1
+    kind = SOURCE_KINDS.index("wave") # Column of CallbackStats.source_times it is timed in
+
+    def __init__(self, node_id: str, slot: int, trigger_ids: Tuple[str, ...]):
+        self.node_id = node_id
+        self.slot = slot
+        self.trigger_ids = trigger_ids
+        # Sources without a trigger are never rendered
+        self.triggered = bool(trigger_ids)
+        # First frame at which one of this processor's gates changes (see Gate)
+        self.next_change = -1
+
+    def reset(self):
+        pass
+
+    def prepare(self, pool: BufferPool):
+        # Claim scratch buffers before the plan is published
+        pass
+
+    def inherit(self, previous: 'SourceProcessor'):
+        # Carry playback state across plan recompiles; runs again on the audio
+        # thread when the new plan is picked up (RenderPlan.take_over)
+        pass
+
+    def gates(self) -> List[Tuple[str, Gate]]:
+        # (trigger node id, gate it opens) pairs
+        return []
+
+    def columns_of(self, index: int) -> Tuple[int, int]:
+        # (first column, width) of the index-th source this processor renders
+        return 0, self.width
+
+    def render(self, params: Tuple, out: np.ndarray, frame: int):
+        # `params` is the whole snapshot tuple; processors index their own slots.
+        # `frame` is the block's first frame since playback started.
+        out.fill(0)
+
+class WaveBankProcessor(SourceProcessor):
+    """
+    Every triggered wave source of the plan in one OscillatorBank, one column
+    each. Voice settings are refreshed only when a new parameter snapshot is
+    published, so steady-state blocks do no per-source Python work.
+    Oscillators run freely; each voice is multiplied by its gate envelope,
+    which is rewritten only in blocks where a gate opens or switches.
+    """
+    def __init__(self, node_ids: List[str], slots: List[int], trigger_ids: List[Tuple[str, ...]],
+                 sample_rate: int):
+        super().__init__(None, None, ())
+        self.node_ids = node_ids
+        self.voice_of = {node_id: voice for voice, node_id in enumerate(node_ids)}
+        self.slots = slots
+        self.voice_triggers = trigger_ids
+        self.width = len(slots)
+        self.triggered = True
+        self.sample_rate = sample_rate
+        self.bank = OscillatorBank(sample_rate, len(slots))
+        self.voice_gates = [Gate(sample_rate, owner=self) for _ in slots]
+        self.all_open = False
+        self._params = None
+
+    def reset(self):
+        self.bank.reset()
+        for gate in self.voice_gates:
+            gate.close()
+
+    def inherit(self, previous):
+        if not isinstance(previous, WaveBankProcessor):
+            return
+        voice_of = previous.voice_of
+        for voice, node_id in enumerate(self.node_ids):
+            old_voice = voice_of.get(node_id)
+            if old_voice is not None:
+                self.bank.set_phase(voice, previous.bank.get_phase(old_voice))
+                self.bank.noise_positions[voice] = previous.bank.noise_positions[old_voice]
+                self.voice_gates[voice].copy_state(previous.voice_gates[old_voice])
+
+    def gates(self):
+        return [(trigger_id, gate) for triggers, gate in zip(self.voice_triggers, self.voice_gates)
+                for trigger_id in triggers]
+
+    def prepare(self, pool: BufferPool):
+        self.bank.prepare(pool)
+        self.envelope = np.zeros((pool.max_frames, self.width), dtype=np.float32)
+        self.gate_columns = [self.envelope[:, voice] for voice in range(self.width)]
+        for gate in self.voice_gates:
+            gate.invalidate()
+
+    def columns_of(self, index):
+        return index, 1
+
+    def get_phase(self, node_id: str) -> float:
+        return self.bank.get_phase(self.voice_of[node_id])
+
+    def render(self, params, out: np.ndarray, frame: int):
+        if params is not self._params:
+            # New snapshot (UI edit): reload frequencies, wave types and timings
+            for voice, slot in enumerate(self.slots):
+                source = params[slot]
+                self.bank.set_voice(voice, source.wave_type, source.frequency)
+                self.voice_gates[voice].configure(source.duration_mode, source.duration, source.interval)
+            self._params = params
+
+        frames = len(out)
+        if self.next_change < frame + frames:
+            self._render_gates(frame, frames)
+        self.bank.render(out)
+        if not self.all_open:
+            envelope = self.envelope
+            if frames != len(envelope):
+                envelope = envelope[:frames]
+            out *= envelope
+
+    def _render_gates(self, frame: int, frames: int):
+        end = frame + frames
+        next_change = NEVER
+        all_open = True
+        for gate, column in zip(self.voice_gates, self.gate_columns):
+            if gate.next_change < end:
+                gate.render(column, frame, frames)
+            if gate.next_change < next_change:
+                next_change = gate.next_change
+            if gate.value != 1.0:
+                all_open = False
+        self.next_change = next_change
+        self.all_open = all_open
+
+class FileProcessor(SourceProcessor):
+    """
+    Plays a file source from its stream once its trigger fires, starting at
+    the trigger's exact frame. The stream is only read while the gate is
+    open, so a source triggered late still starts from the top of its segment.
+    Position, loop iteration and state live in the stream's Playhead; seek,
+    restart and re-triggering only post a request to the reader.
+    """
+    kind = SOURCE_KINDS.index("file")
+
+    def __init__(self, node_id, slot, trigger_ids, stream: Optional[FileStream]):
+        super().__init__(node_id, slot, trigger_ids)
+        self.stream = stream
+        # Width is fixed when the plan is compiled; the plan is recompiled once the
+        # stream knows its channel count
+        self.width = stream.channels if stream and stream.channels else 0
+        # Files play their own segment/loop settings: the gate stays open once opened
+        self.gate = Gate(owner=self)
+        self._opened_at = -1 # Gate start already acted on
+        self._read_run = self._read_segment # Bound once, not per block
+        self._out = None
+
+    def reset(self):
+        self.gate.close()
+        self._opened_at = -1
+
+    def inherit(self, previous):
+        if isinstance(previous, FileProcessor):
+            self.gate.copy_state(previous.gate)
+            self._opened_at = previous._opened_at
+
+    def seek(self, frame: int):
+        # Audio thread (command): O(1), the reader refills from `frame`
+        if self.stream is not None:
+            playhead = self.stream.playhead
+            playhead.seek(frame)
+            self.stream.request_seek(frame, playhead.iteration)
+
+    def restart(self):
+        if self.stream is not None:
+            playhead = self.stream.playhead
+            playhead.seek(playhead.segment_start)
+            playhead.iteration = 0
+            self.stream.request_seek(-1) # Timeline start, padding included
+
+    def gates(self):
+        return [(trigger_id, self.gate) for trigger_id in self.trigger_ids]
+
+    def render(self, params, out: np.ndarray, frame: int):
+        out.fill(0)
+        if self.stream is None or not self.width:
+            return
+        gate = self.gate
+        frames = len(out)
+        if gate.start != self._opened_at:
+            # (Re)triggered: a source that already played starts over
+            self._opened_at = gate.start
+            if gate.start >= 0 and self.stream.playhead.state in (PLAYING, FINISHED):
+                self.restart()
+        if self.next_change < frame + frames:
+            # Gate opens inside this block: read only from its first frame
+            self._out = out
+            gate.render(None, frame, frames, self._read_run)
+            self._out = None
+            self.next_change = gate.next_change
+        elif gate.value == 1.0:
+            # Silent while loading; frames the reader has not decoded yet stay silent
+            self.stream.read_into(out)
+
+    def _read_segment(self, first: int, stop: int):
+        self.stream.read_into(self._out[first:stop])
+
+class RenderPlan:
+    """
+    Flat, compiled form of the graph for the audio callback:
+    source processors in trigger -> source -> channel order, their column
+    offsets in the stacked source buffer, and the routes that make up the
+    (source columns x output channels) gain matrix.
+    """
+    def __init__(self, snapshot: ParamSnapshot, processors: List[SourceProcessor],
+                 routes: List[Tuple[int, int, int]]):
+        self.snapshot = snapshot
+        self.processors = processors
+        # (processor index, source index within the processor, channel node slot)
+        self.routes = routes
+
+        self.offsets = []
+        width = 0
+        for proc in processors:
+            self.offsets.append(width)
+            width += proc.width
+        self.width = width
+
+        # Gates each trigger opens and file sources by node id, for the event queue
+        self.trigger_gates: Dict[str, List[Gate]] = {}
+        self.file_processors: Dict[str, 'FileProcessor'] = {}
+        # Processors by node id (the wave bank apart), for take_over()
+        self.by_node: Dict[str, SourceProcessor] = {}
+        self.wave_bank: Optional[WaveBankProcessor] = None
+        for proc in processors:
+            if isinstance(proc, WaveBankProcessor):
+                self.wave_bank = proc
+            else:
+                self.by_node[proc.node_id] = proc
+            for trigger_id, gate in proc.gates():
+                self.trigger_gates.setdefault(trigger_id, []).append(gate)
+            if isinstance(proc, FileProcessor):
+                self.file_processors[proc.node_id] = proc
+
+        # Attached by the engine once the output width is known
+        self.mixer: Optional[GainMatrixMixer] = None
+        # (processor, its column view of the mixer stack) for every processor with output
+        self.jobs: List[Tuple[SourceProcessor, np.ndarray]] = []
+
+    def attach(self, mixer: GainMatrixMixer, pool: BufferPool):
+        # Bind processors to preallocated memory; called before the plan is published,
+        # so its processors must not be ones the callback is rendering
+        jobs = []
+        for proc, offset in zip(self.processors, self.offsets):
+            proc.prepare(pool)
+            if proc.width:
+                jobs.append((proc, mixer.stacked[:, offset:offset + proc.width]))
+        self.mixer = mixer
+        self.jobs = jobs
+
+    def reset(self):
+        for proc in self.processors:
+            proc.reset()
+
+    def take_over(self, previous: 'RenderPlan'):
+        # Audio thread, first block of this plan: gates opened and phases advanced
+        # by the plan rendered until now, after this one was compiled, carry over
+        for proc in self.processors:
+            if proc is self.wave_bank:
+                old = previous.wave_bank
+            else:
+                old = previous.by_node.get(proc.node_id)
+            if old is not None and old is not proc:
+                proc.inherit(old)
+
+    def with_streams(self, streams: Dict[str, FileStream]) -> 'RenderPlan':
+        # Same plan with file processors rebound to the current streams (and their
+        # channel counts). Does not touch the graph, so it is safe off the UI thread.
+        # Stateful processors are rebuilt: the callback may still be rendering these.
+        processors = []
+        for proc in self.processors:
+            previous = proc
+            if isinstance(proc, FileProcessor):
+                proc = FileProcessor(proc.node_id, proc.slot, proc.trigger_ids, streams.get(proc.node_id))
+            elif isinstance(proc, WaveBankProcessor):
+                proc = WaveBankProcessor(proc.node_ids, proc.slots, proc.voice_triggers, proc.sample_rate)
+            if proc is not previous:
+                proc.inherit(previous)
+            processors.append(proc)
+        return RenderPlan(self.snapshot, processors, self.routes)
+
+    def build_matrix(self, params, out_channels: int,
+                     layout: Optional[Dict[str, Tuple[int, int]]] = None) -> np.ndarray:
+        # Gain from every stacked source column to every output channel.
+        # With several devices, `layout` gives each device name its (first column,
+        # channels) in the output; unknown names and "default" use the first device.
+        matrix = np.zeros((max(1, self.width), out_channels), dtype=np.float32)
+        for proc_index, source_index, channel_slot in self.routes:
+            channel_params: ChannelParams = params[channel_slot]
+            idx = channel_params.channel_index - 1
+            if layout:
+                first_column, device_channels = layout.get(channel_params.hardware_device) or layout[DEFAULT_DEVICE]
+                if idx < 0 or idx >= device_channels:
+                    continue
+                idx += first_column
+            if idx < 0 or idx >= out_channels:
+                continue
+            proc = self.processors[proc_index]
+            first, width = proc.columns_of(source_index)
+            offset = self.offsets[proc_index] + first
+            if width == 0:
+                continue
+            volume = channel_params.volume
+            source_channel_index = channel_params.source_channel_index
+            if width == 1:
+                matrix[offset, idx] += volume
+            elif source_channel_index > 0:
+                # Select specific channel (1-based index); out of range stays silent
+                if source_channel_index <= width:
+                    matrix[offset + source_channel_index - 1, idx] += volume
+            else:
+                # Mix down to mono
+                matrix[offset:offset + width, idx] += volume / width
+        return matrix
+
+def compile_render_plan(graph: Optional[Graph], snapshot: ParamSnapshot, sample_rate: int,
+                        streams: Dict[str, FileStream], previous: Optional[RenderPlan] = None) -> RenderPlan:
+    """
+    Builds the render plan in one pass over the connections plus one pass over the routed sources.
+    """
+    if not graph:
+        return RenderPlan(snapshot, [], [])
+
+    previous_procs = {}
+    previous_bank = None
+    if previous:
+        for proc in previous.processors:
+            if isinstance(proc, WaveBankProcessor):
+                previous_bank = proc
+            else:
+                previous_procs[proc.node_id] = proc
+
+    source_triggers: Dict[str, List[str]] = {}
+    source_channels: Dict[str, List[int]] = {}
+    for conn in graph.connections.values():
+        from_node = graph.nodes.get(conn.from_node_id)
+        to_node = graph.nodes.get(conn.to_node_id)
+        if not from_node or not to_node:
+            continue
+        if from_node.type == NodeType.TRIGGER and to_node.type == NodeType.SOURCE:
+            source_triggers.setdefault(to_node.id, []).append(from_node.id)
+        elif from_node.type == NodeType.SOURCE and to_node.type == NodeType.CHANNEL:
+            source_channels.setdefault(from_node.id, []).append(snapshot.slot_of(to_node.id))
+
+    processors = []
+    routes = []
+    wave_ids = []
+    wave_triggers = []
+    wave_routes = []
+    for node_id, channel_slots in source_channels.items():
+        slot = snapshot.slot_of(node_id)
+        params = snapshot.params[slot]
+        triggers = tuple(source_triggers.get(node_id, ()))
+        if params.source_type == SourceType.WAVE and triggers:
+            # Rendered together in the oscillator bank (added below)
+            for channel_slot in channel_slots:
+                wave_routes.append((len(wave_ids), channel_slot))
+            wave_ids.append(node_id)
+            wave_triggers.append(triggers)
+            continue
+        if params.source_type == SourceType.FILE:
+            proc = FileProcessor(node_id, slot, triggers, streams.get(node_id))
+        else:
+            proc = SourceProcessor(node_id, slot, triggers)
+        if node_id in previous_procs:
+            proc.inherit(previous_procs[node_id])
+        proc_index = len(processors)
+        processors.append(proc)
+        for channel_slot in channel_slots:
+            routes.append((proc_index, 0, channel_slot))
+
+    if wave_ids:
+        bank = WaveBankProcessor(wave_ids, [snapshot.slot_of(node_id) for node_id in wave_ids],
+                                 wave_triggers, sample_rate)
+        if previous_bank:
+            bank.inherit(previous_bank)
+        proc_index = len(processors)
+        processors.append(bank)
+        for voice, channel_slot in wave_routes:
+            routes.append((proc_index, voice, channel_slot))
+
+    return RenderPlan(snapshot, processors, routes)
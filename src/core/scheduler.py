@@ -0,0 +1,204 @@
+from collections import deque
+from src.core.node import NodeType
+
+# Trigger types and whether they fire when playback starts. "open" also starts
+# playback when a workspace is opened (UI controller, headless runner); "manual" only fires from
+# AudioEngine.fire_trigger (the inspector's test button).
+TRIGGER_TYPES = {"on_start": True, "manual": False, "open": True}
+
+INFINITE = "infinite"
+DEFAULT = "default"
+INTERMITTENT = "intermittent"
+DURATION_MODES = (INFINITE, DEFAULT, INTERMITTENT)
+
+NEVER = 1 << 62 # Frame that never comes
+
+# Commands for file sources, applied at the start of the next block
+SEEK = "seek"       # value: frame in the file
+RESTART = "restart"
+
+def fires_on_start(trigger_type: str) -> bool:
+    return TRIGGER_TYPES.get(trigger_type, False)
+
+def starts_on_open(graph) -> bool:
+    # Whether opening this workspace starts playback (it has an "open" trigger)
+    for node in graph.nodes.values():
+        if node.type == NodeType.TRIGGER and node.get_property("trigger_type", "on_start") == "open":
+            return True
+    return False
+
+class EventQueue:
+    """
+    Timestamped trigger events, (frame, trigger node id), and source commands,
+    (node id, action, value), from any thread to the audio thread. deque
+    append/popleft are atomic, so posting takes no lock and every command is
+    O(1) on the audio side. Events are expected in frame order; the callback
+    pops every event due before the end of its block.
+    """
+    def __init__(self):
+        self._events = deque()
+        self._commands = deque()
+
+    def __len__(self):
+        return len(self._events) + len(self._commands)
+
+    def post(self, frame: int, trigger_id: str):
+        self._events.append((frame, trigger_id))
+
+    def command(self, node_id: str, action: str, value: int = 0):
+        self._commands.append((node_id, action, value))
+
+    def clear(self):
+        self._events.clear()
+        self._commands.clear()
+
+    def dispatch(self, trigger_gates, sources, frame: int, frames: int):
+        # Audio thread: apply pending commands to `sources` (node id -> file
+        # processor), then open the gates of every trigger due in
+        # [frame, frame + frames). Late events open at the block start.
+        commands = self._commands
+        while commands:
+            node_id, action, value = commands.popleft()
+            proc = sources.get(node_id)
+            if proc is None:
+                continue
+            if action == SEEK:
+                proc.seek(value)
+            elif action == RESTART:
+                proc.restart()
+
+        events = self._events
+        end = frame + frames
+        while events and events[0][0] < end:
+            at, trigger_id = events.popleft()
+            gates = trigger_gates.get(trigger_id)
+            if gates:
+                if at < frame:
+                    at = frame
+                for gate in gates:
+                    gate.open(at)
+
+class Gate:
+    """
+    When one source sounds, in frames since playback started.
+    Closed until a trigger opens it at `start`; then on for good (infinite),
+    for `on_frames` (default), or for `on_frames` out of every `period`
+    (intermittent). `render` writes a block's 0/1 envelope with one slice
+    assignment per on-run, so the cost follows the transitions, not the
+    samples, and blocks without a transition are not touched at all.
+    """
+    __slots__ = ('sample_rate', 'mode', 'on_frames', 'period', 'start', 'value', 'next_change', 'owner')
+
+    def __init__(self, sample_rate: int = 0, owner=None):
+        self.sample_rate = sample_rate
+        self.mode = INFINITE
+        self.on_frames = NEVER
+        self.period = NEVER
+        self.start = -1 # Closed
+        # Envelope over the last rendered block: 0.0 or 1.0, -1.0 if it changed inside it
+        self.value = 0.0
+        # First frame that can differ from the last render; -1 forces a render
+        self.next_change = -1
+        # Processor rendering this gate; its own next_change is reset with ours
+        self.owner = owner
+
+    def invalidate(self):
+        # Render again at the next block (new buffers, timings or start)
+        self.next_change = -1
+        if self.owner is not None:
+            self.owner.next_change = -1
+
+    def configure(self, mode: str, duration: float, interval: float):
+        # Called when a new parameter snapshot is seen; timings are in seconds
+        if mode not in DURATION_MODES or not self.sample_rate:
+            mode = INFINITE
+        on_frames = period = NEVER
+        if mode != INFINITE:
+            on_frames = max(1, int(round(duration * self.sample_rate)))
+            period = on_frames + max(0, int(round(interval * self.sample_rate)))
+        if (mode, on_frames, period) != (self.mode, self.on_frames, self.period):
+            self.mode, self.on_frames, self.period = mode, on_frames, period
+            self.invalidate()
+
+    def open(self, frame: int):
+        # (Re)starts the envelope at `frame`
+        self.start = frame
+        self.invalidate()
+
+    def close(self):
+        self.start = -1
+        self.invalidate()
+
+    def copy_state(self, other: 'Gate'):
+        # Carries an open gate across plan recompiles
+        self.start = other.start
+        self.invalidate()
+
+    def render(self, column, block_start: int, frames: int, on_run=None):
+        """
+        Envelope for [block_start, block_start + frames): writes 0/1 into `column`
+        (a float32 view of at least `frames` rows, or None) and calls
+        on_run(first, stop) for every on-run, as offsets into the block.
+        """
+        end = block_start + frames
+        start = self.start
+        if column is not None:
+            column.fill(0.0)
+        covered = 0
+        if 0 <= start < end:
+            if self.mode == INTERMITTENT:
+                period = self.period
+                run_start = start
+                if block_start > start:
+                    run_start += (block_start - start) // period * period
+                while run_start < end:
+                    covered += self._run(column, run_start - block_start,
+                                         run_start + self.on_frames - block_start, frames, on_run)
+                    run_start += period
+            else:
+                stop = end if self.mode == INFINITE else start + self.on_frames
+                covered = self._run(column, start - block_start, stop - block_start, frames, on_run)
+
+        if covered == frames:
+            # Whole column, so shorter blocks before and full blocks after agree
+            if column is not None:
+                column.fill(1.0)
+            self.value = 1.0
+        else:
+            self.value = 0.0 if covered == 0 else -1.0
+        # A mixed block leaves a mixed column behind: render again next block
+        self.next_change = end if self.value < 0 else self._next_change(end)
+
+    def _run(self, column, first, stop, frames, on_run) -> int:
+        if first < 0:
+            first = 0
+        if stop > frames:
+            stop = frames
+        if first >= stop:
+            return 0
+        if column is not None:
+            column[first:stop] = 1.0
+        if on_run is not None:
+            on_run(first, stop)
+        return stop - first
+
+    def _next_change(self, end: int) -> int:
+        # First frame at or after `end` where the envelope switches
+        start = self.start
+        if start < 0:
+            return NEVER
+        if start >= end:
+            return start
+        if self.mode == INFINITE:
+            return NEVER
+        if self.mode == DEFAULT:
+            stop = start + self.on_frames
+            return stop if stop >= end else NEVER
+        if self.period == self.on_frames:
+            return NEVER # No gap between runs
+        position = (end - start) % self.period
+        if position == 0:
+            return end
+        if position < self.on_frames:
+            return end - position + self.on_frames
+        return end - position + self.period
@@ -0,0 +1,115 @@
+import numpy as np
+from typing import List, Tuple
+
+ONE_SHOT = "One Shot"
+LOOP = "Loop"
+N_TIMES = "N Times"
+PLAYBACK_MODES = (ONE_SHOT, LOOP, N_TIMES)
+
+# Source properties that change the timeline (the reader restarts on any of them)
+TIMELINE_KEYS = ("start_time", "end_time", "loop", "playback_mode", "loop_count",
+                 "padding_before", "padding_after")
+
+def iterations_for(playback_mode: str, loop_count: int, loop: bool = False) -> int:
+    # How many times the segment plays; 0 means forever
+    if playback_mode == LOOP or loop:
+        return 0
+    if playback_mode == N_TIMES:
+        return max(0, loop_count) # 0 for infinite, as in the node defaults
+    return 1
+
+class SegmentTimeline:
+    """
+    A file source's settings compiled into a periodic schedule.
+    Timeline frame t (frames since the source started) falls in iteration
+    t // period; each period is [padding_before silence][file segment]
+    [padding_after silence], and the timeline ends after `iterations`
+    periods (never when 0). Every frame's source is plain arithmetic, so a
+    block is filled with one slice per span, or with a single modular
+    np.take over a one-period table when periods are shorter than a block.
+    """
+    __slots__ = ('segment_start', 'segment_end', 'before', 'after', 'iterations', 'period', 'length')
+
+    def __init__(self, segment_start: int, segment_end: int, before: int = 0, after: int = 0,
+                 iterations: int = 1):
+        self.segment_start = segment_start
+        self.segment_end = max(segment_start, segment_end)
+        self.before = max(0, before)
+        self.after = max(0, after)
+        self.iterations = iterations
+        self.period = self.before + (self.segment_end - segment_start) + self.after
+        if self.period == 0:
+            self.length = 0
+        elif iterations > 0:
+            self.length = iterations * self.period
+        else:
+            self.length = 1 << 62
+
+    @property
+    def segment_frames(self) -> int:
+        return self.segment_end - self.segment_start
+
+    def locate(self, t: int) -> Tuple[int, int]:
+        # (iteration, file frame) at timeline frame t; padding maps to the segment edges
+        if self.period == 0:
+            return 0, self.segment_start
+        if t >= self.length:
+            return self.iterations - 1, self.segment_end
+        iteration = t // self.period
+        offset = t - iteration * self.period - self.before
+        if offset < 0:
+            offset = 0
+        elif offset > self.segment_frames:
+            offset = self.segment_frames
+        return iteration, self.segment_start + offset
+
+    def time_of(self, iteration: int, position: int) -> int:
+        # Timeline frame of file frame `position` in `iteration` (clamped to the segment)
+        if self.iterations > 0:
+            iteration = min(iteration, self.iterations - 1)
+        position = min(max(position, self.segment_start), max(self.segment_start, self.segment_end - 1))
+        return max(0, iteration) * self.period + self.before + position - self.segment_start
+
+    def spans(self, t: int, frames: int) -> List[Tuple[int, int, int]]:
+        # (offset in block, frames, file frame or -1 for silence) covering
+        # [t, t + frames) clipped to the timeline; about three per period touched
+        spans = []
+        if self.period == 0:
+            return spans
+        first = t
+        end = min(t + frames, self.length)
+        while t < end:
+            offset = t % self.period
+            if offset < self.before:
+                count, source = self.before - offset, -1
+            elif offset < self.before + self.segment_frames:
+                count = self.before + self.segment_frames - offset
+                source = self.segment_start + offset - self.before
+            else:
+                count, source = self.period - offset, -1
+            count = min(count, end - t)
+            spans.append((t - first, count, source))
+            t += count
+        return spans
+
+    def period_table(self, segment: np.ndarray) -> np.ndarray:
+        # One whole period, padding included, from the segment's (frames, channels) samples
+        table = np.zeros((self.period, segment.shape[1]), dtype=np.float32)
+        table[self.before:self.before + len(segment)] = segment
+        return table
+
+    def render_table(self, t: int, out: np.ndarray, table: np.ndarray,
+                     ramp: np.ndarray, scratch: np.ndarray) -> int:
+        """
+        Fills `out` from timeline frame t with one modular np.take over
+        `table` (see period_table). `ramp` holds 0..n-1 and `scratch` is as
+        long, both intp. Returns the frames written (fewer at the timeline end).
+        """
+        frames = min(len(out), self.length - t)
+        if frames <= 0:
+            return 0
+        index = scratch[:frames]
+        np.add(ramp[:frames], t % self.period, out=index)
+        np.remainder(index, self.period, out=index)
+        np.take(table, index, axis=0, out=out[:frames], mode='clip')
+        return frames
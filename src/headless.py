@@ -0,0 +1,96 @@
+"""
+Plays a workspace without the UI, for units with no screen:
+
+    python -m src.headless [workspace.json] [--device NAME] [--play]
+
+Builds the graph with PersistenceManager and drives the AudioEngine
+directly; Kivy (SDL, GL, the window) is never imported. Playback starts as
+in the UI: when the workspace has an "open" trigger, or with --play.
+Runs until SIGINT/SIGTERM, and exits non-zero if the stream fails so
+systemd restarts it (see asplayer-headless.service).
+"""
+from src.utils.startup_trace import trace # First: the startup timeline counts from here
+import argparse
+import signal
+import sys
+import threading
+import time
+from typing import Optional
+from src.core.audio_engine import AudioEngine
+from src.core.config_manager import ConfigManager
+from src.core.persistence import PersistenceManager
+from src.core.scheduler import starts_on_open
+trace.mark("import")
+
+PRELOAD_TIMEOUT = 10.0 # Seconds to wait for file sources to buffer before starting
+
+def wait_for_sources(engine: AudioEngine, timeout: float = PRELOAD_TIMEOUT):
+    # Start with every file prebuffered, so sources triggered at frame 0 play in sync
+    deadline = time.monotonic() + timeout
+    for node_id in list(engine.file_loader.streams):
+        while engine.get_source_state(node_id) == "loading" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+def run(workspace: str, device_name: Optional[str] = None, play: bool = False,
+        stop: Optional[threading.Event] = None) -> int:
+    graph = PersistenceManager.load_workspace(workspace)
+    if graph is None:
+        print(f"Headless: cannot load workspace {workspace}")
+        return 1
+
+    trace.mark("workspace_load")
+    config = ConfigManager()
+    trace.mark("config")
+    engine = AudioEngine()
+    trace.mark("engine_init")
+    cache_max_mb = config.get_pcm_cache_max_mb()
+    engine.configure_cache(config.get_pcm_cache_dir(), int(cache_max_mb) * 1024 * 1024 if cache_max_mb else None)
+    engine.set_graph(graph)
+
+    # Same device as the UI would restore: saved by name, since indexes change between boots
+    device_name = device_name or graph.settings.get('audio_device')
+    if device_name:
+        device_index = engine.find_output_device(device_name)
+        if device_index is None:
+            print(f"Headless: audio device {device_name} not found, using the default")
+        else:
+            engine.set_output_device(device_index)
+        trace.mark("device_query")
+
+    if not (play or starts_on_open(graph)):
+        print("Headless: the workspace has no 'open' trigger, nothing to play (use --play)")
+        engine.file_loader.close_all()
+        return 0
+
+    if stop is None:
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+    wait_for_sources(engine)
+    trace.mark("sources_ready")
+    report = config.get_startup_report()
+    if report:
+        trace.report_when("first_callback", report)
+    engine.start()
+    failed = not engine.is_playing
+    try:
+        while not failed and not stop.wait(1.0):
+            # The engine stops itself only if the stream could not be (re)opened
+            failed = not engine.is_playing
+    finally:
+        engine.stop()
+        engine.file_loader.close_all()
+    return 1 if failed else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.headless", description="Play an ASPlayer workspace without the UI.")
+    parser.add_argument("workspace", nargs="?", help="workspace file (default: the last one opened in the UI)")
+    parser.add_argument("--device", help="output device name (default: the one saved in the workspace)")
+    parser.add_argument("--play", action="store_true", help="start even without an 'open' trigger")
+    args = parser.parse_args(argv)
+    workspace = args.workspace or ConfigManager().get_last_opened_file() or "workspace.json"
+    return run(workspace, args.device, args.play)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,25 +1,39 @@
 from src.core.graph import Graph
-from src.core.audio_engine import AudioEngine
 from src.core.node_types import TriggerNode, SourceNode, ChannelNode
 from src.core.node import NodeType
 from src.core.persistence import PersistenceManager
+from src.core.scheduler import starts_on_open
 from src.core.config_manager import ConfigManager
-from src.ui.popups import SaveDialog, LoadDialog
 from src.ui.connection_widget import ConnectionWidget
-from kivy.uix.popup import Popup
+from src.utils.startup_trace import trace
 from kivy.graphics import Color, Line, Bezier
 from kivy.uix.widget import Widget
+from kivy.clock import Clock
 import os
+import threading
 
 class Controller:
     def __init__(self):
         self.graph = Graph()
-        self.audio_engine = AudioEngine()
+        self.config_manager = ConfigManager()
+        trace.mark("config")
+        # Engine-host mode (config.json): the engine runs in its own process, and
+        # this one never imports sounddevice
+        if self.config_manager.get_engine_host():
+            from src.core.engine_host import RemoteEngine
+            self.audio_engine = RemoteEngine()
+        else:
+            from src.core.audio_engine import AudioEngine
+            self.audio_engine = AudioEngine()
+        trace.mark("engine_init")
         self.audio_engine.set_graph(self.graph)
         self.ui_root = None # Reference to MainLayout
         self.current_workspace_file = "workspace.json"
-        
-        self.config_manager = ConfigManager()
+
+        # Decoded audio cache location/size can be overridden in config.json
+        cache_max_mb = self.config_manager.get_pcm_cache_max_mb()
+        self.audio_engine.configure_cache(self.config_manager.get_pcm_cache_dir(),
+                                          int(cache_max_mb) * 1024 * 1024 if cache_max_mb else None)
 
         # Connection Dragging State
         self.dragging_connection = False
@@ -40,6 +54,7 @@ class Controller:
                 self._create_initial_graph()
         else:
             self._create_initial_graph()
+        trace.mark("workspace_load")
 
     def _create_initial_graph(self):
         self.graph = Graph()
@@ -59,15 +74,21 @@ class Controller:
         self.ui_root = ui_root
         # Bind UI events
         self.ui_root.bottom_bar.play_btn.bind(on_release=self.toggle_play)
+        self.ui_root.bottom_bar.stats_provider = self.audio_engine.get_stats
         
         # Monitor audio engine state to update play button
         # We can't bind directly to is_playing as it's not a Kivy property
         # So we'll use a Clock interval to check or add a callback in AudioEngine
         # For now, let's add a simple callback hook to AudioEngine
         self.audio_engine.on_play_state_change = self._on_play_state_change
-        
-        # Check for OPEN triggers
-        self._check_auto_start_triggers()
+        self.ui_root.right_panel.source_state_provider = self.audio_engine.get_source_state
+        self.ui_root.right_panel.trigger_fire_callback = self.fire_trigger
+        self.ui_root.right_panel.source_position_provider = self.audio_engine.get_source_position
+        self.ui_root.right_panel.source_seek_callback = self.audio_engine.seek_source
+        self.ui_root.right_panel.output_devices_provider = lambda: [
+            device['name'] for device in self.audio_engine.get_available_devices()]
+        # Hotplug: the engine's device registry re-enumerated (any thread)
+        self.audio_engine.on_devices_changed = lambda: Clock.schedule_once(lambda dt: self._load_device_list())
         
         # Bind Left Panel Buttons
         if hasattr(self.ui_root.left_panel, 'save_btn'):
@@ -80,46 +101,17 @@ class Controller:
         if hasattr(self.ui_root.left_panel, 'channel_spinner'):
             self.ui_root.left_panel.channel_spinner.bind(text=self.on_channel_count_change)
 
-        # Initialize UI with current graph state
-        # Get Device Info
-        device_info = self.audio_engine.get_default_output_device_info()
-        if hasattr(self.ui_root.left_panel, 'set_device_info'):
-            self.ui_root.left_panel.set_device_info(device_info)
-            
-        # Get Available Devices for Selector
-        devices = self.audio_engine.get_available_devices()
-        if hasattr(self.ui_root.left_panel, 'set_device_list'):
-            self.ui_root.left_panel.set_device_list(devices)
-            
-        if hasattr(self.ui_root.left_panel, 'device_spinner'):
-            self.ui_root.left_panel.device_spinner.bind(text=self.on_device_select)
-            
-            # Restore visual selection if graph has settings and audio_device is saved
-            if self.graph and 'audio_device' in self.graph.settings:
-                saved_device_name = self.graph.settings['audio_device']
-                # Find matching spinner value
-                # Spinner values format: "Name (Index)" or truncated "Name... (Index)"
-                # We need to find the one that corresponds to the device index we want, 
-                # or match by name if possible.
-                
-                # First, find the index of the device by name from current available devices
-                target_index = -1
-                for dev in devices:
-                    if dev['name'] == saved_device_name:
-                        target_index = dev['index']
-                        break
-                
-                if target_index != -1:
-                    # Set the audio engine device (ensure it's set)
-                    self.audio_engine.set_output_device(target_index)
-                    
-                    # Find the spinner string that contains this index "({index})"
-                    suffix = f"({target_index})"
-                    for val in self.ui_root.left_panel.device_spinner.values:
-                        if val.endswith(suffix):
-                            # This will trigger on_device_select, which is fine, it will re-confirm settings
-                            self.ui_root.left_panel.device_spinner.text = val
-                            break
+        if hasattr(self.ui_root.left_panel, 'latency_spinner'):
+            self.ui_root.left_panel.latency_spinner.text = self.audio_engine.latency_profile
+            self.ui_root.left_panel.latency_spinner.bind(text=self.on_latency_profile_change)
+
+        # Boot-to-sound first: select the saved device (the only enumeration before
+        # playback, and only if one was saved), start, then fill the device selector
+        self._restore_saved_device()
+        trace.mark("device_query")
+        self._check_auto_start_triggers()
+        Clock.schedule_once(lambda dt: self._load_device_list(), 0.2)
+        Clock.schedule_once(lambda dt: self._watch_media_dirs(), 1.0)
 
         # Restore channel count spinner
         if hasattr(self.ui_root.left_panel, 'channel_spinner'):
@@ -129,23 +121,74 @@ class Controller:
 
         self.refresh_ui()
 
+    def _restore_saved_device(self):
+        # Saved by name (see DeviceRegistry.find): indexes change between boots and
+        # replugs. Returns the device's current index, or None.
+        device_name = self.graph.settings.get('audio_device') if self.graph else None
+        if not device_name:
+            return None
+        device_index = self.audio_engine.find_output_device(device_name)
+        if device_index is None:
+            print(f"Saved audio device not found: {device_name}")
+        else:
+            print(f"Restoring audio device: {device_name} (Index: {device_index})")
+            self.audio_engine.set_output_device(device_index)
+        return device_index
+
+    def _watch_media_dirs(self):
+        # Probe the configured media folders in the background, so adding a
+        # file source later does not wait on ffprobe
+        from src.utils.media_index import get_media_index
+        index = get_media_index()
+        index.prune()
+        for directory in self.config_manager.get_media_dirs():
+            index.watch(os.path.expanduser(directory))
+
+    def _load_device_list(self):
+        # Queried on a background thread: the first enumeration can take a while
+        # with some ALSA setups, and playback has already started
+        def query():
+            info = self.audio_engine.get_default_output_device_info()
+            devices = self.audio_engine.get_available_devices()
+            trace.mark("device_list")
+            Clock.schedule_once(lambda dt: self._show_device_list(info, devices))
+        threading.Thread(target=query, name="DeviceQuery", daemon=True).start()
+
+    def _show_device_list(self, info, devices):
+        left_panel = self.ui_root.left_panel
+        if hasattr(left_panel, 'set_device_list'):
+            left_panel.set_device_list(devices)
+        if hasattr(left_panel, 'set_device_info'):
+            left_panel.set_device_info(info)
+        if hasattr(left_panel, 'device_spinner'):
+            saved_device_name = self.graph.settings.get('audio_device') if self.graph else None
+            device_index = self.audio_engine.find_output_device(saved_device_name) if saved_device_name else None
+            self._show_selected_device(device_index)
+
+    def _show_selected_device(self, device_index):
+        # Shows the device in the selector without selecting it again (which would
+        # restart the stream), then listens for the user's choices
+        left_panel = self.ui_root.left_panel
+        spinner = left_panel.device_spinner
+        spinner.unbind(text=self.on_device_select)
+        if device_index is not None:
+            suffix = f"({device_index})"
+            for val in spinner.values:
+                if val.endswith(suffix):
+                    spinner.text = val
+                    break
+            device = self.audio_engine.get_devices()[device_index]
+            left_panel.set_device_info({'name': device['name'], 'max_output_channels': device['max_output_channels']})
+        spinner.bind(text=self.on_device_select)
+
     def _check_auto_start_triggers(self):
         # Look for Triggers with type 'open' and fire them
         if not self.graph:
             return
-            
-        should_start = False
-        for node in self.graph.nodes.values():
-            if node.type == NodeType.TRIGGER:
-                trigger_type = node.get_property("trigger_type", "on_start")
-                if trigger_type == "open":
-                    should_start = True
-                    break
-        
-        if should_start:
+
+        if starts_on_open(self.graph):
             print("Auto-starting due to 'open' trigger")
             # Defer slightly to ensure audio engine is fully ready
-            from kivy.clock import Clock
             Clock.schedule_once(lambda dt: self.audio_engine.start(), 0.1)
 
     def on_device_select(self, spinner, text):
@@ -155,11 +198,12 @@ class Controller:
             idx_str = text.split('(')[-1].replace(')', '')
             device_index = int(idx_str)
             print(f"Switching to device index: {device_index}")
+            # Looked up first: switching may re-enumerate (deferred hotplug) and renumber
+            all_devices = self.audio_engine.get_devices()
+            dev_info = all_devices[device_index]
             self.audio_engine.set_output_device(device_index)
             
             # Update device info label
-            all_devices = self.audio_engine.get_devices()
-            dev_info = all_devices[device_index]
             
             # Save to graph settings
             if isinstance(dev_info, dict):
@@ -179,10 +223,16 @@ class Controller:
         except Exception as e:
             print(f"Error switching device: {e}")
 
+    def on_latency_profile_change(self, spinner, text):
+        # Saved with the workspace; the engine restarts the stream if it is playing
+        if self.graph.settings.get('latency_profile', self.audio_engine.latency_profile) == text:
+            return
+        self.graph.settings['latency_profile'] = text
+        self.audio_engine.set_latency_profile(text)
+
     def _on_play_state_change(self, is_playing):
         # Update UI button state from non-UI thread potentially
         # So we should use Clock.schedule_once
-        from kivy.clock import Clock
         def update_btn(dt):
             if self.ui_root:
                 self.ui_root.bottom_bar.play_btn.text = "STOP" if is_playing else "PLAY"
@@ -196,7 +246,16 @@ class Controller:
             self.audio_engine.start()
             instance.text = "STOP"
             
+    def fire_trigger(self, trigger_id):
+        # Manual/test trigger: starts playback first if needed (which fires start triggers)
+        if not self.audio_engine.is_playing:
+            self.audio_engine.start()
+        self.audio_engine.fire_trigger(trigger_id)
+
     def save_workspace(self, instance):
+        # File chooser and popups load on first use, not at startup
+        from src.ui.popups import SaveDialog
+        from kivy.uix.popup import Popup
         content = SaveDialog(save_callback=self._do_save, cancel_callback=self._dismiss_popup, default_filename=os.path.basename(self.current_workspace_file))
         self._popup = Popup(title="Save Workspace", content=content, size_hint=(0.9, 0.9))
         self._popup.open()
@@ -210,6 +269,8 @@ class Controller:
         self._dismiss_popup()
 
     def load_workspace(self, instance):
+        from src.ui.popups import LoadDialog
+        from kivy.uix.popup import Popup
         content = LoadDialog(load_callback=self._do_load, cancel_callback=self._dismiss_popup)
         self._popup = Popup(title="Load Workspace", content=content, size_hint=(0.9, 0.9))
         self._popup.open()
@@ -223,39 +284,20 @@ class Controller:
             self.graph = loaded_graph
             
             # Restore audio device if saved
-            device_name = self.graph.settings.get('audio_device')
-            if device_name:
-                devices = self.audio_engine.get_available_devices()
-                found_index = None
-                for dev in devices:
-                    if dev['name'] == device_name:
-                        found_index = dev['index']
-                        break
-                
-                if found_index is not None:
-                    print(f"Restoring audio device: {device_name} (Index: {found_index})")
-                    self.audio_engine.set_output_device(found_index)
-                    # Update spinner if UI is ready
-                    if self.ui_root and hasattr(self.ui_root.left_panel, 'device_spinner'):
-                        suffix = f"({found_index})"
-                        for val in self.ui_root.left_panel.device_spinner.values:
-                            if val.endswith(suffix):
-                                self.ui_root.left_panel.device_spinner.text = val
-                                break
+            device_index = self._restore_saved_device()
+            if device_index is not None and self.ui_root and hasattr(self.ui_root.left_panel, 'device_spinner'):
+                self._show_selected_device(device_index)
             
             # Sync Channel Spinner
             channels = [n for n in self.graph.nodes.values() if n.type == NodeType.CHANNEL]
             if self.ui_root and hasattr(self.ui_root.left_panel, 'channel_spinner'):
                 self.ui_root.left_panel.channel_spinner.text = str(len(channels))
 
-            # Reconnect property change callbacks for all nodes
-            for node in self.graph.nodes.values():
-                node.on_property_change = self.audio_engine.update_property
-                # Pre-populate audio engine cache
-                for key, val in node.properties.items():
-                    self.audio_engine.update_property(node.id, key, val)
-
+            # Compiles every node's properties and hooks their change callbacks;
+            # also applies the saved latency profile
             self.audio_engine.set_graph(self.graph)
+            if self.ui_root and hasattr(self.ui_root.left_panel, 'latency_spinner'):
+                self.ui_root.left_panel.latency_spinner.text = self.audio_engine.latency_profile
             self.refresh_ui()
             self.current_workspace_file = file_path
             self.config_manager.set_last_opened_file(file_path)
@@ -268,6 +310,8 @@ class Controller:
 
     def clear_workspace(self, instance):
         self._create_initial_graph()
+        if self.ui_root and hasattr(self.ui_root.left_panel, 'latency_spinner'):
+            self.ui_root.left_panel.latency_spinner.text = self.audio_engine.latency_profile
         self.refresh_ui()
         print("Workspace cleared")
 
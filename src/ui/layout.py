@@ -2,6 +2,7 @@ from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.stencilview import StencilView
 from kivy.uix.button import Button
+from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.label import Label
 from kivy.uix.slider import Slider
 from kivy.uix.spinner import Spinner
@@ -10,11 +11,17 @@ from kivy.properties import ObjectProperty, BooleanProperty, NumericProperty
 from kivy.animation import Animation
 from src.ui.node_widget import NodeWidget
 from src.core.node import NodeType
+from src.core.latency import PROFILE_NAMES, DEFAULT_PROFILE
+from src.core.oscillators import WAVE_TYPES
+from src.core.scheduler import TRIGGER_TYPES, DURATION_MODES
+from src.core.segment_timeline import PLAYBACK_MODES, ONE_SHOT
 from kivy.clock import Clock
 import os
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from src.utils.audio_loader import get_audio_info
+from src.utils.media_index import get_media_index
+from src.utils.pcm_format import STORAGE_FORMATS
 import math
 
 def format_time(seconds):
@@ -151,23 +158,69 @@ class BottomBar(BoxLayout):
             self.bg_rect = Rectangle(pos=self.pos, size=self.size)
         self.bind(pos=self._update_rect, size=self._update_rect)
 
+        # Set by the controller: returns AudioEngine.get_stats()
+        self.stats_provider = None
+        self._stats_event = None
+
         # Play/Stop Button
         self.play_btn = Button(text="PLAY", size_hint_x=None, width=100)
         self.add_widget(self.play_btn)
         
-        # Spacer
-        self.add_widget(Label())
+        # Spacer, doubling as the callback timing overlay
+        self.stats_label = Label(text="", color=(0,0,0,1), halign='right', valign='middle')
+        self.stats_label.bind(size=self.stats_label.setter('text_size'))
+        self.add_widget(self.stats_label)
+
+        self.stats_btn = ToggleButton(text="Stats", size_hint_x=None, width=80)
+        self.stats_btn.bind(state=self._on_stats_toggle)
+        self.add_widget(self.stats_btn)
 
     def _update_rect(self, instance, value):
         self.bg_rect.pos = instance.pos
         self.bg_rect.size = instance.size
 
+    def _on_stats_toggle(self, instance, state):
+        if self._stats_event:
+            self._stats_event.cancel()
+            self._stats_event = None
+        self.stats_label.text = ""
+        if state == 'down':
+            self._update_stats(0)
+            self._stats_event = Clock.schedule_interval(self._update_stats, 0.5)
+
+    def _update_stats(self, dt):
+        stats = self.stats_provider() if self.stats_provider else None
+        if not stats or not stats.get("window"):
+            self.stats_label.text = "No callbacks yet"
+            return
+        duration = stats["duration_ms"]
+        sources = stats["source_ms"]
+        self.stats_label.text = (
+            f"CPU {stats['cpu_load']:.0f}% (peak {stats['peak_load']:.0f}%)  "
+            f"Callback {duration['p50']:.2f}/{duration['p99']:.2f}/{duration['max']:.2f} ms "
+            f"of {stats['deadline_ms']:.1f} ms  "
+            f"Wave {sources['wave']:.2f} File {sources['file']:.2f} ms  "
+            f"Xruns {stats['xruns']} Late {stats['late_blocks']}"
+        )
+
 class SidePanel(FloatLayout):
     is_open = BooleanProperty(False)
     
     def __init__(self, side='left', **kwargs):
         super().__init__(**kwargs)
         self.side = side
+        # Set by the controller: node_id -> "idle"/"loading"/"ready"/"error"
+        self.source_state_provider = None
+        # Set by the controller: fires a trigger node by id
+        self.trigger_fire_callback = None
+        # Set by the controller: node_id -> playhead dict (see AudioEngine.get_source_position)
+        self.source_position_provider = None
+        # Set by the controller: (node_id, seconds) -> moves a file source's playhead
+        self.source_seek_callback = None
+        # Set by the controller: names of the output devices a channel can play on
+        self.output_devices_provider = None
+        self._status_event = None
+        self._position_event = None
         self.size_hint_x = None
         self.width = 180 # Panel Width
         self.size_hint_y = 1
@@ -283,6 +336,15 @@ class SidePanel(FloatLayout):
         )
         self.content_area.add_widget(self.channel_spinner)
 
+        # Latency profile (block size), bound in controller
+        self.content_area.add_widget(Label(text="Latency:", size_hint_y=None, height=30, color=(0,0,0,1)))
+        self.latency_spinner = Spinner(
+            text=DEFAULT_PROFILE,
+            values=PROFILE_NAMES,
+            size_hint_y=None, height=40
+        )
+        self.content_area.add_widget(self.latency_spinner)
+
     def _update_rect(self, instance, value):
         self.bg_rect.pos = instance.pos
         self.bg_rect.size = instance.size
@@ -354,6 +416,13 @@ class SidePanel(FloatLayout):
         if self.side != 'right':
             return
             
+        if self._status_event:
+            self._status_event.cancel()
+            self._status_event = None
+        if self._position_event:
+            self._position_event.cancel()
+            self._position_event = None
+
         self.content_area.clear_widgets()
         
         if not node:
@@ -441,7 +510,7 @@ class SidePanel(FloatLayout):
         self.content_area.add_widget(Label(text="Wave", size_hint_y=None, height=30, color=(0,0,0,1)))
         spinner = Spinner(
             text=node.get_property("wave_type", "sine"),
-            values=("sine", "square", "sawtooth"),
+            values=WAVE_TYPES,
             size_hint_y=None, height=40
         )
         def on_wave_change(spinner, text):
@@ -449,6 +518,44 @@ class SidePanel(FloatLayout):
         spinner.bind(text=on_wave_change)
         self.content_area.add_widget(spinner)
 
+        # Timing: infinite, on for a duration, or on/off intermittently
+        self.content_area.add_widget(Label(text="Duration", size_hint_y=None, height=30, color=(0,0,0,1)))
+        mode_spinner = Spinner(
+            text=node.get_property("duration_mode", "infinite"),
+            values=DURATION_MODES,
+            size_hint_y=None, height=40
+        )
+        def on_mode_change(spinner, text):
+            node.set_property("duration_mode", text)
+        mode_spinner.bind(text=on_mode_change)
+        self.content_area.add_widget(mode_spinner)
+
+        for key, label in (("duration", "On (s)"), ("interval", "Off (s)")):
+            row = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=5)
+            row.add_widget(Label(text=label, size_hint_x=0.4, color=(0,0,0,1)))
+            value_btn = Button(
+                text=str(node.get_property(key, 1.0)),
+                size_hint_x=0.6,
+                background_color=(0.9, 0.9, 0.9, 1),
+                color=(0, 0, 0, 1)
+            )
+
+            def on_time_input(val, key=key, value_btn=value_btn):
+                try:
+                    seconds = float(val)
+                except (TypeError, ValueError):
+                    return
+                if seconds >= 0:
+                    node.set_property(key, seconds)
+                    value_btn.text = str(seconds)
+
+            def open_time_numpad(instance, callback=on_time_input):
+                NumericKeypadPopup(callback=callback, initial_value=instance.text).open()
+
+            value_btn.bind(on_release=open_time_numpad)
+            row.add_widget(value_btn)
+            self.content_area.add_widget(row)
+
     def _build_file_controls(self, node):
         from kivy.uix.filechooser import FileChooserListView
         from kivy.uix.popup import Popup
@@ -472,6 +579,9 @@ class SidePanel(FloatLayout):
             content = BoxLayout(orientation='vertical')
             # Use FileChooserListView for touch friendliness
             file_chooser = FileChooserListView(path=os.path.expanduser("~"), filters=['*.wav', '*.mp3', '*.ogg'])
+            # Probe the folder being browsed, so the selected file is usually indexed already
+            file_chooser.bind(path=lambda chooser, path: get_media_index().scan(path, recursive=False))
+            get_media_index().scan(file_chooser.path, recursive=False)
             content.add_widget(file_chooser)
             
             btn_layout = BoxLayout(size_hint_y=None, height=50)
@@ -493,12 +603,15 @@ class SidePanel(FloatLayout):
                     # Update file info
                     try:
                         channels, sr, duration = get_audio_info(selected_file)
-                        node.set_property("channels", channels)
-                        node.set_property("sample_rate", sr)
-                        node.set_property("file_duration", duration)
+                        info = {
+                            "channels": channels,
+                            "sample_rate": sr,
+                            "file_duration": duration
+                        }
                         # Set default end time to duration if 0
                         if node.get_property("end_time", 0.0) == 0.0:
-                            node.set_property("end_time", duration)
+                            info["end_time"] = duration
+                        node.set_properties(info)
                         
                         # Refresh inspector to show new info
                         self.update_inspector(node)
@@ -525,13 +638,24 @@ class SidePanel(FloatLayout):
         self.content_area.add_widget(Label(text=f"Channels: {channels}", size_hint_y=None, height=30, color=(0,0,0,1)))
         self.content_area.add_widget(Label(text=f"Duration: {format_time(duration)}", size_hint_y=None, height=30, color=(0,0,0,1)))
 
+        # Load state (files are decoded in the background)
+        status_label = Label(text="Status: -", size_hint_y=None, height=30, color=(0,0,0,1))
+        self.content_area.add_widget(status_label)
+
+        def update_status(dt):
+            if self.source_state_provider:
+                status_label.text = f"Status: {self.source_state_provider(node.id)}"
+
+        update_status(0)
+        self._status_event = Clock.schedule_interval(update_status, 0.5)
+
         # File Playback Controls (Advanced)
         
         # Playback Mode (Loop/One Shot)
         self.content_area.add_widget(Label(text="Playback Mode", size_hint_y=None, height=30, color=(0,0,0,1)))
         loop_spinner = Spinner(
-            text=node.get_property("playback_mode", "One Shot"),
-            values=("One Shot", "Loop", "N Times"),
+            text=node.get_property("playback_mode", ONE_SHOT),
+            values=PLAYBACK_MODES,
             size_hint_y=None, height=40
         )
         def on_loop_change(spinner, text):
@@ -539,6 +663,47 @@ class SidePanel(FloatLayout):
         loop_spinner.bind(text=on_loop_change)
         self.content_area.add_widget(loop_spinner)
 
+        # Repeats (N Times; 0 = forever) and silence around every repeat
+        for key, label, cast in (("loop_count", "Times", int),
+                                 ("padding_before", "Pad before (s)", float),
+                                 ("padding_after", "Pad after (s)", float)):
+            row = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=5)
+            row.add_widget(Label(text=label, size_hint_x=0.5, color=(0,0,0,1)))
+            value_btn = Button(
+                text=str(node.get_property(key, 0)),
+                size_hint_x=0.5,
+                background_color=(0.9, 0.9, 0.9, 1),
+                color=(0, 0, 0, 1)
+            )
+
+            def on_value_input(val, key=key, cast=cast, value_btn=value_btn):
+                try:
+                    value = cast(float(val))
+                except (TypeError, ValueError):
+                    return
+                if value >= 0:
+                    node.set_property(key, value)
+                    value_btn.text = str(value)
+
+            def open_value_numpad(instance, callback=on_value_input):
+                NumericKeypadPopup(callback=callback, initial_value=instance.text).open()
+
+            value_btn.bind(on_release=open_value_numpad)
+            row.add_widget(value_btn)
+            self.content_area.add_widget(row)
+
+        # Decoded PCM format (integer formats use less memory on small boards)
+        self.content_area.add_widget(Label(text="Storage", size_hint_y=None, height=30, color=(0,0,0,1)))
+        storage_spinner = Spinner(
+            text=node.get_property("storage_format", "") or "Default",
+            values=("Default",) + STORAGE_FORMATS,
+            size_hint_y=None, height=40
+        )
+        def on_storage_change(spinner, text):
+            node.set_property("storage_format", "" if text == "Default" else text)
+        storage_spinner.bind(text=on_storage_change)
+        self.content_area.add_widget(storage_spinner)
+
         # Start/End Trim (Seconds) with Numeric Input
         self.content_area.add_widget(Label(text="Trim Start/End", size_hint_y=None, height=30, color=(0,0,0,1)))
         
@@ -600,11 +765,40 @@ class SidePanel(FloatLayout):
         self.content_area.add_widget(start_row)
         self.content_area.add_widget(end_row)
         
-        # Seek / Progress (Placeholder)
+        # Seek / Progress: follows the source's playhead, seeks on release
         self.content_area.add_widget(Label(text="Audio Position", size_hint_y=None, height=30, color=(0,0,0,1)))
-        seek_slider = Slider(min=0, max=100, value=0, size_hint_y=None, height=40)
-        # In a real app, this would bind to audio engine position
+        position_label = Label(text="-", size_hint_y=None, height=30, color=(0,0,0,1))
+        seek_slider = Slider(min=0, max=max(duration, 0.01), value=0, size_hint_y=None, height=40)
         self.content_area.add_widget(seek_slider)
+        self.content_area.add_widget(position_label)
+
+        dragging = [False] # Do not move the knob under the user's finger
+
+        def on_seek_press(instance, touch):
+            if instance.collide_point(*touch.pos):
+                dragging[0] = True
+
+        def on_seek_release(instance, touch):
+            if touch.grab_current is instance:
+                dragging[0] = False
+                if self.source_seek_callback:
+                    self.source_seek_callback(node.id, instance.value)
+
+        def update_position(dt):
+            position = self.source_position_provider(node.id) if self.source_position_provider else None
+            if not position:
+                return
+            if position["end"] > position["start"]:
+                seek_slider.min = position["start"]
+                seek_slider.max = position["end"]
+            loops = f" (loop {position['iteration'] + 1})" if position["iteration"] else ""
+            position_label.text = f"{format_time(position['position'])} {position['state']}{loops}"
+            if not dragging[0]:
+                seek_slider.value = min(max(position["position"], seek_slider.min), seek_slider.max)
+
+        seek_slider.bind(on_touch_down=on_seek_press, on_touch_up=on_seek_release)
+        update_position(0)
+        self._position_event = Clock.schedule_interval(update_position, 0.25)
 
     def _build_channel_inspector(self, node, graph=None):
         self.content_area.add_widget(Label(text="Output Mapping", size_hint_y=None, height=30, color=(0,0,0,1)))
@@ -613,11 +807,12 @@ class SidePanel(FloatLayout):
         # 1. Hardware Output Channel
         self.content_area.add_widget(Label(text="HW Channel", size_hint_y=None, height=30, color=(0,0,0,1)))
         
-        # Determine used channels
+        # Determine used channels (on the same device)
+        device = node.get_property("hardware_device", "default")
         used_channels = []
         if graph:
             for n in graph.nodes.values():
-                if n.id != node.id and n.type == NodeType.CHANNEL:
+                if n.id != node.id and n.type == NodeType.CHANNEL and n.get_property("hardware_device", "default") == device:
                     mapped = n.get_property("channel_index", 0)
                     if mapped > 0:
                         used_channels.append(mapped)
@@ -654,6 +849,27 @@ class SidePanel(FloatLayout):
         spinner.bind(text=on_channel_change)
         self.content_area.add_widget(spinner)
 
+        # Output device: "default" follows the main device, other devices play in sync with it
+        self.content_area.add_widget(Label(text="Device", size_hint_y=None, height=30, color=(0,0,0,1)))
+        device_names = ["default"]
+        if self.output_devices_provider:
+            device_names += [name for name in self.output_devices_provider() if name not in device_names]
+        if device not in device_names:
+            device_names.append(device)
+        device_spinner = Spinner(
+            text=device,
+            values=device_names,
+            size_hint_y=None, height=40
+        )
+
+        def on_device_change(spinner, text):
+            node.set_property("hardware_device", text)
+            # Channel numbers in use differ per device
+            self.update_inspector(node, graph)
+
+        device_spinner.bind(text=on_device_change)
+        self.content_area.add_widget(device_spinner)
+
         # 2. Source Channel Selection
         self.content_area.add_widget(Label(text="Source Channel", size_hint_y=None, height=30, color=(0,0,0,1)))
         
@@ -704,7 +920,7 @@ class SidePanel(FloatLayout):
         # Trigger Type Spinner
         trigger_spinner = Spinner(
             text=node.get_property("trigger_type", "on_start"),
-            values=("on_start", "manual", "open"),
+            values=tuple(TRIGGER_TYPES),
             size_hint_y=None, height=40
         )
         
@@ -714,8 +930,14 @@ class SidePanel(FloatLayout):
         trigger_spinner.bind(text=on_trigger_type_change)
         self.content_area.add_widget(trigger_spinner)
         
-        # Manual Trigger Button (if needed for testing)
+        # Manual Trigger Button: fires this trigger now, whatever its type
         btn = Button(text="TEST TRIGGER", size_hint_y=None, height=50)
+
+        def on_fire(instance):
+            if self.trigger_fire_callback:
+                self.trigger_fire_callback(node.id)
+
+        btn.bind(on_release=on_fire)
         self.content_area.add_widget(btn)
 
 class MainLayout(FloatLayout):
@@ -2,19 +2,52 @@ import subprocess
 import numpy as np
 import os
 import json
+from src.utils.pcm_file import open_pcm_file
+from src.utils.pcm_format import decode_into
+
+try:
+    import soundfile as sf # Optional: libsndfile decodes FLAC/OGG etc. in-process
+except (ImportError, OSError):
+    sf = None
 
 def get_audio_info(file_path):
     """
-    Returns (channels, sample_rate, duration) using ffprobe.
+    Returns (channels, sample_rate, duration), from the media index when the
+    file was probed before (see media_index), otherwise probe_audio_file().
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
+    from src.utils.media_index import get_media_index
+    info = get_media_index().info(file_path)
+    if info is None:
+        return 0, 0, 0.0
+    return info["channels"], info["sample_rate"], info["duration"]
+
+def probe_audio_file(file_path):
+    """
+    Returns a dict with channels, sample_rate, duration and codec, or None
+    if there is no audio stream. PCM WAV/AIFF headers are read directly,
+    other formats go through libsndfile when installed, then ffprobe.
+    """
+    pcm = open_pcm_file(file_path)
+    if pcm is not None:
+        return pcm.info()
+    if sf is not None:
+        try:
+            info = sf.info(file_path)
+            return {"channels": info.channels, "sample_rate": info.samplerate,
+                    "duration": info.frames / info.samplerate, "codec": info.format.lower()}
+        except Exception:
+            pass # Not a format libsndfile reads (MP3 on older versions, M4A, ...)
+    return _ffprobe(file_path)
+
+def _ffprobe(file_path):
     cmd = [
         'ffprobe',
         '-v', 'error',
         '-select_streams', 'a:0',
-        '-show_entries', 'stream=channels,sample_rate,duration',
+        '-show_entries', 'stream=channels,sample_rate,duration,codec_name',
         '-of', 'json',
         file_path
     ]
@@ -23,26 +56,59 @@ def get_audio_info(file_path):
         output = subprocess.check_output(cmd).decode('utf-8')
         data = json.loads(output)
         if not data.get('streams'):
-            return 0, 0, 0.0
+            return None
         stream = data['streams'][0]
-        channels = int(stream.get('channels', 2))
-        sample_rate = int(stream.get('sample_rate', 44100))
-        duration = float(stream.get('duration', 0.0))
-        return channels, sample_rate, duration
+        return {
+            "channels": int(stream.get('channels', 2)),
+            "sample_rate": int(stream.get('sample_rate', 44100)),
+            "duration": float(stream.get('duration', 0.0)),
+            "codec": stream.get('codec_name', ""),
+        }
     except Exception as e:
         print(f"Error probing file {file_path}: {e}")
-        return 0, 0, 0.0
+        return None
 
 def load_audio_file(file_path, target_sample_rate=44100):
     """
-    Decodes audio file to float32 numpy array using ffmpeg.
-    Resamples to target_sample_rate.
+    Decodes audio file to a float32 (frames, channels) numpy array at
+    target_sample_rate. PCM WAV/AIFF at that rate is converted straight from
+    a memmap of the file (float32 little-endian comes back as the memmap
+    itself), then libsndfile is tried, and ffmpeg handles everything else,
+    resampling included.
     Returns (audio_data, channels, sample_rate)
     """
-    channels, src_sample_rate, duration = get_audio_info(file_path)
+    for load in (load_pcm_file, load_with_soundfile, load_with_ffmpeg):
+        audio_data = load(file_path, target_sample_rate)
+        if audio_data is not None:
+            return audio_data, audio_data.shape[1], target_sample_rate
+    return None, 0, 0
+
+def load_pcm_file(file_path, target_sample_rate=44100):
+    pcm = open_pcm_file(file_path)
+    if pcm is None or pcm.sample_rate != target_sample_rate:
+        return None
+    if pcm.data.dtype == np.dtype('<f4'):
+        return pcm.data
+    audio_data = np.empty((pcm.frames, pcm.channels), dtype=np.float32)
+    decode_into(pcm.data, audio_data)
+    return audio_data
+
+def load_with_soundfile(file_path, target_sample_rate=44100):
+    if sf is None:
+        return None
+    try:
+        with sf.SoundFile(file_path) as f:
+            if f.samplerate != target_sample_rate:
+                return None
+            return f.read(dtype='float32', always_2d=True)
+    except Exception:
+        return None
+
+def load_with_ffmpeg(file_path, target_sample_rate=44100):
+    channels, _, _ = get_audio_info(file_path)
     if channels == 0:
-        return None, 0, 0
-        
+        return None
+
     cmd = [
         'ffmpeg',
         '-v', 'error',
@@ -65,9 +131,109 @@ def load_audio_file(file_path, target_sample_rate=44100):
              audio_data = np.pad(audio_data, (0, padding))
              
         frames = len(audio_data) // channels
-        audio_data = audio_data.reshape((frames, channels))
-        
-        return audio_data, channels, target_sample_rate
+        return audio_data.reshape((frames, channels))
     except Exception as e:
         print(f"Error loading file {file_path}: {e}")
-        return None, 0, 0
+        return None
+
+def open_audio_stream(file_path, channels, target_sample_rate=44100, start_time=0.0):
+    """
+    Starts an ffmpeg process that decodes file_path to interleaved float32
+    on stdout, beginning at start_time seconds.
+    Returns the Popen object; the caller reads frames from proc.stdout.
+    """
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-ss', str(max(0.0, start_time)),
+        '-i', file_path,
+        '-f', 'f32le',
+        '-acodec', 'pcm_f32le',
+        '-ar', str(target_sample_rate),
+        '-ac', str(channels),
+        '-'
+    ]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+class PcmFileReader:
+    """
+    Reads a PCM WAV/AIFF file through its memmap (see pcm_file), converting
+    each chunk to float32; no process, no pipe.
+    """
+    def __init__(self, pcm, start_frame=0):
+        self.pcm = pcm
+        self.channels = pcm.channels
+        self.position = min(max(0, start_frame), pcm.frames)
+
+    def read(self, frames):
+        stored = self.pcm.data[self.position:self.position + frames]
+        self.position += len(stored)
+        chunk = np.empty((len(stored), self.channels), dtype=np.float32)
+        decode_into(stored, chunk)
+        return chunk
+
+    def close(self):
+        pass
+
+class SoundFileReader:
+    # libsndfile decoder (FLAC, OGG, ...) at the file's own sample rate
+    def __init__(self, sound_file, start_frame=0):
+        self.file = sound_file
+        self.channels = sound_file.channels
+        if start_frame > 0:
+            self.file.seek(min(start_frame, sound_file.frames))
+
+    def read(self, frames):
+        return self.file.read(frames, dtype='float32', always_2d=True)
+
+    def close(self):
+        self.file.close()
+
+class FfmpegReader:
+    # ffmpeg pipe (see open_audio_stream): any format, resampled to the target rate
+    def __init__(self, file_path, channels, target_sample_rate=44100, start_time=0.0):
+        self.channels = channels
+        self.proc = open_audio_stream(file_path, channels, target_sample_rate, start_time)
+        self._pending = b""
+        self._eof = False
+
+    def read(self, frames):
+        frame_bytes = self.channels * 4
+        data = self.proc.stdout.read(frames * frame_bytes - len(self._pending))
+        self._eof = not data
+        raw = self._pending + data
+        usable = len(raw) - (len(raw) % frame_bytes)
+        self._pending = raw[usable:]
+        return np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, self.channels)
+
+    def close(self):
+        # After the end of the output, raises if ffmpeg failed, so a broken
+        # decode is not taken for the end of the file
+        if self._eof:
+            self.proc.wait()
+            if self.proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg exited with {self.proc.returncode}")
+        elif self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait(timeout=1.0)
+
+def open_audio_reader(file_path, channels, target_sample_rate=44100, start_time=0.0):
+    """
+    Opens the cheapest decoder for file_path at target_sample_rate, starting
+    at start_time seconds: the file's own memmap for PCM WAV/AIFF, libsndfile,
+    or an ffmpeg pipe. Readers return float32 (frames, channels) chunks from
+    read(frames), an empty one at the end, and are closed with close().
+    """
+    start_frame = int(max(0.0, start_time) * target_sample_rate)
+    pcm = open_pcm_file(file_path)
+    if pcm is not None and pcm.sample_rate == target_sample_rate and pcm.channels == channels:
+        return PcmFileReader(pcm, start_frame)
+    if sf is not None:
+        try:
+            sound_file = sf.SoundFile(file_path)
+            if sound_file.samplerate == target_sample_rate and sound_file.channels == channels and sound_file.seekable():
+                return SoundFileReader(sound_file, start_frame)
+            sound_file.close()
+        except Exception:
+            pass
+    return FfmpegReader(file_path, channels, target_sample_rate, start_time)
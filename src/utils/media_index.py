@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from src.utils.audio_loader import probe_audio_file
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError: # Optional: without it, scanned directories are not kept fresh
+    Observer = None
+    FileSystemEventHandler = object
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "asplayer", "media_index.sqlite")
+AUDIO_EXTENSIONS = ('.wav', '.wave', '.aif', '.aiff', '.flac', '.mp3', '.ogg', '.oga', '.opus', '.m4a')
+FIELDS = ("channels", "sample_rate", "duration", "codec")
+
+def is_audio_file(file_path: str) -> bool:
+    return file_path.lower().endswith(AUDIO_EXTENSIONS)
+
+class _IndexHandler(FileSystemEventHandler):
+    # watchdog callbacks (observer thread): re-probe changed files, forget removed ones
+    def __init__(self, index: 'MediaIndex'):
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.request(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.index.request(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.forget(event.src_path)
+            self.index.request(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.forget(event.src_path)
+
+class MediaIndex:
+    """
+    Persistent metadata of audio files (channels, sample rate, duration,
+    codec) in an SQLite table keyed by path, validated by mtime and size.
+    The whole table is mirrored in a dict, so a lookup is one stat() and a
+    dict access; only misses run ffprobe. scan() probes a directory in a
+    small worker pool, watch() also keeps it fresh with watchdog.
+    """
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH, workers: int = 2,
+                 probe: Callable[[str], Optional[Dict]] = probe_audio_file):
+        self.db_path = db_path
+        self.probe = probe
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, tuple]] = None # path -> (mtime_ns, size, channels, sample_rate, duration, codec)
+        self._db: Optional[sqlite3.Connection] = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="MediaIndex")
+        self._pending = set()
+        self._observer = None
+        self._watched = set()
+
+    # Queries
+
+    def get(self, file_path: str) -> Optional[Dict]:
+        # Indexed metadata if the file has not changed since it was probed; never probes
+        file_path = os.path.abspath(file_path)
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            if self._entries and file_path in self._entries:
+                self.forget(file_path) # Deleted since it was indexed
+            return None
+        entry = self._load().get(file_path)
+        if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(zip(FIELDS, entry[2:]))
+
+    def info(self, file_path: str) -> Optional[Dict]:
+        # Like get(), but probes a missing/stale file right away (in the caller's thread)
+        info = self.get(file_path)
+        if info is None:
+            info = self._probe(os.path.abspath(file_path))
+        return info
+
+    # Filling
+
+    def request(self, file_path: str):
+        # Probe in the background unless indexed and fresh
+        file_path = os.path.abspath(file_path)
+        if not is_audio_file(file_path):
+            return
+        with self._lock:
+            if file_path in self._pending:
+                return
+            self._pending.add(file_path)
+        self._pool.submit(self._run_request, file_path)
+
+    def scan(self, directory: str, recursive: bool = True):
+        # Queues every audio file under `directory`; returns immediately
+        self._pool.submit(self._run_scan, os.path.abspath(directory), recursive)
+
+    def watch(self, directory: str):
+        # scan() now, then re-probe files as they are added, changed or moved
+        directory = os.path.abspath(directory)
+        self.scan(directory)
+        if Observer is None:
+            print("watchdog is not installed; media index only updates on lookups")
+            return
+        with self._lock:
+            if directory in self._watched or not os.path.isdir(directory):
+                return
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            self._observer.schedule(_IndexHandler(self), directory, recursive=True)
+            self._watched.add(directory)
+
+    def prune(self):
+        # Drops entries of files deleted while nothing was watching; returns immediately
+        self._pool.submit(self._run_prune)
+
+    def forget(self, file_path: str):
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            if self._load().pop(file_path, None) is not None:
+                self._connect().execute("DELETE FROM media WHERE path = ?", (file_path,))
+                self._db.commit()
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+        self._pool.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        return {
+            "db_path": self.db_path,
+            "entries": len(self._load()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "probes": self.probes,
+            "watched": sorted(self._watched),
+        }
+
+    # Internals
+
+    def _run_scan(self, directory: str, recursive: bool):
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if is_audio_file(name):
+                    self.request(os.path.join(root, name))
+            if not recursive:
+                break
+
+    def _run_prune(self):
+        missing = [file_path for file_path in list(self._load()) if not os.path.exists(file_path)]
+        if not missing:
+            return
+        with self._lock:
+            for file_path in missing:
+                self._entries.pop(file_path, None)
+            self._connect().executemany("DELETE FROM media WHERE path = ?", [(p,) for p in missing])
+            self._db.commit()
+
+    def _run_request(self, file_path: str):
+        try:
+            if self.get(file_path) is None and os.path.exists(file_path):
+                self._probe(file_path)
+        except Exception as e:
+            print(f"Error indexing {file_path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(file_path)
+
+    def _probe(self, file_path: str) -> Optional[Dict]:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        info = self.probe(file_path)
+        self.probes += 1
+        if not info or not info.get("channels"):
+            # Not stored: a failed probe (e.g. no ffprobe) is retried next time
+            return None
+        row = (file_path, st.st_mtime_ns, st.st_size, int(info["channels"]), int(info["sample_rate"]),
+               float(info["duration"]), info.get("codec") or "")
+        with self._lock:
+            self._load()[file_path] = row[1:]
+            self._connect().execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self._db.commit()
+        return dict(zip(FIELDS, row[3:]))
+
+    def _connect(self) -> sqlite3.Connection:
+        # Under self._lock; one connection shared by every thread
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, mtime_ns INTEGER, "
+                             "size INTEGER, channels INTEGER, sample_rate INTEGER, duration REAL, codec TEXT)")
+            self._db.commit()
+        return self._db
+
+    def _load(self) -> Dict[str, tuple]:
+        # The table is read once, on first use; later writes go to both
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    entries = {}
+                    try:
+                        for row in self._connect().execute("SELECT * FROM media"):
+                            entries[row[0]] = tuple(row[1:])
+                    except sqlite3.Error as e:
+                        print(f"Error reading media index {self.db_path}: {e}")
+                    self._entries = entries
+        return self._entries
+
+_index: Optional[MediaIndex] = None
+
+def get_media_index() -> MediaIndex:
+    # The process-wide index, opened on first use
+    global _index
+    if _index is None:
+        _index = MediaIndex()
+    return _index
+
+def set_media_index(index: Optional[MediaIndex]) -> Optional[MediaIndex]:
+    # Replaces the process-wide index (tests use one in a temp dir); returns the previous one
+    global _index
+    previous, _index = _index, index
+    return previous
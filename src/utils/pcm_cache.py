@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import numpy as np
+from typing import Optional, Dict, Any
+from src.utils.audio_loader import get_audio_info, open_audio_reader
+from src.utils.pcm_format import (DEFAULT_STORAGE_FORMAT, resolve_format,
+                                  storage_shape, storage_dtype, encode_pcm)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "asplayer", "pcm")
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024 # 4 GB
+
+class PcmCache:
+    """
+    Persistent cache of decoded PCM on disk.
+    Each entry is a raw interleaved PCM file plus a small JSON sidecar,
+    keyed by source path, mtime, size, target sample rate and storage format
+    (float32 by default, or int32/int24/int16; see pcm_format). Cached
+    entries are opened with np.memmap so only the region being played is
+    paged in; readers convert to float32 with pcm_format.decode_into.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 storage_format: str = DEFAULT_STORAGE_FORMAT):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Default for calls that do not name a format
+        self.storage_format = resolve_format(storage_format)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._jobs = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    def _key(self, file_path: str, sample_rate: int, storage_format: Optional[str] = None) -> Optional[str]:
+        storage_format = self._format(storage_format)
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        ident = f"{os.path.abspath(file_path)}|{st.st_mtime_ns}|{st.st_size}|{sample_rate}|{storage_format}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pcm", base + ".json"
+
+    def lookup(self, file_path: str, sample_rate: int, storage_format: Optional[str] = None):
+        """
+        Returns (memmap, channels) for a cached decode, or (None, 0) on a miss.
+        The memmap holds `frames` rows in the storage layout (pcm_format.storage_shape).
+        """
+        storage_format = self._format(storage_format)
+        key = self._key(file_path, sample_rate, storage_format)
+        if key is None:
+            return None, 0
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            frames, channels = int(meta['frames']), int(meta['channels'])
+            shape = storage_shape(storage_format, frames, channels)
+            if frames <= 0:
+                data = np.zeros(shape, dtype=storage_dtype(storage_format))
+            else:
+                data = np.memmap(data_path, dtype=storage_dtype(storage_format), mode='r', shape=shape)
+            # Touch the sidecar: its mtime is the LRU timestamp
+            os.utime(meta_path, None)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None, 0
+        with self._lock:
+            self.hits += 1
+        return data, channels
+
+    def request(self, file_path: str, sample_rate: int, storage_format: Optional[str] = None):
+        """
+        Queues a background decode of file_path into the cache (no-op if already cached or pending).
+        """
+        storage_format = self._format(storage_format)
+        key = self._key(file_path, sample_rate, storage_format)
+        if key is None or os.path.exists(self._paths(key)[1]):
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="PcmCache", daemon=True)
+                self._worker.start()
+            self._jobs.put((key, file_path, sample_rate, storage_format))
+
+    def decode(self, file_path: str, sample_rate: int, storage_format: Optional[str] = None) -> bool:
+        """
+        Decodes file_path into the cache synchronously, streaming to disk in chunks
+        so memory stays constant. Returns True on success.
+        """
+        storage_format = self._format(storage_format)
+        key = self._key(file_path, sample_rate, storage_format)
+        if key is None:
+            return False
+        return self._decode(key, file_path, sample_rate, storage_format)
+
+    def store(self, file_path: str, sample_rate: int, data: np.ndarray,
+              storage_format: Optional[str] = None) -> bool:
+        """
+        Writes already-decoded float (frames, channels) audio into the cache.
+        """
+        storage_format = self._format(storage_format)
+        key = self._key(file_path, sample_rate, storage_format)
+        if key is None:
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        encode_pcm(data, storage_format).tofile(data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+        self._write_meta(meta_path, file_path, sample_rate, data.shape[1], data.shape[0], storage_format)
+        self.evict()
+        return True
+
+    def _format(self, storage_format):
+        return resolve_format(storage_format) if storage_format else self.storage_format
+
+    def _write_meta(self, meta_path, file_path, sample_rate, channels, frames, storage_format):
+        meta = {
+            "source": os.path.abspath(file_path),
+            "sample_rate": sample_rate,
+            "channels": channels,
+            "frames": frames,
+            "dtype": storage_format
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def _run(self):
+        while True:
+            try:
+                key, file_path, sample_rate, storage_format = self._jobs.get(timeout=5.0)
+            except queue.Empty:
+                with self._lock:
+                    if self._jobs.empty():
+                        self._worker = None
+                        return
+                continue
+            try:
+                self._decode(key, file_path, sample_rate, storage_format)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    def _decode(self, key, file_path, sample_rate, storage_format) -> bool:
+        channels, _, _ = get_audio_info(file_path)
+        if channels == 0:
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        tmp_path = data_path + ".tmp"
+        # Decoders deliver float32; other formats are converted per chunk
+        frames = 0
+        reader = None
+        try:
+            reader = open_audio_reader(file_path, channels, sample_rate)
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    chunk = reader.read(16384)
+                    if len(chunk) == 0:
+                        break
+                    if storage_format == "float32":
+                        out.write(chunk.tobytes())
+                    else:
+                        out.write(encode_pcm(chunk, storage_format).tobytes())
+                    frames += len(chunk)
+            reader.close()
+            reader = None
+
+            os.replace(tmp_path, data_path)
+            self._write_meta(meta_path, file_path, sample_rate, channels, frames, storage_format)
+        except Exception as e:
+            print(f"Error caching {file_path}: {e}")
+            if reader:
+                try:
+                    reader.close()
+                except Exception:
+                    pass
+            for path in (tmp_path, data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+
+        self.evict()
+        return True
+
+    def _entries(self):
+        # (last_access, size, key) for every complete entry
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            data_path, meta_path = self._paths(key)
+            try:
+                size = os.path.getsize(data_path) + os.path.getsize(meta_path)
+                entries.append((os.path.getmtime(meta_path), size, key))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self, max_bytes: Optional[int] = None):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= limit:
+                break
+            # Sidecar first so a concurrent lookup never sees meta without data
+            data_path, meta_path = self._paths(key)
+            for path in (meta_path, data_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        self.evict(0)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        with self._lock:
+            return {
+                "cache_dir": self.cache_dir,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "pending": len(self._pending)
+            }
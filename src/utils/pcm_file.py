@@ -0,0 +1,162 @@
+import os
+import struct
+import numpy as np
+from typing import Optional
+
+# WAVE_FORMAT_* codes (also the first two bytes of an extensible sub-format GUID)
+_WAVE_PCM = 0x0001
+_WAVE_FLOAT = 0x0003
+_WAVE_EXTENSIBLE = 0xFFFE
+
+# AIFF-C compression types read in place: (byte order, integer or float)
+_AIFC_TYPES = {
+    b'NONE': ('>', 'i'), b'twos': ('>', 'i'),
+    b'sowt': ('<', 'i'),
+    b'fl32': ('>', 'f'), b'FL32': ('>', 'f'),
+    b'fl64': ('>', 'f'), b'FL64': ('>', 'f'),
+}
+
+class PcmFile:
+    """
+    An uncompressed WAV/AIFF file mapped in place: `data` is a read-only
+    np.memmap of the sample data, (frames, channels) in the file's own
+    sample type, or (frames, channels, 3) little-endian bytes for 24-bit
+    (what pcm_format.decode_into converts to float32). Nothing is decoded
+    up front; pages are read as slices of `data` are touched.
+    """
+    def __init__(self, file_path: str, channels: int, sample_rate: int, frames: int, codec: str, data: np.ndarray):
+        self.file_path = file_path
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.codec = codec
+        self.data = data
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def info(self) -> dict:
+        # Same fields as audio_loader.probe_audio_file
+        return {"channels": self.channels, "sample_rate": self.sample_rate,
+                "duration": self.duration, "codec": self.codec}
+
+def open_pcm_file(file_path: str) -> Optional[PcmFile]:
+    """
+    Maps a PCM WAV (RIFF/RF64, incl. WAVE_FORMAT_EXTENSIBLE) or AIFF/AIFF-C
+    file. Returns None for anything else (compressed, 8-bit, malformed),
+    which the callers decode with libsndfile or ffmpeg instead.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE':
+                layout = _parse_wav(f, header[:4] == b'RF64')
+            elif header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+                layout = _parse_aiff(f, header[8:12] == b'AIFC')
+            else:
+                return None
+        if layout is None:
+            return None
+        return _map(file_path, *layout)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error reading header of {file_path}: {e}")
+        return None
+
+def _chunks(f, byte_order: str):
+    # (id, size, offset of the chunk body); bodies are padded to an even size
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        chunk_id, size = head[:4], struct.unpack(byte_order + 'I', head[4:])[0]
+        offset = f.tell()
+        yield chunk_id, size, offset
+        f.seek(offset + size + (size & 1))
+
+def _parse_wav(f, rf64: bool):
+    fmt = None
+    data_size_64 = None
+    for chunk_id, size, offset in _chunks(f, '<'):
+        if chunk_id == b'ds64':
+            # RF64: the real sizes of the RIFF and data chunks (both 0xFFFFFFFF in the headers)
+            data_size_64 = struct.unpack('<QQ', f.read(16))[1]
+        elif chunk_id == b'fmt ':
+            body = f.read(size)
+            code, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+            if code == _WAVE_EXTENSIBLE and len(body) >= 26:
+                code = struct.unpack('<H', body[24:26])[0]
+            fmt = (code, channels, sample_rate, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            code, channels, sample_rate, bits = fmt
+            if rf64 and data_size_64 is not None:
+                size = data_size_64
+            if code == _WAVE_PCM and bits in (16, 24, 32):
+                kind = 'i'
+            elif code == _WAVE_FLOAT and bits in (32, 64):
+                kind = 'f'
+            else:
+                return None
+            codec = f"pcm_{'s' if kind == 'i' else 'f'}{bits}le"
+            return channels, sample_rate, '<', kind, bits, offset, size, None, codec
+    return None
+
+def _parse_aiff(f, aifc: bool):
+    comm = None
+    for chunk_id, size, offset in _chunks(f, '>'):
+        if chunk_id == b'COMM':
+            body = f.read(size)
+            channels, frames, bits = struct.unpack('>hIh', body[:8])
+            sample_rate = _extended_to_float(body[8:18])
+            byte_order, kind = ('>', 'i')
+            if aifc:
+                compression = body[18:22]
+                if compression not in _AIFC_TYPES:
+                    return None
+                byte_order, kind = _AIFC_TYPES[compression]
+            comm = (channels, int(round(sample_rate)), byte_order, kind, bits, frames)
+        elif chunk_id == b'SSND':
+            if comm is None:
+                return None
+            channels, sample_rate, byte_order, kind, bits, frames = comm
+            if (kind == 'i' and bits not in (16, 24, 32)) or (kind == 'f' and bits not in (32, 64)):
+                return None
+            data_offset = struct.unpack('>I', f.read(4))[0]
+            start = offset + 8 + data_offset
+            codec = f"pcm_{'s' if kind == 'i' else 'f'}{bits}{'be' if byte_order == '>' else 'le'}"
+            return channels, sample_rate, byte_order, kind, bits, start, size - 8 - data_offset, frames, codec
+    return None
+
+def _extended_to_float(raw: bytes) -> float:
+    # 80-bit IEEE 754 extended precision (the AIFF sample rate)
+    exponent, mantissa = struct.unpack('>HQ', raw)
+    sign = -1.0 if exponent & 0x8000 else 1.0
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def _map(file_path, channels, sample_rate, byte_order, kind, bits, offset, size, frames, codec) -> Optional[PcmFile]:
+    if channels <= 0 or sample_rate <= 0:
+        return None
+    sample_bytes = bits // 8
+    frame_bytes = channels * sample_bytes
+    # Files still being written (or cut short) announce more data than they hold
+    size = min(size, max(0, os.path.getsize(file_path) - offset))
+    available = size // frame_bytes
+    frames = available if frames is None else min(frames, available)
+
+    if bits == 24:
+        dtype, shape = np.uint8, (frames, channels, 3)
+    else:
+        dtype, shape = np.dtype(f"{byte_order}{kind}{sample_bytes}"), (frames, channels)
+    if frames == 0:
+        data = np.zeros(shape, dtype=dtype)
+    else:
+        data = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    if bits == 24 and byte_order == '>':
+        # Reversed view of the three bytes: little-endian order, no copy
+        data = data[..., ::-1]
+    return PcmFile(file_path, channels, sample_rate, frames, codec, data)
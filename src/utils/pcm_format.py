@@ -0,0 +1,67 @@
+import numpy as np
+
+# Sample formats decoded PCM can be stored in. Integer formats halve (int16)
+# or cut by a quarter (int24, packed 3 bytes per sample) the size of cache
+# entries and of the pages they occupy while playing; samples are converted
+# to float32 only when the reader thread copies them out.
+STORAGE_FORMATS = ("float32", "int32", "int24", "int16")
+DEFAULT_STORAGE_FORMAT = "float32"
+
+# Full-scale value of each integer format
+_FULL_SCALE = {
+    "int32": 2.0 ** 31,
+    "int24": 2.0 ** 23,
+    "int16": 2.0 ** 15,
+}
+
+def resolve_format(storage_format) -> str:
+    if storage_format in STORAGE_FORMATS:
+        return storage_format
+    if storage_format:
+        print(f"Unknown PCM storage format: {storage_format}")
+    return DEFAULT_STORAGE_FORMAT
+
+def storage_shape(storage_format: str, frames: int, channels: int):
+    # Memmap shape of a stored entry; int24 keeps its three bytes in a last axis
+    if storage_format == "int24":
+        return (frames, channels, 3)
+    return (frames, channels)
+
+def storage_dtype(storage_format: str):
+    return np.uint8 if storage_format == "int24" else np.dtype(storage_format)
+
+def encode_pcm(data: np.ndarray, storage_format: str) -> np.ndarray:
+    """
+    Converts float32 (frames, channels) audio into the storage layout
+    (see storage_shape). Used off the audio thread, when writing the cache.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if storage_format == "float32":
+        return np.ascontiguousarray(data)
+    scale = _FULL_SCALE[storage_format]
+    # float64 so the int32 bounds are exact
+    ints = np.clip(np.rint(data * np.float64(scale)), -scale, scale - 1).astype(np.int32)
+    if storage_format == "int24":
+        # Little-endian low three bytes of each int32
+        return np.ascontiguousarray(ints.astype('<i4').view(np.uint8).reshape(data.shape + (4,))[..., :3])
+    return ints.astype(storage_format)
+
+def decode_into(stored: np.ndarray, out: np.ndarray):
+    """
+    Converts stored samples (a slice of an entry) into the float32 `out`,
+    which has the same number of frames. Works in place in `out` with no
+    temporaries the size of the block. Also takes the sample types read in
+    place from WAV/AIFF files (see pcm_file): big-endian, float64.
+    """
+    if stored.dtype.kind == 'f':
+        out[...] = stored
+    elif stored.dtype == np.uint8:
+        # Packed int24: high byte (signed) * 65536 + middle * 256 + low
+        np.copyto(out, stored[..., 2].view(np.int8), casting='unsafe')
+        np.multiply(out, 256.0, out=out)
+        np.add(out, stored[..., 1], out=out, casting='unsafe')
+        np.multiply(out, 256.0, out=out)
+        np.add(out, stored[..., 0], out=out, casting='unsafe')
+        np.multiply(out, 1.0 / _FULL_SCALE["int24"], out=out)
+    else:
+        np.multiply(stored, 1.0 / _FULL_SCALE[stored.dtype.name], out=out, casting='unsafe')
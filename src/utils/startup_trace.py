@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+def _process_age() -> Optional[float]:
+    # Seconds since the process started (Linux only): interpreter start-up and
+    # everything imported before this module
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class StartupTrace:
+    """
+    Timeline of boot-to-sound: named marks, in seconds since this module was
+    first imported (first thing in main.py and src/headless.py), written to
+    a report once the first audio callback ran. Only the first mark of each
+    name is kept, so marks can sit in code that runs again later (stream
+    reopen, the audio callback). mark() takes no lock and appends one tuple.
+    """
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.process_age = _process_age()
+        self.marks: List[Tuple[str, float]] = []
+        self._names = set()
+
+    def mark(self, name: str):
+        self.mark_at(name, time.perf_counter())
+
+    def mark_at(self, name: str, at: float):
+        # `at` is a perf_counter() time; on Linux that is CLOCK_MONOTONIC, so marks
+        # taken in the engine-host process land on this timeline as they are
+        if name in self._names:
+            return
+        self._names.add(name)
+        self.marks.append((name, at - self.origin))
+
+    def seconds(self, name: str) -> Optional[float]:
+        for mark, seconds in self.marks:
+            if mark == name:
+                return seconds
+        return None
+
+    def report(self) -> str:
+        lines = [f"ASPlayer startup, {time.strftime('%Y-%m-%d %H:%M:%S')}"]
+        offset = self.process_age or 0.0
+        if self.process_age is not None:
+            lines.append(f"{'process start':<20}{-offset:9.3f} s")
+        previous = 0.0
+        for name, seconds in sorted(self.marks, key=lambda mark: mark[1]):
+            lines.append(f"{name:<20}{seconds:9.3f} s  (+{seconds - previous:.3f})")
+            previous = seconds
+        first_callback = self.seconds("first_callback")
+        if first_callback is None:
+            lines.append("boot-to-sound: no audio callback yet")
+        else:
+            lines.append(f"boot-to-sound: {first_callback + offset:.3f} s")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str) -> bool:
+        try:
+            # Replaced in one step, so a reader never sees half a report
+            with open(path + ".tmp", 'w') as f:
+                f.write(self.report())
+            os.replace(path + ".tmp", path)
+            return True
+        except Exception as e:
+            print(f"Error writing startup report: {e}")
+            return False
+
+    def report_when(self, name: str, path: str, timeout: float = 30.0):
+        # Writes the report from a background thread once `name` is marked (or
+        # after `timeout`), so waiting never delays start-up itself
+        def wait_and_write():
+            deadline = time.monotonic() + timeout
+            while name not in self._names and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.write_report(path)
+        threading.Thread(target=wait_and_write, name="StartupReport", daemon=True).start()
+
+# The process-wide trace
+trace = StartupTrace()
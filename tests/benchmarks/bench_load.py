@@ -0,0 +1,141 @@
+"""
+Benchmark of whole-file audio loading.
+
+Writes stereo test files (PCM WAV 16/24-bit, float WAV, 16-bit AIFF, and
+FLAC when libsndfile is installed) and loads each one with every decoder
+available here: the in-process PCM path (memmap of the file), libsndfile
+and ffmpeg (the former only path). Reports wall time, peak Python heap
+(tracemalloc, numpy buffers included) and the peak RSS of child processes,
+which is where ffmpeg's own memory shows up. Also times the first chunk of
+a streaming open, what a FileStream restart waits for.
+
+Run from the repository root:
+
+    python -m tests.benchmarks.bench_load
+    python -m tests.benchmarks.bench_load --quick
+    python -m tests.benchmarks.bench_load --seconds 300
+"""
+import argparse
+import os
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from src.utils import audio_loader
+from src.utils.audio_loader import (load_pcm_file, load_with_soundfile, load_with_ffmpeg,
+                                    open_audio_reader, FfmpegReader)
+from src.utils.pcm_format import encode_pcm
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+DURATIONS = [10, 60]
+QUICK_DURATIONS = [10]
+# (name, container, sample format)
+FORMATS = [
+    ("wav s16", "wav", "int16"),
+    ("wav s24", "wav", "int24"),
+    ("wav f32", "wav", "float32"),
+    ("aiff s16", "aiff", "int16"),
+    ("flac s16", "flac", "int16"),
+]
+
+def make_audio(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.5 * np.stack([np.sin(2 * np.pi * 220 * t), np.sin(2 * np.pi * 330 * t)], axis=1)).astype(np.float32)
+
+def write_file(path, container, sample_format, data):
+    if container == "flac":
+        audio_loader.sf.write(path, data, SAMPLE_RATE, subtype="PCM_16")
+        return
+    raw = encode_pcm(data, sample_format)
+    bits = raw.itemsize * 8 * (3 if sample_format == "int24" else 1)
+    if container == "aiff":
+        exponent = SAMPLE_RATE.bit_length() - 1
+        rate = struct.pack('>HQ', 16383 + exponent, SAMPLE_RATE << (63 - exponent))
+        comm = struct.pack('>hIh', CHANNELS, len(data), bits) + rate
+        ssnd = struct.pack('>II', 0, 0) + raw.astype('>i2').tobytes()
+        body = b'AIFF' + b'COMM' + struct.pack('>I', len(comm)) + comm + b'SSND' + struct.pack('>I', len(ssnd)) + ssnd
+        header = b'FORM' + struct.pack('>I', len(body))
+    else:
+        code = 3 if sample_format == "float32" else 1
+        block_align = CHANNELS * bits // 8
+        fmt = struct.pack('<HHIIHH', code, CHANNELS, SAMPLE_RATE, SAMPLE_RATE * block_align, block_align, bits)
+        body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', raw.nbytes) + raw.tobytes()
+        header = b'RIFF' + struct.pack('<I', len(body))
+    with open(path, 'wb') as f:
+        f.write(header + body)
+
+def decoders():
+    available = [("native", load_pcm_file)]
+    if audio_loader.sf is not None:
+        available.append(("soundfile", load_with_soundfile))
+    if shutil.which("ffmpeg"):
+        available.append(("ffmpeg", load_with_ffmpeg))
+    return available
+
+def measure(load, path):
+    # Time includes touching every sample, so a lazily mapped result pays its page-ins
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = load(path, SAMPLE_RATE)
+    checksum = float(np.asarray(data, dtype=np.float32).sum()) if data is not None else None
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if checksum is None:
+        return None
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"seconds": elapsed, "peak_mb": peak / 2 ** 20, "children_mb": children_kb / 1024}
+
+def first_chunk(path, ffmpeg):
+    started = time.perf_counter()
+    reader = FfmpegReader(path, CHANNELS, SAMPLE_RATE) if ffmpeg else open_audio_reader(path, CHANNELS, SAMPLE_RATE)
+    reader.read(4096)
+    elapsed = time.perf_counter() - started
+    reader.close()
+    return elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ASPlayer file loading")
+    parser.add_argument("--quick", action="store_true", help="Only the shortest file")
+    parser.add_argument("--seconds", type=float, nargs="*", help="File durations to test")
+    args = parser.parse_args(argv)
+    durations = args.seconds or (QUICK_DURATIONS if args.quick else DURATIONS)
+
+    available = decoders()
+    print(f"Decoders: {', '.join(name for name, _ in available)}"
+          f"{'' if shutil.which('ffmpeg') else ' (ffmpeg not found: no comparison with the former path)'}")
+    workdir = tempfile.mkdtemp(prefix="asplayer-bench-")
+    try:
+        print(f"{'file':<16} {'decoder':<10} {'load ms':>9} {'heap MB':>8} {'child MB':>9}")
+        for seconds in durations:
+            data = make_audio(seconds)
+            for name, container, sample_format in FORMATS:
+                if container == "flac" and audio_loader.sf is None:
+                    continue
+                path = os.path.join(workdir, f"{seconds:g}s-{name.replace(' ', '-')}.{container}")
+                write_file(path, container, sample_format, data)
+                label = f"{name} {seconds:g}s"
+                for decoder, load in available:
+                    result = measure(load, path)
+                    if result is None:
+                        print(f"{label:<16} {decoder:<10} {'n/a':>9}")
+                        continue
+                    # Child RSS is a process-wide maximum, only meaningful for ffmpeg
+                    children = f"{result['children_mb']:>9.1f}" if decoder == "ffmpeg" else f"{'-':>9}"
+                    print(f"{label:<16} {decoder:<10} {result['seconds'] * 1000:>9.1f} "
+                          f"{result['peak_mb']:>8.1f} {children}")
+                streams = [("reader", first_chunk(path, False))]
+                if shutil.which("ffmpeg"):
+                    streams.append(("ffmpeg", first_chunk(path, True)))
+                print(f"{label:<16} first chunk: " + ", ".join(f"{n} {s * 1000:.1f} ms" for n, s in streams))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Benchmark of the audio render path.
+
+Builds synthetic graphs (1-64 sources, 2-32 output channels, wave/file
+mixes), drives AudioEngine._audio_callback against a fake outdata buffer
+at several block sizes, and reports µs per block, percent of the block
+deadline and callback allocations. File sources read from a temporary
+PCM cache, so no decoder or audio device is needed.
+
+Run from the repository root:
+
+    python -m tests.benchmarks.bench_render                  # compare with the baseline
+    python -m tests.benchmarks.bench_render --save-baseline  # record this machine's numbers
+    python -m tests.benchmarks.bench_render --quick
+
+Baselines are per machine (a Pi 3 and a Pi 5 differ by far more than any
+regression), so record one on each target and keep it next to this file.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode, SourceType
+from src.core.audio_engine import AudioEngine
+from src.core.buffer_pool import AllocationProbe
+from src.utils.pcm_cache import PcmCache
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SAMPLE_RATE = 44100
+# (sources, output channels, mix)
+CASES = [
+    (1, 2, "wave"),
+    (4, 2, "mixed"),
+    (8, 8, "mixed"),
+    (16, 8, "file"),
+    (32, 16, "mixed"),
+    (64, 32, "mixed"),
+]
+BLOCK_SIZES = [256, 1024, 8192]
+QUICK_CASES = [(1, 2, "wave"), (8, 8, "mixed")]
+QUICK_BLOCK_SIZES = [512]
+
+def build_graph(sources, channels, mix, file_path):
+    # One trigger firing every source; each source gets its own channel node
+    graph = Graph()
+    trigger = TriggerNode()
+    graph.add_node(trigger)
+    for i in range(sources):
+        is_file = mix == "file" or (mix == "mixed" and i % 2 == 1)
+        source = SourceNode(SourceType.FILE if is_file else SourceType.WAVE)
+        if is_file:
+            source.properties["file_path"] = file_path
+            source.properties["loop"] = True
+        else:
+            source.properties["wave_type"] = ("sine", "square", "sawtooth")[i % 3]
+            source.properties["frequency"] = 110.0 * (i + 1)
+        channel = ChannelNode(label=f"Output {i + 1}")
+        channel.properties["channel_index"] = i % channels + 1
+        channel.properties["volume"] = 1.0 / sources
+        graph.add_node(source)
+        graph.add_node(channel)
+        graph.add_connection(trigger.id, source.id)
+        graph.add_connection(source.id, channel.id)
+    return graph
+
+def make_file_source(workdir):
+    # Any existing file works as a cache key; the "decoded" PCM is stored directly
+    file_path = os.path.join(workdir, "bench.wav")
+    with open(file_path, 'wb') as f:
+        f.write(b"bench")
+    cache = PcmCache(cache_dir=os.path.join(workdir, "pcm"))
+    frames = SAMPLE_RATE * 10
+    t = np.arange(frames) / SAMPLE_RATE
+    data = np.stack([np.sin(2 * np.pi * 220 * t), np.sin(2 * np.pi * 330 * t)], axis=1).astype(np.float32)
+    cache.store(file_path, SAMPLE_RATE, data)
+    return file_path, cache
+
+def fill_and_stop(streams, timeout=10.0):
+    # Let every reader fill its ring, then stop it; the rings stay readable.
+    # Returns the frames every ring still holds.
+    deadline = time.monotonic() + timeout
+    for stream in streams:
+        while (stream.ring.space() >= stream.chunk_frames and not stream.finished
+               and time.monotonic() < deadline):
+            stream.wait_buffered(stream.ring.capacity - stream.chunk_frames, timeout=0.05)
+        stream.close()
+    # Readers check the stop flag before touching their ring again
+    time.sleep(0.05)
+    return min(stream.ring.available() for stream in streams)
+
+def run_case(sources, channels, mix, block_size, blocks, file_path, cache):
+    engine = AudioEngine()
+    engine.pcm_cache = cache
+    engine.file_loader.cache = cache
+    engine.set_graph(build_graph(sources, channels, mix, file_path))
+    streams = list(engine.file_loader.streams.values())
+
+    engine.begin_offline(channels, block_size)
+    outdata = np.zeros((block_size, channels), dtype=np.float32)
+    callback = engine._audio_callback
+    perf_counter = time.perf_counter
+    timings = []
+    try:
+        for _ in range(16):
+            for stream in streams:
+                stream.wait_buffered(block_size)
+            callback(outdata, block_size, None, None)
+
+        for _ in range(blocks):
+            for stream in streams:
+                stream.wait_buffered(block_size)
+            started = perf_counter()
+            callback(outdata, block_size, None, None)
+            timings.append(perf_counter() - started)
+
+        # tracemalloc counts every thread, so stop the file readers with full rings
+        # first and only measure as many blocks as they hold
+        alloc_blocks = 64
+        if streams:
+            alloc_blocks = min(alloc_blocks, fill_and_stop(streams) // block_size)
+        engine.allocation_probe = AllocationProbe(warmup_blocks=1, strict=False)
+        for _ in range(alloc_blocks):
+            callback(outdata, block_size, None, None)
+        allocations = engine.allocation_probe.stats()
+        engine.allocation_probe = None
+    finally:
+        engine.end_offline()
+        engine.file_loader.close_all()
+
+    timings = np.array(timings) * 1e6
+    deadline_us = block_size / SAMPLE_RATE * 1e6
+    return {
+        "us_per_block": float(np.median(timings)),
+        "p99_us": float(np.percentile(timings, 99)),
+        "deadline_pct": float(np.median(timings) / deadline_us * 100),
+        "p99_deadline_pct": float(np.percentile(timings, 99) / deadline_us * 100),
+        "max_alloc_bytes": allocations["max_bytes"],
+        "allocating_blocks": allocations["allocating_blocks"],
+    }
+
+def case_key(sources, channels, mix, block_size):
+    return f"sources={sources} channels={channels} mix={mix} block={block_size}"
+
+def load_baseline(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ASPlayer render path")
+    parser.add_argument("--quick", action="store_true", help="Run a small subset")
+    parser.add_argument("--blocks", type=int, default=200, help="Timed blocks per case")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--budget", type=float, default=50.0,
+                        help="Flag cases using more than this percent of the deadline")
+    args = parser.parse_args(argv)
+
+    cases = QUICK_CASES if args.quick else CASES
+    block_sizes = QUICK_BLOCK_SIZES if args.quick else BLOCK_SIZES
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    machine = f"{platform.node()} {platform.machine()}"
+    if baseline and baseline.get("machine") != machine:
+        print(f"Baseline was recorded on {baseline.get('machine')}, this is {machine}")
+
+    workdir = tempfile.mkdtemp(prefix="asplayer-bench-")
+    results = {}
+    failures = []
+    try:
+        file_path, cache = make_file_source(workdir)
+        print(f"{'case':<48} {'µs/block':>9} {'p99 µs':>9} {'deadline':>9} {'alloc B':>8}")
+        for sources, channels, mix in cases:
+            for block_size in block_sizes:
+                key = case_key(sources, channels, mix, block_size)
+                result = run_case(sources, channels, mix, block_size, args.blocks, file_path, cache)
+                results[key] = result
+
+                notes = []
+                if result["allocating_blocks"]:
+                    notes.append("ALLOCATES")
+                if result["p99_deadline_pct"] > args.budget:
+                    notes.append("OVER BUDGET")
+                previous = baseline["results"].get(key) if baseline else None
+                if previous:
+                    ratio = result["us_per_block"] / previous["us_per_block"]
+                    notes.append(f"{ratio:.2f}x baseline")
+                    if ratio > 1 + args.tolerance:
+                        failures.append(key)
+                        notes.append("REGRESSION")
+                print(f"{key:<48} {result['us_per_block']:>9.1f} {result['p99_us']:>9.1f} "
+                      f"{result['deadline_pct']:>8.1f}% {result['max_alloc_bytes']:>8} {' '.join(notes)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({"machine": machine, "sample_rate": SAMPLE_RATE, "results": results}, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+
+    if failures:
+        print(f"{len(failures)} case(s) regressed more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from types import SimpleNamespace
+from src.core.callback_stats import CallbackStats
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.audio_engine import AudioEngine
+
+class TestCallbackStats(unittest.TestCase):
+    def test_window_histogram_and_xruns(self):
+        stats = CallbackStats(1000, capacity=4)
+        underflow = SimpleNamespace(output_underflow=True, output_overflow=False)
+        # 100-frame blocks last 100 ms at 1 kHz
+        for duration, status in ((0.010, None), (0.020, None), (0.030, underflow), (0.150, None), (0.040, None)):
+            stats.block_sources[0] = duration / 2
+            stats.record(duration, 100, status)
+        result = stats.get_stats()
+
+        # The first block fell out of the 4-block window; the late one is still in it
+        self.assertEqual((result["blocks"], result["window"]), (5, 4))
+        self.assertEqual((result["underflows"], result["xruns"], result["late_blocks"]), (1, 1, 1))
+        self.assertAlmostEqual(result["deadline_ms"], 100.0)
+        self.assertAlmostEqual(result["duration_ms"]["max"], 150.0)
+        self.assertAlmostEqual(result["source_ms"]["wave"], 30.0)
+        self.assertAlmostEqual(result["cpu_load"], 60.0)
+        self.assertAlmostEqual(result["peak_load"], 150.0)
+        histogram = dict(result["histogram"])
+        self.assertEqual((histogram[20.0], histogram[50.0], histogram[float("inf")]), (1, 2, 1))
+
+    def test_engine_times_wave_sources(self):
+        graph = Graph()
+        trigger = TriggerNode()
+        source = SourceNode()
+        channel = ChannelNode()
+        for node in (trigger, source, channel):
+            graph.add_node(node)
+        graph.add_connection(trigger.id, source.id)
+        graph.add_connection(source.id, channel.id)
+        engine = AudioEngine()
+        engine.set_graph(graph)
+        engine.begin_offline(1, 512)
+        try:
+            outdata = np.zeros((512, 1), dtype=np.float32)
+            for _ in range(8):
+                engine._audio_callback(outdata, 512, None, None)
+        finally:
+            engine.end_offline()
+        stats = engine.get_stats()
+        self.assertEqual((stats["blocks"], stats["block_size"], stats["xruns"]), (8, 512, 0))
+        self.assertGreater(stats["source_ms"]["wave"], 0.0)
+        self.assertEqual(stats["source_ms"]["file"], 0.0)
+        self.assertEqual(sum(count for _, count in stats["histogram"]), 8)
+
+if __name__ == '__main__':
+    unittest.main()
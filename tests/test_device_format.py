@@ -0,0 +1,93 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from src.core import audio_engine
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode, SourceType
+from src.core.audio_engine import AudioEngine
+from src.core.offline_renderer import OfflineRenderer
+from src.core.device_format import negotiate_output_format, native_sample_rate
+
+USB_INTERFACE = {"name": "USB Audio", "max_output_channels": 8, "default_samplerate": 48000.0}
+
+class TestNegotiation(unittest.TestCase):
+    def test_native_rate_and_float_first(self):
+        self.assertEqual(negotiate_output_format(USB_INTERFACE, lambda rate, fmt: True), (48000, "float32"))
+
+    def test_integer_format_when_float_is_rejected(self):
+        check = lambda rate, fmt: rate == 48000 and fmt == "int16"
+        self.assertEqual(negotiate_output_format(USB_INTERFACE, check), (48000, "int16"))
+
+    def test_preferred_rate_and_fallbacks(self):
+        self.assertEqual(negotiate_output_format(USB_INTERFACE, lambda rate, fmt: True, 96000), (96000, "float32"))
+        # Native rate rejected: the next common rate the device takes
+        check = lambda rate, fmt: rate == 44100
+        self.assertEqual(negotiate_output_format(USB_INTERFACE, check), (44100, "float32"))
+        # Nothing confirmed: native rate, host converts the format
+        self.assertEqual(negotiate_output_format(USB_INTERFACE, lambda rate, fmt: False), (48000, "float32"))
+        self.assertIsNone(native_sample_rate({"default_samplerate": None}))
+
+class TestEngineRate(unittest.TestCase):
+    def setUp(self):
+        graph = Graph()
+        trigger = TriggerNode()
+        source = SourceNode() # Default sine 440Hz
+        channel = ChannelNode()
+        channel.set_property("channel_index", 1)
+        for node in (trigger, source, channel):
+            graph.add_node(node)
+        graph.add_connection(trigger.id, source.id)
+        graph.add_connection(source.id, channel.id)
+        graph.settings["sample_rate"] = 44100 # Not the test machine's device rate
+        self.engine = AudioEngine()
+        self.engine.set_graph(graph)
+
+    def test_wave_sources_render_at_the_device_rate(self):
+        self.engine.set_sample_rate(48000)
+        self.assertEqual(self.engine.file_loader.sample_rate, 48000)
+        data = OfflineRenderer(self.engine, out_channels=1, block_size=1024).render(0.1)[:, 0]
+        self.assertEqual(len(data), 4800)
+        n = np.arange(len(data))
+        np.testing.assert_allclose(data, np.sin(2 * np.pi * 440.0 * n / 48000), atol=1e-4)
+
+    def test_int16_output(self):
+        self.engine.sample_format = "int16"
+        self.engine.begin_offline(1, 512)
+        try:
+            outdata = np.zeros((512, 1), dtype=np.int16)
+            self.engine._audio_callback(outdata, 512, None, None)
+        finally:
+            self.engine.end_offline()
+        n = np.arange(512)
+        expected = np.sin(2 * np.pi * 440.0 * n / 44100) * 32767
+        np.testing.assert_allclose(outdata[:, 0], expected, atol=2)
+
+class TestFileStreamsRate(unittest.TestCase):
+    def test_file_streams_are_created_at_the_device_rate(self):
+        # Built once at the rate start() negotiates, not at 44100 and again after it
+        with tempfile.TemporaryDirectory() as tmp:
+            file_path = os.path.join(tmp, "clip.wav")
+            with open(file_path, 'wb') as f:
+                f.write(b"placeholder")
+            graph = Graph()
+            source = SourceNode(SourceType.FILE)
+            source.properties["file_path"] = file_path
+            graph.add_node(source)
+
+            engine = AudioEngine()
+            engine.pcm_cache = None
+            engine.file_loader.cache = None
+            with mock.patch.object(engine.devices, "default_output", lambda: USB_INTERFACE):
+                engine.set_graph(graph)
+                stream = engine.file_loader.streams[source.id]
+                self.assertEqual(stream.sample_rate, 48000)
+                with mock.patch.object(audio_engine.sd, "check_output_settings", lambda **kwargs: None):
+                    engine._negotiate_format(USB_INTERFACE, 2)
+            self.assertEqual(engine.sample_rate, 48000)
+            self.assertIs(engine.file_loader.streams[source.id], stream)
+            engine.file_loader.close_all()
+
+if __name__ == '__main__':
+    unittest.main()
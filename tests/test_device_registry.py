@@ -0,0 +1,82 @@
+import unittest
+import threading
+from unittest import mock
+from src.core import device_registry
+from src.core.device_registry import DeviceRegistry, stable_name
+
+class FakePortAudio:
+    """sounddevice stand-in that counts enumerations; plugged devices appear after re-initializing."""
+    def __init__(self, names):
+        self.names = list(names)
+        self.visible = list(names)
+        self.queries = 0
+        self.initializations = 0
+
+    def query_devices(self, device=None, kind=None):
+        devices = [dict(name=name, max_output_channels=2, hostapi=0) for name in self.visible]
+        if kind == 'output':
+            return devices[0]
+        self.queries += 1
+        return devices
+
+    def _terminate(self):
+        pass
+
+    def _initialize(self):
+        self.initializations += 1
+        self.visible = list(self.names)
+
+class TestDeviceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakePortAudio(["bcm2835 Headphones: - (hw:0,0)", "USB Audio: - (hw:1,0)"])
+        patcher = mock.patch.object(device_registry, "sd", self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = DeviceRegistry(poll_interval=0.01)
+        self.addCleanup(self.registry.close)
+
+    def test_enumerates_once(self):
+        for _ in range(5):
+            self.registry.outputs()
+            self.registry.device(1)
+            self.registry.default_output()
+        self.assertEqual(self.backend.queries, 1)
+        self.assertEqual(self.registry.device(1)['name'], "USB Audio: - (hw:1,0)")
+
+    def test_finds_saved_name_under_new_card_number(self):
+        self.assertEqual(stable_name("USB Audio: - (hw:2,0)"), "USB Audio: -")
+        self.assertEqual(self.registry.find("USB Audio: - (hw:1,0)"), 1)
+        self.assertEqual(self.registry.find("USB Audio: - (hw:2,0)"), 1)
+        self.assertIsNone(self.registry.find("HDMI"))
+
+    def test_hotplug_waits_until_streams_are_closed(self):
+        changes = []
+        self.registry.listeners.append(lambda registry: changes.append(registry.find("USB Audio 2: - (hw:2,0)")))
+        self.registry.outputs()
+        self.registry.is_busy = lambda: True
+        self.backend.names.append("USB Audio 2: - (hw:2,0)")
+
+        self.registry._hotplug()
+        self.assertTrue(self.registry.stale)
+        self.assertEqual((self.backend.initializations, changes), (0, []))
+
+        self.registry.is_busy = lambda: False
+        self.assertTrue(self.registry.refresh_if_stale())
+        self.assertEqual((self.backend.initializations, changes), (1, [2]))
+        self.assertFalse(self.registry.refresh_if_stale())
+
+    def test_polling_detects_new_card(self):
+        signature = ["card0"]
+        changed = threading.Event()
+        self.registry.listeners.append(lambda registry: changed.set())
+        with mock.patch.object(device_registry, "pyudev", None), \
+                mock.patch.object(device_registry, "SETTLE_TIME", 0.01), \
+                mock.patch.object(device_registry, "hardware_signature", lambda: tuple(signature)):
+            self.registry.outputs() # Starts the monitor
+            self.backend.names.append("USB Audio 2: - (hw:2,0)")
+            signature.append("card2")
+            self.assertTrue(changed.wait(2.0))
+        self.assertEqual(len(self.registry.outputs()), 3)
+
+if __name__ == '__main__':
+    unittest.main()
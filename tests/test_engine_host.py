@@ -0,0 +1,65 @@
+import unittest
+import time
+from unittest import mock
+from src.core import engine_host
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.engine_host import RemoteEngine
+from src.utils.startup_trace import StartupTrace
+
+class TestRemoteEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = RemoteEngine()
+
+    def tearDown(self):
+        self.engine.close()
+
+    def _wait_for(self, condition, timeout=10.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_graph_and_telemetry_cross_the_process_boundary(self):
+        graph = Graph()
+        trigger = TriggerNode()
+        source = SourceNode()
+        source.set_property("source_type", "file")
+        source.set_property("file_path", "/nonexistent/clip.wav")
+        channel = ChannelNode()
+        for node in (trigger, source, channel):
+            graph.add_node(node)
+        graph.add_connection(trigger.id, source.id)
+        graph.add_connection(source.id, channel.id)
+        self.engine.set_graph(graph)
+
+        # The host opened a stream for the file source and publishes its state
+        self.assertTrue(self._wait_for(lambda: source.id in self.engine.rows))
+        self.assertTrue(self._wait_for(lambda: self.engine.get_source_state(source.id) == "error"))
+        self.assertFalse(self.engine.is_playing)
+        self.assertIsInstance(self.engine.get_available_devices(), list)
+
+        # Property edits are mirrored: clearing the file drops the stream
+        source.set_property("source_type", "wave")
+        self.assertTrue(self._wait_for(lambda: source.id not in self.engine.rows))
+        self.assertEqual(self.engine.get_source_state(source.id), "idle")
+
+    def test_startup_marks_reach_the_ui_trace(self):
+        # stream_open/first_callback are marked in the host process; the report is written here
+        # The host opens a real output stream; machines without a usable device skip
+        if not self.engine.get_available_devices():
+            self.skipTest("no audio output device")
+        ui_trace = StartupTrace()
+        with mock.patch.object(engine_host, "trace", ui_trace):
+            graph = Graph()
+            graph.add_node(ChannelNode())
+            self.engine.set_graph(graph)
+            self.engine.start()
+            if not self.engine.is_playing:
+                self.skipTest("audio output device could not be opened")
+            self.assertTrue(self._wait_for(lambda: ui_trace.seconds("stream_open") is not None))
+            self.engine.stop()
+        self.assertGreater(ui_trace.seconds("stream_open"), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
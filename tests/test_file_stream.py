@@ -0,0 +1,166 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from src.core.file_loader import FileLoader
+from src.core.file_stream import RingBuffer, FileStream
+from src.utils.pcm_cache import PcmCache
+
+class TestRingBuffer(unittest.TestCase):
+    def test_write_and_read_wraps_around(self):
+        ring = RingBuffer(8, 2)
+        data = np.arange(12, dtype=np.float32).reshape(6, 2)
+        self.assertEqual(ring.write(data), 6)
+
+        out = np.zeros((4, 2), dtype=np.float32)
+        self.assertEqual(ring.read_into(out), 4)
+        np.testing.assert_array_equal(out, data[:4])
+
+        # Second write crosses the end of the ring
+        more = np.arange(100, 112, dtype=np.float32).reshape(6, 2)
+        self.assertEqual(ring.write(more), 6)
+        self.assertEqual(ring.available(), 8)
+
+        out = np.zeros((8, 2), dtype=np.float32)
+        self.assertEqual(ring.read_into(out), 8)
+        np.testing.assert_array_equal(out[:2], data[4:])
+        np.testing.assert_array_equal(out[2:], more)
+
+    def test_write_is_bounded_by_capacity(self):
+        ring = RingBuffer(4, 1)
+        self.assertEqual(ring.write(np.ones((10, 1), dtype=np.float32)), 4)
+        self.assertEqual(ring.space(), 0)
+
+    def test_underrun_leaves_remainder_untouched(self):
+        ring = RingBuffer(8, 1)
+        ring.write(np.ones((3, 1), dtype=np.float32))
+        out = np.zeros((5, 1), dtype=np.float32)
+        self.assertEqual(ring.read_into(out), 3)
+        np.testing.assert_array_equal(out[:, 0], [1, 1, 1, 0, 0])
+
+class TestFileStreamFromCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = PcmCache(cache_dir=os.path.join(self.tmp_dir, "cache"))
+        self.source = os.path.join(self.tmp_dir, "clip.wav")
+        with open(self.source, 'wb') as f:
+            f.write(b"placeholder")
+        self.data = np.arange(100, dtype=np.float32).reshape(100, 1)
+        self.cache.store(self.source, 100, self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, stream, frames):
+        out = np.zeros((frames, 1), dtype=np.float32)
+        deadline = time.time() + 2.0
+        filled = 0
+        while filled < frames and time.time() < deadline:
+            filled += stream.read_into(out[filled:])
+            time.sleep(0.001)
+        return out[:, 0]
+
+    def test_loading_state_until_prebuffered(self):
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16)
+        out = np.zeros((8, 1), dtype=np.float32)
+        self.assertEqual(stream.state, "loading")
+        self.assertEqual(stream.read_into(out), 0)
+        stream.start()
+        try:
+            deadline = time.time() + 2.0
+            while stream.state == "loading" and time.time() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(stream.state, "ready")
+        finally:
+            stream.close()
+
+    def test_rewind_keeps_an_unread_prebuffer(self):
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16)
+        loader = FileLoader(100, self.cache)
+        loader.streams["source"] = stream
+        stream.start()
+        try:
+            deadline = time.time() + 2.0
+            while stream.state == "loading" and time.time() < deadline:
+                time.sleep(0.001)
+            ring = stream.ring
+            loader.rewind_all()
+            self.assertIs(stream.ring, ring)
+            np.testing.assert_array_equal(self._read(stream, 10), np.arange(10))
+
+            # Played from: rewinding starts over
+            loader.rewind_all()
+            self.assertFalse(stream.at_start())
+            np.testing.assert_array_equal(self._read(stream, 10), np.arange(10))
+        finally:
+            stream.close()
+
+    def test_looped_segment(self):
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16)
+        stream.set_segment(0.1, 0.2, iterations=0)
+        stream.start()
+        try:
+            out = self._read(stream, 25)
+        finally:
+            stream.close()
+        expected = np.concatenate([np.arange(10, 20)] * 3)[:25]
+        np.testing.assert_array_equal(out, expected)
+
+    def test_int16_storage(self):
+        # Same samples, kept as int16 in the cache and converted per chunk
+        self.cache.store(self.source, 100, self.data / 100, "int16")
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16,
+                            storage_format="int16")
+        stream.set_segment(0.1, 0.2, iterations=0)
+        stream.start()
+        try:
+            out = self._read(stream, 25)
+        finally:
+            stream.close()
+        self.assertEqual(stream._pcm.dtype, np.int16)
+        expected = np.concatenate([np.arange(10, 20)] * 3)[:25] / 100
+        np.testing.assert_allclose(out, expected, atol=2 ** -15)
+
+    def test_playhead_counts_loops(self):
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16)
+        stream.set_segment(0.1, 0.2, iterations=0)
+        stream.start()
+        try:
+            self._read(stream, 25)
+        finally:
+            stream.close()
+        playhead = stream.playhead
+        self.assertEqual((playhead.position, playhead.iteration, playhead.state), (15, 2, "playing"))
+
+    def test_seek_refills_from_position(self):
+        stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=16)
+        stream.start()
+        try:
+            np.testing.assert_array_equal(self._read(stream, 5), np.arange(5))
+            stream.request_seek(60)
+            np.testing.assert_array_equal(self._read(stream, 5), np.arange(60, 65))
+        finally:
+            stream.close()
+        self.assertEqual(stream.playhead.position, 65)
+
+    def test_repeats_with_padding(self):
+        expected = np.concatenate([[0, 0], np.arange(10, 15), [0, 0, 0]] * 3)
+        # Period of 10 frames: one modular take per chunk (16), or spans (chunks of 4)
+        for chunk_frames in (16, 4):
+            stream = FileStream(self.source, 100, cache=self.cache, buffer_seconds=1.0, chunk_frames=chunk_frames)
+            stream.set_segment(0.1, 0.15, iterations=3, padding_before=0.02, padding_after=0.03)
+            stream.start()
+            try:
+                out = self._read(stream, 30)
+                self.assertTrue(stream.wait_buffered(1, timeout=2.0))
+                self.assertEqual(stream.read_into(np.zeros((10, 1), dtype=np.float32)), 0)
+            finally:
+                stream.close()
+            np.testing.assert_array_equal(out, expected)
+            self.assertEqual(stream.playhead.state, "finished")
+            self.assertEqual(stream.playhead.iteration, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from src import headless
+from src.core.audio_engine import AudioEngine
+from src.core.config_manager import ConfigManager
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.persistence import PersistenceManager
+from src.core.scheduler import starts_on_open
+
+class TestHeadless(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.tmp_dir, "workspace.json")
+        self.graph = Graph()
+        self.trigger = TriggerNode()
+        source = SourceNode()
+        channel = ChannelNode()
+        for node in (self.trigger, source, channel):
+            self.graph.add_node(node)
+        self.graph.add_connection(self.trigger.id, source.id)
+        self.graph.add_connection(source.id, channel.id)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, *args):
+        # Stream start/stop stubbed; `stop` already set, so run() returns after starting
+        started = []
+        def start(engine, device_index=None):
+            started.append(engine.graph)
+            engine.is_playing = True
+        PersistenceManager.save_workspace(self.graph, self.workspace)
+        stop = threading.Event()
+        stop.set()
+        with mock.patch.object(AudioEngine, "start", start), mock.patch.object(AudioEngine, "stop"), \
+                mock.patch.object(ConfigManager, "get_startup_report", return_value=None):
+            result = headless.run(self.workspace, *args, stop=stop)
+        return result, started
+
+    def test_open_trigger_starts_playback(self):
+        self.trigger.set_property("trigger_type", "open")
+        self.assertTrue(starts_on_open(self.graph))
+        result, started = self._run()
+        self.assertEqual(result, 0)
+        self.assertEqual(len(started), 1)
+        self.assertEqual(set(started[0].nodes), set(self.graph.nodes))
+
+    def test_other_triggers_wait_for_play(self):
+        self.assertFalse(starts_on_open(self.graph)) # "on_start" fires with playback, it does not start it
+        self.assertEqual(self._run(), (0, []))
+        result, started = self._run(None, True)
+        self.assertEqual((result, len(started)), (0, 1))
+
+    def test_missing_workspace_fails(self):
+        self.assertEqual(headless.run(os.path.join(self.tmp_dir, "missing.json")), 1)
+
+if __name__ == '__main__':
+    unittest.main()
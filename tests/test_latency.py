@@ -0,0 +1,44 @@
+import unittest
+from src.core.latency import AdaptiveBlockSizer
+
+class TestAdaptiveBlockSizer(unittest.TestCase):
+    def _window(self, sizer, load, xrun=False, blocks=10):
+        # Feed `blocks` callbacks that each used `load` of their deadline
+        frames = sizer.block_size
+        duration = load * frames / sizer.sample_rate
+        for _ in range(blocks):
+            sizer.record(duration, frames, xrun)
+        return sizer.decide()
+
+    def test_xrun_doubles_block_size(self):
+        sizer = AdaptiveBlockSizer(44100, 1024)
+        self.assertEqual(self._window(sizer, 0.1, xrun=True), 2048)
+        self.assertEqual(sizer.total_xruns, 10)
+
+    def test_heavy_load_doubles_block_size_up_to_max(self):
+        sizer = AdaptiveBlockSizer(44100, 4096, max_block=8192)
+        self.assertEqual(self._window(sizer, 0.9), 8192)
+        self.assertIsNone(self._window(sizer, 0.9))
+
+    def test_shrinks_only_after_calm_windows(self):
+        sizer = AdaptiveBlockSizer(44100, 2048, calm_windows=3)
+        self.assertIsNone(self._window(sizer, 0.1))
+        self.assertIsNone(self._window(sizer, 0.1))
+        self.assertEqual(self._window(sizer, 0.1), 1024)
+        # A moderate window resets the count
+        self.assertIsNone(self._window(sizer, 0.1))
+        self.assertIsNone(self._window(sizer, 0.4))
+        self.assertIsNone(self._window(sizer, 0.1))
+        self.assertIsNone(self._window(sizer, 0.1))
+
+    def test_never_below_min_block(self):
+        sizer = AdaptiveBlockSizer(44100, 256, min_block=256, calm_windows=1)
+        self.assertIsNone(self._window(sizer, 0.01))
+        self.assertEqual(sizer.block_size, 256)
+
+    def test_empty_window_keeps_size(self):
+        sizer = AdaptiveBlockSizer(44100, 1024)
+        self.assertIsNone(sizer.decide())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from src.utils import media_index
+from src.utils.media_index import MediaIndex
+
+class FakeProbe:
+    # Stands in for ffprobe: counts calls, channels taken from the file name
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, file_path):
+        self.calls.append(file_path)
+        channels = 1 if "mono" in os.path.basename(file_path) else 2
+        return {"channels": channels, "sample_rate": 48000, "duration": 1.5, "codec": "pcm_s16le"}
+
+class TestMediaIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "index", "media.sqlite")
+        self.probe = FakeProbe()
+        self.indexes = []
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def make_index(self, probe=None):
+        index = MediaIndex(self.db_path, probe=probe or self.probe)
+        self.indexes.append(index)
+        return index
+
+    def make_file(self, name, data=b"RIFF"):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_probes_once_and_persists(self):
+        path = self.make_file("mono.wav")
+        index = self.make_index()
+        self.assertIsNone(index.get(path))
+        self.assertEqual(index.info(path)["channels"], 1)
+        self.assertEqual(index.info(path)["channels"], 1)
+        self.assertEqual(len(self.probe.calls), 1)
+
+        # A new instance (next run) reads the table instead of probing
+        probe = FakeProbe()
+        info = self.make_index(probe).info(path)
+        self.assertEqual(info, {"channels": 1, "sample_rate": 48000, "duration": 1.5, "codec": "pcm_s16le"})
+        self.assertEqual(probe.calls, [])
+
+    def test_changed_file_is_probed_again(self):
+        path = self.make_file("song.wav")
+        index = self.make_index()
+        index.info(path)
+        self.make_file("song.wav", b"RIFF and more data")
+        self.assertIsNone(index.get(path))
+        index.info(path)
+        self.assertEqual(len(self.probe.calls), 2)
+
+    def test_failed_probe_is_not_stored(self):
+        path = self.make_file("broken.wav")
+        index = self.make_index(lambda file_path: None)
+        self.assertIsNone(index.info(path))
+        self.assertEqual(index.stats()["entries"], 0)
+
+    def test_scan_indexes_audio_files_in_background(self):
+        os.makedirs(os.path.join(self.tmp_dir, "sub"))
+        paths = [self.make_file("a.wav"), self.make_file("b.FLAC"), self.make_file(os.path.join("sub", "c.mp3"))]
+        self.make_file("notes.txt")
+        index = self.make_index()
+        index.scan(self.tmp_dir)
+        self.assertTrue(self.wait_for(lambda: all(index.get(path) for path in paths)))
+        self.assertEqual(sorted(self.probe.calls), sorted(paths))
+
+        # Already indexed and unchanged: a second scan probes nothing
+        index.scan(self.tmp_dir, recursive=False)
+        time.sleep(0.1)
+        self.assertEqual(len(self.probe.calls), 3)
+
+    def test_forget_removes_entry(self):
+        path = self.make_file("a.wav")
+        index = self.make_index()
+        index.info(path)
+        index.forget(path)
+        self.assertEqual(self.make_index().stats()["entries"], 0)
+
+    def test_deleted_files_are_dropped(self):
+        kept, looked_up, pruned = self.make_file("kept.wav"), self.make_file("a.wav"), self.make_file("b.wav")
+        index = self.make_index()
+        for path in (kept, looked_up, pruned):
+            index.info(path)
+        os.remove(looked_up)
+        os.remove(pruned)
+        self.assertIsNone(index.get(looked_up))
+        self.assertEqual(index.stats()["entries"], 2)
+
+        index.prune()
+        self.assertTrue(self.wait_for(lambda: index.stats()["entries"] == 1))
+        self.assertIsNotNone(self.make_index().get(kept)) # Gone from the table as well
+        self.assertEqual(self.indexes[-1].stats()["entries"], 1)
+
+    @unittest.skipIf(media_index.Observer is None, "watchdog not installed")
+    def test_watch_indexes_new_files(self):
+        index = self.make_index()
+        index.watch(self.tmp_dir)
+        time.sleep(0.2)
+        path = self.make_file("new.wav")
+        self.assertTrue(self.wait_for(lambda: index.get(path) is not None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from src.core.mixer import GainMatrixMixer
+
+class TestGainMatrixMixer(unittest.TestCase):
+    def test_mix_into_output(self):
+        mixer = GainMatrixMixer(width=3, out_channels=2, max_frames=16)
+        block = mixer.source_block(4)
+        block[:, 0] = 0.1  # Mono source
+        block[:, 1] = 0.2  # Stereo source, left
+        block[:, 2] = 0.4  # Stereo source, right
+        mixer.set_matrix(np.array([
+            [1.0, 0.0],
+            [0.0, 0.5],  # Mixdown of the stereo source to output 2
+            [0.0, 0.5],
+        ], dtype=np.float32))
+
+        out = np.full((4, 2), 9.0, dtype=np.float32)
+        mixer.mix_into(out, 4)
+        np.testing.assert_allclose(out[:, 0], 0.1)
+        np.testing.assert_allclose(out[:, 1], 0.3)
+
+    def test_output_is_clipped(self):
+        mixer = GainMatrixMixer(width=1, out_channels=1, max_frames=4)
+        mixer.source_block(4)[:] = 0.8
+        mixer.set_matrix(np.array([[2.0]], dtype=np.float32))
+        out = np.zeros((4, 1), dtype=np.float32)
+        mixer.mix_into(out, 4)
+        np.testing.assert_allclose(out, 1.0)
+
+    def test_matrix_shape_is_checked(self):
+        mixer = GainMatrixMixer(width=2, out_channels=2, max_frames=4)
+        with self.assertRaises(ValueError):
+            mixer.set_matrix(np.zeros((3, 2), dtype=np.float32))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from unittest import mock
+import numpy as np
+from src.core import audio_engine, device_registry
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.audio_engine import AudioEngine
+from src.core.file_stream import RingBuffer
+from src.core.multi_device import LinearResampler
+
+class FakeStream:
+    def __init__(self, backend, samplerate, blocksize, channels, device, callback, **kwargs):
+        self.backend = backend
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.device = device
+        self.callback = callback
+        self.active = False
+        self.next_time = 0.0
+        self.recorded = []
+
+    def start(self):
+        self.active = True
+        self.backend.streams.append(self)
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        pass
+
+class FakeBackend:
+    """
+    Stands in for sounddevice: a few output devices whose clocks run `skew`
+    (fraction, e.g. 300e-6) off nominal. run() calls every open stream's
+    callback in simulated-time order, as each device's hardware would.
+    """
+    def __init__(self, devices):
+        self.devices = [dict(name=name, max_output_channels=channels, default_samplerate=48000.0, hostapi=0)
+                        for name, channels, _ in devices]
+        self.skew = {index: skew for index, (_, _, skew) in enumerate(devices)}
+        self.accepts = {} # Device index -> accepted (rate, dtype) pairs; every setting if absent
+        self.streams = []
+        self.now = 0.0 # Simulated time, also read by the engine's clock
+
+    def query_devices(self, device=None, kind=None):
+        if kind == 'output':
+            return self.devices[0]
+        if device is None:
+            return self.devices
+        return self.devices[device]
+
+    def check_output_settings(self, device=None, samplerate=None, dtype=None, **kwargs):
+        accepts = self.accepts.get(0 if device is None else device)
+        if accepts is not None and (samplerate, dtype) not in accepts:
+            raise ValueError(f"Invalid sample rate or format: {samplerate} {dtype}")
+
+    def OutputStream(self, **kwargs):
+        return FakeStream(self, **kwargs)
+
+    def run(self, seconds, record_from=0.0):
+        end = seconds
+        while True:
+            stream = min((s for s in self.streams if s.active), key=lambda s: s.next_time)
+            if stream.next_time >= end:
+                return
+            self.now = stream.next_time
+            outdata = np.zeros((stream.blocksize, stream.channels), dtype=np.float32)
+            stream.callback(outdata, stream.blocksize, None, None)
+            if stream.next_time >= record_from:
+                stream.recorded.append(outdata)
+            index = 0 if stream.device is None else stream.device
+            stream.next_time += stream.blocksize / (stream.samplerate * (1.0 + self.skew[index]))
+
+class TestLinearResampler(unittest.TestCase):
+    def test_ramp_is_resampled_exactly(self):
+        # Linear interpolation of a ramp is exact, so every output frame is its read position
+        ring = RingBuffer(8192, 1)
+        ring.write(np.arange(8192, dtype=np.float32).reshape(-1, 1))
+        resampler = LinearResampler(256, 1)
+        out = np.zeros((256, 1), dtype=np.float32)
+        produced = []
+        for _ in range(10):
+            self.assertEqual(resampler.process(ring, out, 1.001), 0)
+            produced.append(out[:, 0].copy())
+        np.testing.assert_allclose(np.concatenate(produced), np.arange(2560) * 1.001, atol=1e-3)
+
+class TestMultipleDevices(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        trigger = TriggerNode()
+        source = SourceNode() # Default sine 440Hz
+        self.graph.add_node(trigger)
+        self.graph.add_node(source)
+        self.graph.add_connection(trigger.id, source.id)
+        for device in ("default", "USB B"):
+            channel = ChannelNode()
+            channel.set_property("channel_index", 1)
+            channel.set_property("hardware_device", device)
+            self.graph.add_node(channel)
+            self.graph.add_connection(source.id, channel.id)
+        self.graph.settings["sample_rate"] = 48000 # The fake devices' rate
+        self.engine = AudioEngine()
+        self.engine.set_graph(self.graph)
+        self.engine.set_latency_profile("low")
+
+    def test_skewed_device_tracks_the_render_clock(self):
+        backend = FakeBackend([("Main", 2, 0.0), ("USB B", 2, 300e-6)])
+        with mock.patch.object(audio_engine, "sd", backend), mock.patch.object(device_registry, "sd", backend), \
+                mock.patch("src.core.multi_device.perf_counter", lambda: backend.now):
+            self.engine.start()
+            try:
+                self.assertEqual(len(backend.streams), 2)
+                main, secondary = sorted(backend.streams, key=lambda s: s.device is not None)
+                self.assertEqual(secondary.device, 1)
+                backend.run(20.0, record_from=19.0)
+                stats = self.engine.get_device_stats()[0]
+            finally:
+                self.engine.stop()
+
+        # The device eats 300 ppm faster: the ratio settles there and the ring never runs dry
+        self.assertEqual(stats["underruns"], 0)
+        self.assertEqual(stats["overruns"], 0)
+        self.assertAlmostEqual(stats["drift_ppm"], -300, delta=60)
+        self.assertLess(abs(stats["buffered"] - stats["target"]), 3 * 512)
+
+        # Both devices play the same 440 Hz sine, the secondary one without glitches
+        step = 2 * np.pi * 440.0 / 48000
+        for stream in (main, secondary):
+            data = np.concatenate(stream.recorded)[:, 0]
+            self.assertGreater(np.abs(data).max(), 0.99)
+            self.assertLess(np.abs(np.diff(data)).max(), step * 1.01)
+        self.assertFalse(np.concatenate(main.recorded)[:, 1].any()) # Channel 2 is unrouted
+
+    def test_secondary_device_at_its_own_rate_and_format(self):
+        backend = FakeBackend([("Main", 2, 0.0), ("USB B", 2, 0.0)])
+        backend.accepts[1] = {(44100, "int16")}
+        with mock.patch.object(audio_engine, "sd", backend), mock.patch.object(device_registry, "sd", backend), \
+                mock.patch("src.core.multi_device.perf_counter", lambda: backend.now):
+            self.engine.start()
+            try:
+                self.assertEqual(len(backend.streams), 2)
+                secondary = [s for s in backend.streams if s.device == 1][0]
+                self.assertEqual(secondary.samplerate, 44100)
+                backend.run(10.0, record_from=9.0)
+                stats = self.engine.get_device_stats()[0]
+            finally:
+                self.engine.stop()
+
+        self.assertEqual(self.engine.sample_rate, 48000)
+        self.assertEqual((stats["sample_rate"], stats["sample_format"]), (44100, "int16"))
+        self.assertEqual(stats["underruns"], 0)
+        # 440 Hz at 44100 Hz, scaled to int16 (recorded through a float32 fake buffer)
+        data = np.concatenate(secondary.recorded)[:, 0] / 32767
+        self.assertGreater(np.abs(data).max(), 0.99)
+        self.assertLess(np.abs(np.diff(data)).max(), 2 * np.pi * 440.0 / 44100 * 1.01)
+
+    def test_unusable_secondary_device_is_skipped(self):
+        backend = FakeBackend([("Main", 2, 0.0), ("USB B", 2, 0.0)])
+        backend.accepts[1] = set()
+        with mock.patch.object(audio_engine, "sd", backend), mock.patch.object(device_registry, "sd", backend):
+            self.engine.start()
+            try:
+                self.assertTrue(self.engine.is_playing)
+                self.assertEqual([s.device for s in backend.streams], [None])
+                self.assertEqual(self.engine.get_device_stats(), [])
+            finally:
+                self.engine.stop()
+
+if __name__ == '__main__':
+    unittest.main()
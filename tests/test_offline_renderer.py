@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+import wave
+import numpy as np
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.audio_engine import AudioEngine
+from src.core.offline_renderer import OfflineRenderer
+
+class TestOfflineRenderer(unittest.TestCase):
+    def setUp(self):
+        graph = Graph()
+        trigger = TriggerNode()
+        source = SourceNode() # Default sine 440Hz
+        channel = ChannelNode()
+        channel.set_property("channel_index", 1)
+        for node in (trigger, source, channel):
+            graph.add_node(node)
+        graph.add_connection(trigger.id, source.id)
+        graph.add_connection(source.id, channel.id)
+        graph.settings["sample_rate"] = 44100 # Not the test machine's device rate
+
+        self.engine = AudioEngine()
+        self.engine.set_graph(graph)
+
+    def test_render_matches_sine(self):
+        renderer = OfflineRenderer(self.engine, out_channels=2, block_size=1024)
+        data = renderer.render(0.5)
+
+        self.assertEqual(data.shape, (22050, 2))
+        expected = np.sin(2 * np.pi * 440.0 * np.arange(22050) / 44100)
+        np.testing.assert_allclose(data[:, 0], expected, atol=1e-4)
+        self.assertFalse(data[:, 1].any())
+        self.assertGreater(renderer.last_result.real_time_factor, 0.0)
+
+    def test_renders_are_repeatable(self):
+        renderer = OfflineRenderer(self.engine, out_channels=2, block_size=512)
+        first = renderer.render(0.1)
+        second = renderer.render(0.1)
+        np.testing.assert_array_equal(first, second)
+
+    def test_render_to_wav(self):
+        renderer = OfflineRenderer(self.engine, out_channels=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.wav")
+            result = renderer.render_to_file(path, 1.0)
+            with wave.open(path, 'rb') as wav:
+                self.assertEqual(wav.getnchannels(), 4)
+                self.assertEqual(wav.getframerate(), 44100)
+                self.assertEqual(wav.getnframes(), 44100)
+        self.assertEqual(result.frames, 44100)
+        self.assertEqual(self.engine.block_size, 8192) # Restored after rendering
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+from src.core.oscillators import OscillatorBank, get_wavetable, TABLE_SIZE
+from src.core.buffer_pool import BufferPool, AllocationProbe
+
+SAMPLE_RATE = 44100
+
+def render(wave_type, frequency, frames=SAMPLE_RATE):
+    bank = OscillatorBank(SAMPLE_RATE, 1)
+    bank.prepare(BufferPool(frames, 1))
+    bank.set_voice(0, wave_type, frequency)
+    out = np.zeros((frames, 1), dtype=np.float32)
+    bank.render(out)
+    return out[:, 0]
+
+class TestOscillatorBank(unittest.TestCase):
+    def test_sine_matches_reference(self):
+        out = render("sine", 440.0, 4096)
+        expected = np.sin(2 * np.pi * 440.0 * np.arange(4096) / SAMPLE_RATE)
+        np.testing.assert_allclose(out, expected, atol=1e-5)
+
+    def test_shapes_follow_naive_waves(self):
+        # Away from the edges the band-limited waves match sign(sin) / rising ramp
+        phases = np.arange(SAMPLE_RATE // 10) * 100.0 / SAMPLE_RATE % 1.0
+        inner = (np.abs(phases - 0.5) > 0.05) & (phases > 0.05) & (phases < 0.95)
+        square = render("square", 100.0, len(phases))
+        np.testing.assert_array_equal(np.sign(square[inner]), np.where(phases[inner] < 0.5, 1, -1))
+        sawtooth = render("sawtooth", 100.0, len(phases))
+        self.assertGreater(np.corrcoef(sawtooth[inner], 2 * phases[inner] - 1)[0, 1], 0.99)
+        self.assertLessEqual(np.abs(sawtooth).max(), 1.0)
+
+    def test_no_aliasing_at_top_of_slider(self):
+        for wave_type in ("square", "sawtooth", "triangle"):
+            out = render(wave_type, 1997.0)
+            spectrum = np.abs(np.fft.rfft(out * np.hanning(len(out)))) ** 2
+            harmonic = np.zeros(len(spectrum), dtype=bool)
+            for k in range(1, int(SAMPLE_RATE / 2 / 1997.0) + 1):
+                center = int(round(k * 1997.0))
+                harmonic[center - 3:center + 4] = True
+            alias_db = 10 * np.log10(spectrum[~harmonic].sum() / spectrum[harmonic].sum())
+            self.assertLess(alias_db, -80, wave_type)
+
+    def test_tables_stay_below_nyquist(self):
+        table = get_wavetable("sawtooth", SAMPLE_RATE)
+        for top, (samples, _) in zip(table.top_frequencies, table.levels):
+            spectrum = np.abs(np.fft.rfft(samples))
+            highest = np.nonzero(spectrum > 1e-3 * spectrum.max())[0].max()
+            self.assertLessEqual(highest * top, SAMPLE_RATE / 2)
+            self.assertEqual(len(samples), TABLE_SIZE)
+
+    def test_noise_is_repeatable_and_bounded(self):
+        first = render("noise", 440.0, 1000)
+        second = render("noise", 440.0, 1000)
+        np.testing.assert_array_equal(first, second)
+        self.assertLessEqual(np.abs(first).max(), 1.0)
+        self.assertGreater(first.std(), 0.3)
+
+    def test_voices_render_in_one_pass(self):
+        bank = OscillatorBank(SAMPLE_RATE, 3)
+        bank.prepare(BufferPool(256, 2))
+        bank.set_voice(0, "sine", 440.0)
+        bank.set_voice(1, "noise", 440.0)
+        bank.set_voice(2, "sine", 1000.0)
+        out = np.zeros((256, 3), dtype=np.float32)
+        for block in range(3):
+            bank.render(out)
+        n = np.arange(512, 768)
+        np.testing.assert_allclose(out[:, 0], np.sin(2 * np.pi * 440.0 * n / SAMPLE_RATE), atol=1e-4)
+        np.testing.assert_allclose(out[:, 2], np.sin(2 * np.pi * 1000.0 * n / SAMPLE_RATE), atol=1e-4)
+        self.assertGreater(out[:, 1].std(), 0.3)
+
+    def test_render_does_not_allocate(self):
+        bank = OscillatorBank(SAMPLE_RATE, 8)
+        bank.prepare(BufferPool(512, 2))
+        for voice in range(8):
+            bank.set_voice(voice, ("sine", "square", "sawtooth", "triangle")[voice % 4], 100.0 * (voice + 1))
+        stacked = np.zeros((512, 10), dtype=np.float32)
+        out = stacked[:, 1:9] # Columns of a wider stack, as in the mixer
+        probe = AllocationProbe(warmup_blocks=2, strict=True)
+        for _ in range(10):
+            probe.begin()
+            bank.render(out)
+            probe.end()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.params import compile_snapshot, compile_params, SourceParams, ChannelParams
+
+class TestParamSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        self.source = SourceNode()
+        self.channel = ChannelNode()
+        self.graph.add_node(TriggerNode())
+        self.graph.add_node(self.source)
+        self.graph.add_node(self.channel)
+
+    def test_compile_coerces_types(self):
+        self.source.properties["frequency"] = "880"
+        self.channel.properties["channel_index"] = "bad"
+        snapshot = compile_snapshot(self.graph)
+
+        source_params = snapshot.get(self.source.id)
+        self.assertIsInstance(source_params, SourceParams)
+        self.assertEqual(source_params.frequency, 880.0)
+
+        channel_params = snapshot.get(self.channel.id)
+        self.assertIsInstance(channel_params, ChannelParams)
+        self.assertEqual(channel_params.channel_index, 0)
+
+    def test_replace_is_copy_on_write(self):
+        snapshot = compile_snapshot(self.graph)
+        slot = snapshot.slot_of(self.source.id)
+
+        props = dict(self.source.properties, start_time=1.0, end_time=2.0)
+        updated = snapshot.replace(slot, compile_params(self.source.type, props))
+
+        # Readers holding the old snapshot keep seeing the old values
+        self.assertEqual(snapshot.params[slot].start_time, 0.0)
+        self.assertEqual(snapshot.params[slot].end_time, 0.0)
+        self.assertEqual(updated.params[slot].start_time, 1.0)
+        self.assertEqual(updated.params[slot].end_time, 2.0)
+        self.assertIs(updated.slots, snapshot.slots)
+
+    def test_set_properties_notifies_once(self):
+        calls = []
+        self.source.on_properties_change = lambda node_id, values: calls.append(dict(values))
+        self.source.set_properties({"start_time": 1.0, "end_time": 2.0})
+        self.assertEqual(calls, [{"start_time": 1.0, "end_time": 2.0}])
+        self.assertEqual(self.source.get_property("end_time"), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
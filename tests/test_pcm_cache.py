@@ -0,0 +1,78 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from src.utils.pcm_cache import PcmCache
+from src.utils.pcm_format import decode_into
+
+class TestPcmCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = PcmCache(cache_dir=os.path.join(self.tmp_dir, "cache"))
+        self.source = os.path.join(self.tmp_dir, "clip.wav")
+        with open(self.source, 'wb') as f:
+            f.write(b"not really audio")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_store_and_lookup_memmap(self):
+        data = np.random.rand(1000, 2).astype(np.float32)
+        self.assertTrue(self.cache.store(self.source, 44100, data))
+
+        cached, channels = self.cache.lookup(self.source, 44100)
+        self.assertEqual(channels, 2)
+        self.assertIsInstance(cached, np.memmap)
+        np.testing.assert_array_equal(cached, data)
+
+        # Different target rate is a different entry
+        missing, _ = self.cache.lookup(self.source, 48000)
+        self.assertIsNone(missing)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_modified_source_invalidates_entry(self):
+        self.cache.store(self.source, 44100, np.zeros((10, 1), dtype=np.float32))
+        with open(self.source, 'ab') as f:
+            f.write(b"more")
+        cached, _ = self.cache.lookup(self.source, 44100)
+        self.assertIsNone(cached)
+
+    def test_lru_eviction(self):
+        entry_bytes = 1000 * 4
+        self.cache.max_bytes = entry_bytes * 2 + 1024
+        for rate in (8000, 16000):
+            self.cache.store(self.source, rate, np.zeros((1000, 1), dtype=np.float32))
+            os.utime(self.cache._paths(self.cache._key(self.source, rate))[1], (rate, rate))
+
+        # Touch the oldest entry so the other one becomes least recently used
+        self.cache.lookup(self.source, 8000)
+        self.cache.store(self.source, 22050, np.zeros((1000, 1), dtype=np.float32))
+
+        self.assertIsNotNone(self.cache.lookup(self.source, 8000)[0])
+        self.assertIsNone(self.cache.lookup(self.source, 16000)[0])
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_integer_storage_formats(self):
+        data = np.linspace(-1.0, 1.0, 2000, dtype=np.float32).reshape(1000, 2)
+        for storage_format, bytes_per_sample, tolerance in (("int16", 2, 2 ** -15),
+                                                            ("int24", 3, 2 ** -23),
+                                                            ("int32", 4, 2 ** -24)):
+            self.assertTrue(self.cache.store(self.source, 44100, data, storage_format))
+            key = self.cache._key(self.source, 44100, storage_format)
+            self.assertEqual(os.path.getsize(self.cache._paths(key)[0]), 2000 * bytes_per_sample)
+
+            cached, channels = self.cache.lookup(self.source, 44100, storage_format)
+            out = np.zeros((1000, 2), dtype=np.float32)
+            decode_into(cached, out)
+            np.testing.assert_allclose(out, data, atol=tolerance)
+        # Every format is its own entry
+        self.assertEqual(self.cache.stats()["entries"], 3)
+        self.assertIsNone(self.cache.lookup(self.source, 44100)[0])
+
+if __name__ == '__main__':
+    unittest.main()
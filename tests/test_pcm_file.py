@@ -0,0 +1,198 @@
+import unittest
+import os
+import shutil
+import struct
+import tempfile
+import time
+import numpy as np
+from unittest import mock
+from src.core.file_loader import FileLoader
+from src.core.file_stream import FileStream
+from src.core.node_types import SourceType
+from src.core.params import SourceParams
+from src.utils import media_index
+from src.utils.audio_loader import load_audio_file, load_pcm_file, open_audio_reader, probe_audio_file, PcmFileReader
+from src.utils.pcm_cache import PcmCache
+from src.utils.pcm_file import open_pcm_file
+
+def int_bytes(samples, bits, byte_order):
+    # Interleaved integer samples; 24-bit packed from int32
+    if bits == 24:
+        raw = samples.astype('<i4').view(np.uint8).reshape(samples.shape + (4,))[..., :3]
+        return (raw[..., ::-1] if byte_order == '>' else raw).tobytes()
+    return samples.astype(f"{byte_order}i{bits // 8}").tobytes()
+
+def write_wav(path, raw, channels, sample_rate, code=1, bits=16, extensible=False):
+    block_align = channels * bits // 8
+    fmt = struct.pack('<HHIIHH', 0xFFFE if extensible else code, channels, sample_rate,
+                      sample_rate * block_align, block_align, bits)
+    if extensible:
+        fmt += struct.pack('<HHI', 22, bits, 0) + struct.pack('<H', code) + b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+    body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+    body += b'LIST' + struct.pack('<I', 3) + b'abc\x00' # Odd-sized chunk before the data
+    body += b'data' + struct.pack('<I', len(raw)) + raw
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+
+def write_aiff(path, samples, sample_rate, bits=16, compression=None):
+    channels, frames = samples.shape[1], samples.shape[0]
+    # 80-bit extended sample rate: integer rates are exact
+    exponent = sample_rate.bit_length() - 1
+    rate = struct.pack('>HQ', 16383 + exponent, sample_rate << (63 - exponent))
+    comm = struct.pack('>hIh', channels, frames, bits) + rate
+    if compression:
+        comm += compression + b'\x00\x00'
+    byte_order = '<' if compression == b'sowt' else '>'
+    ssnd = struct.pack('>II', 0, 0) + int_bytes(samples, bits, byte_order)
+    body = (b'AIFC' if compression else b'AIFF') + b'COMM' + struct.pack('>I', len(comm)) + comm
+    body += b'SSND' + struct.pack('>I', len(ssnd)) + ssnd
+    with open(path, 'wb') as f:
+        f.write(b'FORM' + struct.pack('>I', len(body)) + body)
+
+class TestPcmFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # Probes go to a throwaway index, not the user's ~/.cache one
+        self.index = media_index.MediaIndex(os.path.join(self.tmp_dir, "media.sqlite"))
+        self.saved_index = media_index.set_media_index(self.index)
+        # Stereo ramp in int16 steps, exact in every format
+        self.ints = (np.arange(-40, 40, dtype=np.int32).reshape(40, 2) * 256)
+        self.floats = (self.ints / 2.0 ** 15).astype(np.float32)
+
+    def tearDown(self):
+        media_index.set_media_index(self.saved_index)
+        self.index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def decode(self, path):
+        data, channels, sample_rate = load_audio_file(path, 44100)
+        self.assertEqual((channels, sample_rate), (2, 44100))
+        return np.asarray(data)
+
+    def test_wav_formats(self):
+        cases = [
+            ("s16.wav", dict(code=1, bits=16), int_bytes(self.ints, 16, '<'), "pcm_s16le"),
+            ("s24.wav", dict(code=1, bits=24, extensible=True), int_bytes(self.ints << 8, 24, '<'), "pcm_s24le"),
+            ("s32.wav", dict(code=1, bits=32), int_bytes(self.ints << 16, 32, '<'), "pcm_s32le"),
+            ("f32.wav", dict(code=3, bits=32), self.floats.tobytes(), "pcm_f32le"),
+            ("f64.wav", dict(code=3, bits=64, extensible=True), self.floats.astype('<f8').tobytes(), "pcm_f64le"),
+        ]
+        for name, fmt, raw, codec in cases:
+            path = self.path(name)
+            write_wav(path, raw, 2, 44100, **fmt)
+            pcm = open_pcm_file(path)
+            self.assertIsNotNone(pcm, name)
+            self.assertEqual((pcm.channels, pcm.sample_rate, pcm.frames, pcm.codec), (2, 44100, 40, codec))
+            np.testing.assert_array_equal(self.decode(path), self.floats, err_msg=name)
+
+    def test_aiff_formats(self):
+        for name, bits, compression, codec in [("s16.aiff", 16, None, "pcm_s16be"),
+                                               ("s24.aiff", 24, None, "pcm_s24be"),
+                                               ("sowt.aifc", 16, b'sowt', "pcm_s16le")]:
+            path = self.path(name)
+            write_aiff(path, self.ints << (bits - 16), 44100, bits, compression)
+            self.assertEqual(probe_audio_file(path),
+                             {"channels": 2, "sample_rate": 44100, "duration": 40 / 44100, "codec": codec})
+            np.testing.assert_array_equal(self.decode(path), self.floats, err_msg=name)
+
+    def test_float32_wav_is_returned_in_place(self):
+        path = self.path("f32.wav")
+        write_wav(path, self.floats.tobytes(), 2, 44100, code=3, bits=32)
+        data, _, _ = load_audio_file(path, 44100)
+        self.assertIsInstance(data, np.memmap)
+
+    def test_truncated_data_chunk(self):
+        # A recording cut off mid-write: the header promises more than the file holds
+        path = self.path("cut.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 44100)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 7)
+        self.assertEqual(open_pcm_file(path).frames, 38)
+
+    def test_unsupported_files_are_left_to_decoders(self):
+        mulaw = self.path("mulaw.wav")
+        write_wav(mulaw, bytes(4), 1, 8000, code=7, bits=8)
+        other = self.path("song.mp3")
+        with open(other, 'wb') as f:
+            f.write(b"ID3" + bytes(64))
+        self.assertIsNone(open_pcm_file(mulaw))
+        self.assertIsNone(open_pcm_file(other))
+        # Another sample rate needs resampling (libsndfile or ffmpeg)
+        path = self.path("48k.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 48000)
+        self.assertIsNone(load_pcm_file(path, 44100))
+        self.assertIsNotNone(load_pcm_file(path, 48000))
+
+    def test_reader_starts_at_offset(self):
+        path = self.path("s16.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 100)
+        reader = open_audio_reader(path, 2, 100, start_time=0.25)
+        self.assertIsInstance(reader, PcmFileReader)
+        np.testing.assert_array_equal(reader.read(10), self.floats[25:35])
+        np.testing.assert_array_equal(reader.read(10), self.floats[35:40])
+        self.assertEqual(len(reader.read(10)), 0)
+
+    def test_cache_decodes_without_ffmpeg(self):
+        path = self.path("s24.aiff")
+        write_aiff(path, self.ints << 8, 100, 24)
+        cache = PcmCache(cache_dir=self.path("cache"))
+        self.assertTrue(cache.decode(path, 100, "int16"))
+        data, channels = cache.lookup(path, 100, "int16")
+        np.testing.assert_array_equal(data, self.ints.astype(np.int16))
+
+    def test_file_stream_plays_wav_in_place(self):
+        path = self.path("s16.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 100)
+        stream = FileStream(path, 100, cache=None, buffer_seconds=1.0, chunk_frames=16)
+        stream.set_segment(0.1, 0.2, iterations=0)
+        stream.start()
+        try:
+            out = np.zeros((25, 2), dtype=np.float32)
+            deadline = time.time() + 2.0
+            filled = 0
+            while filled < 25 and time.time() < deadline:
+                filled += stream.read_into(out[filled:])
+                time.sleep(0.001)
+        finally:
+            stream.close()
+        self.assertIsInstance(stream._pcm, np.memmap)
+        expected = np.concatenate([self.floats[10:20]] * 3)[:25]
+        np.testing.assert_array_equal(out, expected)
+
+    def test_decoder_failure_sets_error_state(self):
+        # Another rate needs a resampling decoder; without ffmpeg opening it raises
+        path = self.path("s16.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 100)
+        stream = FileStream(path, 200, cache=None)
+        with mock.patch("src.core.file_stream.open_audio_reader", side_effect=FileNotFoundError("ffmpeg")):
+            stream.start()
+            try:
+                deadline = time.time() + 2.0
+                while stream.state == "loading" and time.time() < deadline:
+                    time.sleep(0.001)
+            finally:
+                stream.close()
+        self.assertEqual(stream.state, "error")
+        self.assertTrue(stream.finished)
+
+    def test_file_played_in_place_is_not_cached(self):
+        path = self.path("s16.wav")
+        write_wav(path, int_bytes(self.ints, 16, '<'), 2, 100)
+        cache = PcmCache(cache_dir=self.path("cache"))
+        loader = FileLoader(100, cache)
+        loader.sync_node("source", SourceParams({"source_type": SourceType.FILE, "file_path": path}))
+        stream = loader.streams["source"]
+        try:
+            deadline = time.time() + 2.0
+            while stream.state == "loading" and time.time() < deadline:
+                time.sleep(0.001)
+        finally:
+            loader.close_all()
+        self.assertIsInstance(stream._pcm, np.memmap)
+        self.assertEqual((cache.stats()["entries"], cache.stats()["pending"]), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import numpy as np
+from src.core.graph import Graph
+from src.core.node_types import TriggerNode, SourceNode, ChannelNode
+from src.core.params import compile_snapshot
+from src.core.render_plan import compile_render_plan, WaveBankProcessor, SourceProcessor
+from src.core.buffer_pool import BufferPool, AllocationProbe
+from src.core.mixer import GainMatrixMixer
+
+class TestRenderPlan(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        self.trigger = TriggerNode()
+        self.source = SourceNode()
+        self.graph.add_node(self.trigger)
+        self.graph.add_node(self.source)
+        self.graph.add_connection(self.trigger.id, self.source.id)
+
+        self.channels = []
+        for i in range(2):
+            channel = ChannelNode()
+            channel.properties["channel_index"] = i + 1
+            channel.properties["volume"] = 0.5 * (i + 1)
+            self.graph.add_node(channel)
+            self.graph.add_connection(self.source.id, channel.id)
+            self.channels.append(channel)
+
+    def _compile(self):
+        snapshot = compile_snapshot(self.graph)
+        return snapshot, compile_render_plan(self.graph, snapshot, 44100, {})
+
+    def _fire(self, plan, frame=0):
+        for gate in plan.trigger_gates[self.trigger.id]:
+            gate.open(frame)
+
+    def test_shared_source_compiles_to_one_processor(self):
+        _, plan = self._compile()
+        self.assertEqual(len(plan.processors), 1)
+        self.assertIsInstance(plan.processors[0], WaveBankProcessor)
+        self.assertTrue(plan.processors[0].triggered)
+        self.assertEqual(len(plan.routes), 2)
+
+    def test_wave_sources_share_one_bank(self):
+        second = SourceNode()
+        second.properties["frequency"] = 220
+        channel = ChannelNode()
+        channel.properties["channel_index"] = 3
+        for node in (second, channel):
+            self.graph.add_node(node)
+        self.graph.add_connection(self.trigger.id, second.id)
+        self.graph.add_connection(second.id, channel.id)
+
+        snapshot, plan = self._compile()
+        self.assertEqual(len(plan.processors), 1)
+        self.assertEqual(plan.width, 2)
+        matrix = plan.build_matrix(snapshot.params, 3)
+        np.testing.assert_allclose(matrix, [[0.5, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+        plan.attach(GainMatrixMixer(plan.width, 3, 64), BufferPool(64, 3))
+        self.assertEqual(len(plan.trigger_gates[self.trigger.id]), 2)
+        self._fire(plan)
+        proc, columns = plan.jobs[0]
+        proc.render(snapshot.params, columns, 0)
+        n = np.arange(64)
+        np.testing.assert_allclose(columns[:, 0], np.sin(2 * np.pi * 440 * n / 44100), atol=1e-4)
+        np.testing.assert_allclose(columns[:, 1], np.sin(2 * np.pi * 220 * n / 44100), atol=1e-4)
+
+    def test_matrix_routes_volume_per_channel(self):
+        snapshot, plan = self._compile()
+        matrix = plan.build_matrix(snapshot.params, 4)
+        np.testing.assert_allclose(matrix, [[0.5, 1.0, 0.0, 0.0]])
+
+        # Channel mapped past the device width is dropped
+        matrix = plan.build_matrix(snapshot.params, 1)
+        np.testing.assert_allclose(matrix, [[0.5]])
+
+    def test_untriggered_source(self):
+        self.graph.remove_connection(next(iter(self.graph.connections)))
+        _, plan = self._compile()
+        self.assertIsInstance(plan.processors[0], SourceProcessor)
+        self.assertFalse(plan.processors[0].triggered)
+
+    def test_recompile_keeps_phase(self):
+        snapshot, plan = self._compile()
+        plan.attach(GainMatrixMixer(plan.width, 2, 100), BufferPool(100, 2))
+        self._fire(plan)
+        proc, columns = plan.jobs[0]
+        proc.render(snapshot.params, columns, 0)
+        phase = proc.get_phase(self.source.id)
+        self.assertGreater(phase, 0.0)
+
+        snapshot = compile_snapshot(self.graph)
+        replanned = compile_render_plan(self.graph, snapshot, 44100, {}, previous=plan)
+        self.assertAlmostEqual(replanned.processors[0].get_phase(self.source.id), phase)
+        # The open gate carries over too
+        self.assertEqual(replanned.trigger_gates[self.trigger.id][0].start, 0)
+
+    def test_gate_opened_after_recompile_is_taken_over(self):
+        snapshot, plan = self._compile()
+        plan.attach(GainMatrixMixer(plan.width, 2, 100), BufferPool(100, 2))
+        replanned = compile_render_plan(self.graph, compile_snapshot(self.graph), 44100, {}, previous=plan)
+        # Trigger fires on the live plan before the new one is picked up
+        self._fire(plan, 50)
+        self.assertNotEqual(replanned.trigger_gates[self.trigger.id][0].start, 50)
+        replanned.take_over(plan)
+        self.assertEqual(replanned.trigger_gates[self.trigger.id][0].start, 50)
+
+    def test_with_streams_leaves_the_live_bank_alone(self):
+        snapshot, plan = self._compile()
+        plan.attach(GainMatrixMixer(plan.width, 2, 100), BufferPool(100, 2))
+        self._fire(plan)
+        proc, columns = plan.jobs[0]
+        proc.render(snapshot.params, columns, 0)
+        envelope = proc.envelope
+
+        rebound = plan.with_streams({})
+        rebound.attach(GainMatrixMixer(rebound.width, 2, 100), BufferPool(100, 2))
+        self.assertIsNot(rebound.processors[0], proc)
+        self.assertIs(proc.envelope, envelope)
+        self.assertEqual(proc.next_change, plan.trigger_gates[self.trigger.id][0].next_change)
+        self.assertAlmostEqual(rebound.processors[0].get_phase(self.source.id), proc.get_phase(self.source.id))
+
+    def test_wave_render_matches_reference_without_allocating(self):
+        snapshot, plan = self._compile()
+        mixer = GainMatrixMixer(plan.width, 2, 256)
+        plan.attach(mixer, BufferPool(256, 2))
+        self._fire(plan)
+        proc, columns = plan.jobs[0]
+        params = snapshot.params
+
+        probe = AllocationProbe(warmup_blocks=2, strict=True)
+        for block in range(10):
+            probe.begin()
+            proc.render(params, columns, block * 256)
+            probe.end()
+
+        # Tenth block of a 440 Hz sine
+        start = 9 * 256
+        expected = np.sin(2 * np.pi * 440.0 / 44100 * np.arange(start, start + 256))
+        np.testing.assert_allclose(columns[:, 0], expected, atol=1e-4)
+
+if __name__ == '__main__':
+    unittest.main()
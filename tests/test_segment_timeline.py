@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from src.core.segment_timeline import SegmentTimeline, iterations_for, ONE_SHOT, LOOP, N_TIMES
+
+def reference(timeline, source, t, frames):
+    # Frame-by-frame definition of the timeline
+    out = np.zeros((frames, source.shape[1]), dtype=np.float32)
+    for i in range(frames):
+        if t + i >= timeline.length:
+            break
+        offset = (t + i) % timeline.period - timeline.before
+        if 0 <= offset < timeline.segment_frames:
+            out[i] = source[timeline.segment_start + offset]
+    return out
+
+class TestSegmentTimeline(unittest.TestCase):
+    def setUp(self):
+        self.source = np.arange(1000, dtype=np.float32).reshape(-1, 1) + 1
+
+    def test_spans_follow_padding_and_repeats(self):
+        timeline = SegmentTimeline(100, 400, before=50, after=25, iterations=3)
+        self.assertEqual(timeline.period, 375)
+        self.assertEqual(timeline.length, 1125)
+        for t in (0, 40, 370, 1000):
+            out = np.zeros((512, 1), dtype=np.float32)
+            for offset, count, start in timeline.spans(t, 512):
+                if start >= 0:
+                    out[offset:offset + count] = self.source[start:start + count]
+            np.testing.assert_array_equal(out, reference(timeline, self.source, t, 512))
+        # One period per block is at most three spans, plus the edges
+        self.assertLessEqual(len(timeline.spans(0, 375)), 3)
+
+    def test_short_period_renders_with_one_take(self):
+        timeline = SegmentTimeline(10, 13, before=2, after=1, iterations=0)
+        table = timeline.period_table(self.source[10:13])
+        ramp = np.arange(4096, dtype=np.intp)
+        scratch = np.zeros(4096, dtype=np.intp)
+        out = np.zeros((4096, 1), dtype=np.float32)
+        self.assertEqual(timeline.render_table(12345, out, table, ramp, scratch), 4096)
+        np.testing.assert_array_equal(out, reference(timeline, self.source, 12345, 4096))
+
+    def test_locate_and_time_of(self):
+        timeline = SegmentTimeline(100, 400, before=50, after=25, iterations=0)
+        self.assertEqual(timeline.locate(375 * 2 + 60), (2, 110))
+        self.assertEqual(timeline.locate(375 + 10), (1, 100)) # Padding maps to the edges
+        self.assertEqual(timeline.time_of(2, 110), 375 * 2 + 60)
+
+    def test_playback_modes(self):
+        self.assertEqual(iterations_for(ONE_SHOT, 5), 1)
+        self.assertEqual(iterations_for(LOOP, 5), 0)
+        self.assertEqual(iterations_for(N_TIMES, 5), 5)
+        self.assertEqual(iterations_for(ONE_SHOT, 0, loop=True), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from src.utils.startup_trace import StartupTrace
+
+class TestStartupTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_first_mark_of_each_name_is_kept(self):
+        trace = StartupTrace()
+        trace.mark("config")
+        first = trace.seconds("config")
+        trace.mark("config")
+        trace.mark("stream_open")
+        self.assertEqual([name for name, _ in trace.marks], ["config", "stream_open"])
+        self.assertEqual(trace.seconds("config"), first)
+        self.assertIsNone(trace.seconds("first_callback"))
+        self.assertIn("no audio callback yet", trace.report())
+
+    def test_report_written_after_first_callback(self):
+        trace = StartupTrace()
+        path = os.path.join(self.tmp_dir, "startup_report.txt")
+        trace.report_when("first_callback", path, timeout=5.0)
+        trace.mark("stream_open")
+        time.sleep(0.1)
+        self.assertFalse(os.path.exists(path)) # Still waiting for sound
+        trace.mark("first_callback")
+        deadline = time.time() + 2.0
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.01)
+        with open(path) as f:
+            report = f.read()
+        lines = report.splitlines()
+        self.assertTrue(lines[-3].startswith("stream_open"))
+        self.assertTrue(lines[-2].startswith("first_callback"))
+        self.assertIn("boot-to-sound:", lines[-1])
+
+if __name__ == '__main__':
+    unittest.main()